@@ -29,6 +29,38 @@ MEDIA_ROOT = BASE_DIR / "mediafiles"
 # URL used to access the media
 MEDIA_URL = "/media/"
 
+# The media is served by `common.views.MediaView`, cached for this many
+# seconds unless named after its content. It can be sent by the front
+# proxy instead, with "x-accel-redirect" to the internal location at
+# MEDIA_SENDFILE_PREFIX (nginx) or with "x-sendfile" (Apache, lighttpd)
+MEDIA_MAX_AGE = env.int("MEDIA_MAX_AGE", default=3600)
+MEDIA_SENDFILE = env.str("MEDIA_SENDFILE", default="")
+MEDIA_SENDFILE_PREFIX = env.str("MEDIA_SENDFILE_PREFIX", default="/protected-media/")
+
+# Uploads are stored once per content, see `common.storage`, and deleted
+# by the `collect_media_blobs` command once unreferenced for this long
+DEFAULT_FILE_STORAGE = "common.storage.ContentAddressedStorage"
+MEDIA_BLOB_GC_GRACE = env.int("MEDIA_BLOB_GC_GRACE", default=3600)
+
+# Uploaded images are staged and processed by a pool of this many threads
+# per process, or by the request thread when 0 or past the pending limit,
+# see `common.ingestion`. Their size in bytes and pixels is bounded, the
+# larger images are refused before they are decoded, the others shrunk.
+IMAGE_INGESTION_WORKERS = env.int("IMAGE_INGESTION_WORKERS", default=2)
+IMAGE_INGESTION_MAX_PENDING = env.int("IMAGE_INGESTION_MAX_PENDING", default=64)
+IMAGE_INGESTION_MAX_PIXELS = env.int("IMAGE_INGESTION_MAX_PIXELS", default=50_000_000)
+IMAGE_INGESTION_MAX_SIZE = (4096, 4096)
+IMAGE_UPLOAD_MAX_SIZE = env.int("IMAGE_UPLOAD_MAX_SIZE", default=20 * 1024 * 1024)
+
+# Bounding box and quality of the sized variants of the uploaded images,
+# generated on demand by `common.views.ImageVariantView`, and their format
+IMAGE_VARIANTS = {
+    "thumb": {"size": (160, 160), "quality": 70},
+    "card": {"size": (480, 480), "quality": 80},
+    "full": {"size": (1600, 1600), "quality": 85},
+}
+IMAGE_VARIANT_FORMAT = env.str("IMAGE_VARIANT_FORMAT", default="WEBP")
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
@@ -61,10 +93,69 @@ INSTALLED_APPS = [
     "dashboard",
 ]
 
+# Dotted path of the products full-text search backend,
+# picked from the database vendor when empty
+PRODUCT_SEARCH_BACKEND = env.str("PRODUCT_SEARCH_BACKEND", default="")
+
+# Same for the users, number of exact and of prefix matches listed by a
+# user search, and of the matches they are ranked among
+USER_SEARCH_BACKEND = env.str("USER_SEARCH_BACKEND", default="")
+USER_SEARCH_MAX_RESULTS = env.int("USER_SEARCH_MAX_RESULTS", default=1000)
+USER_SEARCH_MAX_CANDIDATES = env.int("USER_SEARCH_MAX_CANDIDATES", default=10000)
+
+# Cache backends, e.g. "locmemcache://", "filecache:///var/tmp/auctionwave"
+# or "rediscache://127.0.0.1:6379/1"
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://"),
+}
+
+# Cache and lifetime in seconds of the anonymous product list responses
+PRODUCT_LIST_CACHE_ALIAS = env.str("PRODUCT_LIST_CACHE_ALIAS", default="default")
+PRODUCT_LIST_CACHE_TIMEOUT = env.int("PRODUCT_LIST_CACHE_TIMEOUT", default=30)
+
+# Number of ongoing auctions whose top bids each process keeps in memory
+PRODUCT_LEADERBOARD_MAX_ENTRIES = env.int(
+    "PRODUCT_LEADERBOARD_MAX_ENTRIES", default=1024
+)
+
+# Seconds between the heartbeats of the product event streams, and number
+# of events buffered per client before dropping the oldest ones
+PRODUCT_EVENTS_HEARTBEAT = env.float("PRODUCT_EVENTS_HEARTBEAT", default=15)
+PRODUCT_EVENTS_QUEUE_SIZE = env.int("PRODUCT_EVENTS_QUEUE_SIZE", default=32)
+# Seconds after which a stream is closed and the client told to reconnect,
+# as Django does not notice the clients which went away
+PRODUCT_EVENTS_MAX_AGE = env.float("PRODUCT_EVENTS_MAX_AGE", default=300)
+
+# Cache holding the token buckets of `common.throttling.TokenBucketThrottle`,
+# which must be shared by the processes
+THROTTLE_CACHE_ALIAS = env.str("THROTTLE_CACHE_ALIAS", default="default")
+
+# Cache shared by the availability filters of `user.availability`, their
+# expected false positive rate and the seconds between their rebuilds.
+# The filters are only used with a cache shared by the processes (not the
+# default local memory one), see `check --deploy`
+USER_AVAILABILITY_CACHE_ALIAS = env.str(
+    "USER_AVAILABILITY_CACHE_ALIAS", default="default"
+)
+USER_AVAILABILITY_FILTER_ERROR_RATE = env.float(
+    "USER_AVAILABILITY_FILTER_ERROR_RATE", default=0.01
+)
+USER_AVAILABILITY_FILTER_MAX_AGE = env.int(
+    "USER_AVAILABILITY_FILTER_MAX_AGE", default=600
+)
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "authentication.authentication.TokenClaimsAuthentication",
     ],
+    # Token bucket sizes and refill periods per `throttle_scope`
+    "DEFAULT_THROTTLE_RATES": {
+        "bids": env.str("THROTTLE_RATE_BIDS", default="30/min"),
+        "username_suggestions": env.str(
+            "THROTTLE_RATE_USERNAME_SUGGESTIONS", default="20/min"
+        ),
+        "availability": env.str("THROTTLE_RATE_AVAILABILITY", default="60/min"),
+    },
 }
 
 MIDDLEWARE = [
@@ -75,6 +166,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "authentication.middleware.PasswordHashingBusyMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -120,6 +212,24 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
+# Passwords are hashed by a pool of this many threads per process, which
+# refuses the logins past the pending limit with a 503 rather than queue
+# them, see `authentication.hashers`. Without workers, by the request
+# thread. The hashes of all the processes are bounded by the concurrent
+# limit, counted in the cache, which must be shared by the processes for
+# the limit to be global (0 disables it). The other hashers check the
+# passwords hashed before.
+PASSWORD_HASHERS = [
+    "authentication.hashers.PooledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+PASSWORD_HASHING_WORKERS = env.int("PASSWORD_HASHING_WORKERS", default=2)
+PASSWORD_HASHING_MAX_PENDING = env.int("PASSWORD_HASHING_MAX_PENDING", default=16)
+PASSWORD_HASHING_MAX_CONCURRENT = env.int("PASSWORD_HASHING_MAX_CONCURRENT", default=16)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -173,4 +283,17 @@ SWAGGER_SETTINGS = {
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
+    # The access tokens carry the claims the requests are authenticated
+    # from, see `authentication.tokens`, and a hash of the password
+    "TOKEN_OBTAIN_SERIALIZER": "authentication.serializers.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "authentication.serializers.ClaimsTokenRefreshSerializer",
+    "CHECK_REVOKE_TOKEN": True,
 }
+
+# Number of users and seconds each process keeps the users authenticated
+# by `authentication.authentication.CachedUserAuthentication` in memory,
+# and cache shared by the processes holding the versions of the users,
+# which the cached users and the token claims are checked against
+USER_CACHE_MAX_ENTRIES = env.int("USER_CACHE_MAX_ENTRIES", default=1024)
+USER_CACHE_TIMEOUT = env.int("USER_CACHE_TIMEOUT", default=60)
+USER_VERSION_CACHE_ALIAS = env.str("USER_VERSION_CACHE_ALIAS", default="default")
@@ -19,7 +19,7 @@ from django.urls import path, include
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.conf import settings
-from django.conf.urls.static import static
+from common.views import ImageVariantView, MediaView, ThrottleStatsView
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -40,9 +40,20 @@ urlpatterns = [
     path("products/", include("products.urls")),
     path("bids/", include("bids.urls")),
     path("dashboard/", include("dashboard.urls")),
+    path("throttles/stats/", ThrottleStatsView.as_view(), name="throttle_stats"),
+    path(
+        "images/<str:variant>/<path:name>",
+        ImageVariantView.as_view(),
+        name="image_variant",
+    ),
     path(
         "swagger/",
         schema_view.with_ui("swagger", cache_timeout=0),
         name="schema-swagger-ui",
     ),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path(
+        f"{settings.MEDIA_URL.lstrip('/')}<path:name>",
+        MediaView.as_view(),
+        name="media",
+    ),
+]
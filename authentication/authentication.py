@@ -0,0 +1,80 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from user.cache import user_cache, user_versions
+from user.models import User
+from .tokens import USER_CLAIMS, USER_VERSION_CLAIM
+
+
+class CachedUserAuthentication(JWTAuthentication):
+    """
+    Authenticates the requests with the full user, read from the per
+    process `user_cache` rather than from the database on every request.
+    For the views which read or change the user itself.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+class TokenClaimsAuthentication(CachedUserAuthentication):
+    """
+    Authenticates the requests without a query, with a user built from the
+    `USER_CLAIMS` of the token. The other fields are deferred, the views
+    serializing the user take the full one from `user.cache.get_full_user`
+    rather than loading them one query at a time. The tokens issued
+    before the claims are authenticated with the full user.
+
+    The claims are trusted as long as the user keeps the `user_versions`
+    version they were read at, a single lookup in the shared cache. Once
+    the user is saved, e.g. deactivated or given another password, the
+    requests are authenticated with the full user until the token is
+    refreshed.
+    """
+
+    def get_user(self, validated_token):
+        version = user_versions.get(validated_token.get(api_settings.USER_ID_CLAIM))
+
+        if (
+            any(claim not in validated_token for claim in USER_CLAIMS)
+            or version is None
+            or validated_token.get(USER_VERSION_CLAIM) != version
+        ):
+            return super().get_user(validated_token)
+
+        if not validated_token["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        claims = {claim: validated_token[claim] for claim in USER_CLAIMS}
+        claims[api_settings.USER_ID_FIELD] = validated_token[api_settings.USER_ID_CLAIM]
+
+        # In the order of the fields, as expected by `from_db`
+        field_names = [
+            field.attname
+            for field in User._meta.concrete_fields
+            if field.attname in claims
+        ]
+        return User.from_db(None, field_names, [claims[name] for name in field_names])
@@ -0,0 +1,26 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.checks import Tags, Warning, register
+from common.caches import PROCESS_LOCAL_CACHE_BACKENDS
+from .hashers import password_hashing
+
+
+@register(Tags.caches, deploy=True)
+def check_password_hashing_cache(app_configs, **kwargs):
+    if not password_hashing.max_concurrent or not isinstance(
+        caches[DEFAULT_CACHE_ALIAS], PROCESS_LOCAL_CACHE_BACKENDS
+    ):
+        return []
+
+    return [
+        Warning(
+            "PASSWORD_HASHING_MAX_CONCURRENT only bounds the password hashes "
+            "of each process, as the default cache holding the slots is local "
+            "to each process.",
+            hint=(
+                "Point the default cache to a cache shared by the processes, "
+                "such as Redis or Memcached, or set "
+                "PASSWORD_HASHING_MAX_CONCURRENT to 0."
+            ),
+            id="authentication.W001",
+        )
+    ]
@@ -0,0 +1,231 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from concurrent.futures import ThreadPoolExecutor
+import random
+import threading
+import time
+
+STATS_COUNTERS = ("hashes", "rejected", "hash_time_us", "wait_time_us")
+
+
+class PasswordHashingBusy(Exception):
+    """
+    Raised by the hasher when the `password_hashing` pool refuses a hash,
+    answered with a 503 by the views using `PasswordHashingBusyMixin` and
+    by `PasswordHashingBusyMiddleware` for the other views, e.g. the admin
+    login. The commands setting a password, such as `createsuperuser`,
+    fail with it and can be run again.
+    """
+
+    # Seconds the client should wait before retrying
+    wait = 1
+
+    def __init__(self, message="Too many password hashes in progress"):
+        super().__init__(message)
+
+
+class PasswordHashingPool:
+    """
+    Runs the password hashes on up to `workers` threads per process, which
+    PBKDF2 keeps busy without holding the GIL, so that a burst of logins
+    uses that many cores at most and leaves room for the other requests.
+    Past `max_pending` hashes waiting for a thread, the next ones are
+    refused with `PasswordHashingBusy` right away rather than queued.
+    Without workers, they are run by the calling thread.
+
+    A process serving one request at a time never has a hash pending, so
+    the hashes of all the processes are also bounded by `max_concurrent`
+    slots taken in the cache, which must then be shared by the processes.
+    A slot expires after `slot_timeout` seconds in case its process dies
+    before releasing it.
+
+    The counters of the hashes and their latency are shared by all the
+    processes through the cache.
+    """
+
+    prefix = "password_hashing"
+    slot_timeout = 30
+
+    def __init__(self, workers=None, max_pending=None, max_concurrent=None):
+        self._workers = workers
+        self._max_pending = max_pending
+        self._max_concurrent = max_concurrent
+        self._executor = None
+        self._pending = 0
+        self._running = 0
+        self._peak_pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        if self._workers is not None:
+            return self._workers
+
+        return settings.PASSWORD_HASHING_WORKERS
+
+    @property
+    def max_pending(self):
+        if self._max_pending is not None:
+            return self._max_pending
+
+        return settings.PASSWORD_HASHING_MAX_PENDING
+
+    @property
+    def max_concurrent(self):
+        if self._max_concurrent is not None:
+            return self._max_concurrent
+
+        return settings.PASSWORD_HASHING_MAX_CONCURRENT
+
+    @property
+    def slot_keys(self):
+        return [f"{self.prefix}:slot:{index}" for index in range(self.max_concurrent)]
+
+    def run(self, function, *args):
+        """
+        Returns `function(*args)`, once run by the pool.
+        """
+
+        slot = self.acquire_slot()
+
+        try:
+            return self._submit(function, args)
+        finally:
+            self.release_slot(slot)
+
+    def acquire_slot(self):
+        """
+        Takes one of the free `max_concurrent` slots, and returns its key,
+        or raises `PasswordHashingBusy` if they are all taken.
+        """
+
+        if not self.max_concurrent:
+            return None
+
+        keys = self.slot_keys
+        taken = cache.get_many(keys)
+        free = [key for key in keys if key not in taken]
+        # Processes racing for the same free slots mostly try different ones
+        random.shuffle(free)
+
+        for key in free:
+            if cache.add(key, 1, timeout=self.slot_timeout):
+                return key
+
+        self.count("rejected")
+        raise PasswordHashingBusy()
+
+    def release_slot(self, key):
+        if key is not None:
+            cache.delete(key)
+
+    def _submit(self, function, args):
+        if not self.workers:
+            return self._run(function, args, time.perf_counter())
+
+        with self._lock:
+            if self._pending >= self.workers + self.max_pending:
+                self.count("rejected")
+                raise PasswordHashingBusy()
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="password-hashing"
+                )
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+
+        try:
+            future = self._executor.submit(
+                self._run, function, args, time.perf_counter()
+            )
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        try:
+            return future.result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _run(self, function, args, submitted_at):
+        started_at = time.perf_counter()
+        with self._lock:
+            self._running += 1
+
+        try:
+            return function(*args)
+        finally:
+            finished_at = time.perf_counter()
+            with self._lock:
+                self._running -= 1
+
+            self.count("hashes")
+            self.count("hash_time_us", int((finished_at - started_at) * 1e6))
+            self.count("wait_time_us", int((started_at - submitted_at) * 1e6))
+
+    def count(self, name, delta=1):
+        key = f"{self.prefix}:{name}"
+
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, delta)
+
+    def get_stats(self):
+        """
+        Returns the hash counters with their average latency, the slots
+        taken by all the processes, and the utilization of the pool of this
+        process.
+        """
+
+        keys = [f"{self.prefix}:{name}" for name in STATS_COUNTERS]
+        counts = cache.get_many(keys)
+        stats = {name: counts.get(key, 0) for name, key in zip(STATS_COUNTERS, keys)}
+
+        hashes = stats["hashes"]
+        for name in ("hash_time", "wait_time"):
+            total = stats.pop(f"{name}_us")
+            stats[f"average_{name}_ms"] = (
+                round(total / hashes / 1000, 2) if hashes else None
+            )
+
+        stats["slots"] = {
+            "max_concurrent": self.max_concurrent,
+            "taken": len(cache.get_many(self.slot_keys)),
+        }
+
+        with self._lock:
+            stats["pool"] = {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "running": self._running,
+                "pending": self._pending,
+                "peak_pending": self._peak_pending,
+                "utilization": (
+                    round(self._running / self.workers, 2) if self.workers else None
+                ),
+            }
+
+        return stats
+
+    def reset_stats(self):
+        cache.delete_many([f"{self.prefix}:{name}" for name in STATS_COUNTERS])
+
+
+password_hashing = PasswordHashingPool()
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Same hashes as `PBKDF2PasswordHasher`, computed by the
+    `password_hashing` pool, for the checks of the logins as well as for
+    the new passwords.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        return password_hashing.run(super().encode, password, salt, iterations)
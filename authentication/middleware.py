@@ -0,0 +1,30 @@
+from django.http import HttpResponse
+from .hashers import PasswordHashingBusy
+
+
+class PasswordHashingBusyMiddleware:
+    """
+    Answers the requests whose password hash is refused by the
+    `password_hashing` pool outside of the API views using
+    `PasswordHashingBusyMixin`, such as the admin login, with a
+    `503 Service Unavailable` and a `Retry-After`, rather than a server
+    error.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, PasswordHashingBusy):
+            return None
+
+        response = HttpResponse(
+            "Too many password checks in progress, try again shortly.",
+            status=503,
+            content_type="text/plain",
+        )
+        response["Retry-After"] = str(exception.wait)
+        return response
@@ -0,0 +1,28 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .hashers import PasswordHashingBusy
+
+
+class PasswordHashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many password checks in progress, try again shortly."
+    default_code = "password_hashing_busy"
+
+    def __init__(self, wait, detail=None, code=None):
+        super().__init__(detail, code)
+        # Sent as `Retry-After`
+        self.wait = wait
+
+
+class PasswordHashingBusyMixin:
+    """
+    Answers the requests whose password hash is refused by the
+    `password_hashing` pool with a `503 Service Unavailable` and a
+    `Retry-After`, rather than a server error.
+    """
+
+    def handle_exception(self, exc):
+        if isinstance(exc, PasswordHashingBusy):
+            exc = PasswordHashingUnavailable(exc.wait)
+
+        return super().handle_exception(exc)
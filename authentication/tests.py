@@ -0,0 +1,288 @@
+from django.contrib.auth.hashers import check_password
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from bids.models import Bid
+from categories.models import Category
+from products.models import Product
+from user.cache import UserCache, user_cache, user_versions
+from user.models import User
+from datetime import datetime, timedelta, timezone
+from .authentication import TokenClaimsAuthentication
+from .checks import check_password_hashing_cache
+from .hashers import PasswordHashingBusy, PasswordHashingPool, password_hashing
+import threading
+
+
+class TokenClaimsAuthenticationTests(TestCase):
+    def setUp(self) -> None:
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+
+        self.user = User.objects.create_user(
+            username="testuser1", email="t1@test.com", password="Secret-123"
+        )
+        self.client = APIClient()
+        self.tokens = self.client.post(
+            "/auth/login/", {"username": "testuser1", "password": "Secret-123"}
+        ).json()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def test_users_are_built_from_the_claims(self):
+        authentication = TokenClaimsAuthentication()
+
+        with self.assertNumQueries(0):
+            user = authentication.get_user(AccessToken(self.tokens["access"]))
+            self.assertEqual(user, self.user)
+            self.assertEqual(user.username, "testuser1")
+            self.assertFalse(user.is_staff)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "t1@test.com")
+
+        self.assertEqual(self.client.get("/dashboard/").status_code, 200)
+
+    def test_serialized_bidders_are_not_loaded_field_by_field(self):
+        creator = User.objects.create(username="testuser2", email="t2@test.com")
+        product = Product.objects.create(
+            title="test",
+            description="test",
+            base_price=1200,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(days=1),
+            category=Category.objects.create(title="Car"),
+            creator=creator,
+        )
+        Bid.objects.create(product=product, bidder=self.user, bid_amount=1300)
+
+        # The full user is read from the `user_cache`, filled by the login
+        with self.assertNumQueries(3):
+            response = self.client.get("/products/")
+        self.assertEqual(response.status_code, 200)
+        bidder = response.json()["results"][0]["current_user_bid"]["bidder"]
+        self.assertEqual(bidder["email"], "t1@test.com")
+
+        with self.assertNumQueries(2):
+            response = self.client.get("/bids/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_full_users_are_cached_until_saved(self):
+        # Cached by the login
+        user_cache.clear()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/users/me/").json()["id"], self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/users/me/").status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch("/users/me/", {"first_name": "Test"})
+        self.assertEqual(self.client.get("/users/me/").json()["first_name"], "Test")
+
+    def test_password_changes_revoke_the_tokens(self):
+        self.client.get("/users/me/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put("/users/me/password/", {"password": "Other-456"})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get("/users/me/").status_code, 401)
+        response = self.client.post(
+            "/auth/refresh/", {"refresh": self.tokens["refresh"]}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_inactive_users_cannot_refresh(self):
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertEqual(self.client.get("/users/me/").status_code, 401)
+        response = self.client.post(
+            "/auth/refresh/", {"refresh": self.tokens["refresh"]}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_tokens_issued_before_a_deactivation_are_refused(self):
+        self.assertEqual(self.client.get("/dashboard/").status_code, 200)
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertEqual(self.client.get("/dashboard/").status_code, 401)
+
+    def test_tokens_issued_before_a_password_change_are_refused(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put("/users/me/password/", {"password": "Other-456"})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get("/bids/").status_code, 401)
+
+    def test_claims_of_the_tokens_issued_before_a_save_are_not_trusted(self):
+        self.user.is_staff = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.client.post(
+            "/auth/refresh/", {"refresh": self.tokens["refresh"]}
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}"
+        )
+        self.assertEqual(self.client.get("/throttles/stats/").status_code, 200)
+
+        self.user.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertEqual(self.client.get("/throttles/stats/").status_code, 403)
+
+    def test_saves_of_other_processes_apply_to_the_cached_users(self):
+        self.assertEqual(user_cache.get(self.user.pk).first_name, "")
+
+        # Saved by another process, which bumps the shared version only
+        User.objects.filter(pk=self.user.pk).update(first_name="Test")
+        user_versions.bump(self.user.pk)
+
+        self.assertEqual(user_cache.get(self.user.pk).first_name, "Test")
+
+    def test_refreshed_tokens_have_the_current_claims(self):
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.post(
+            "/auth/refresh/", {"refresh": self.tokens["refresh"]}
+        )
+        self.assertTrue(AccessToken(response.json()["access"])["is_staff"])
+
+    def test_cache_is_bounded(self):
+        other = User.objects.create(username="testuser2", email="t2@test.com")
+        cache = UserCache(max_entries=1, timeout=60)
+
+        cache.get(self.user.pk)
+        cache.get(other.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(cache.get(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            cache.get(self.user.pk).first_name = "Changed"
+            self.assertEqual(cache.get(self.user.pk).first_name, "")
+
+        cache = UserCache(max_entries=1, timeout=0)
+        cache.get(self.user.pk)
+        with self.assertNumQueries(1):
+            cache.get(self.user.pk)
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self) -> None:
+        password_hashing.reset_stats()
+        self.addCleanup(password_hashing.reset_stats)
+
+        self.user = User.objects.create_user(
+            username="testuser1", email="t1@test.com", password="Secret-123"
+        )
+        self.client = APIClient()
+
+    def block_pool(self, pool):
+        # Keeps a worker busy until the test ends
+        started, release = threading.Event(), threading.Event()
+        thread = threading.Thread(
+            target=pool.run, args=(lambda: started.set() or release.wait(5),)
+        )
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        started.wait(5)
+
+    def test_passwords_are_hashed_by_the_pool(self):
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+
+        response = self.client.post(
+            "/auth/login/", {"username": "testuser1", "password": "Secret-123"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.put("/users/me/password/", {"password": "Other-456"})
+        self.assertEqual(response.status_code, 200)
+
+        # The signup, login and password change
+        stats = password_hashing.get_stats()
+        self.assertEqual(stats["hashes"], 3)
+        self.assertEqual(stats["rejected"], 0)
+        self.assertIsNotNone(stats["average_hash_time_ms"])
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("Other-456"))
+
+    def test_saturated_pool_refuses_hashes(self):
+        pool = PasswordHashingPool(workers=1, max_pending=0)
+        self.block_pool(pool)
+
+        with self.assertRaises(PasswordHashingBusy):
+            pool.run(len, "password")
+        self.assertEqual(pool.get_stats()["pool"]["utilization"], 1)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_MAX_PENDING=0)
+    def test_logins_get_service_unavailable_when_saturated(self):
+        self.block_pool(password_hashing)
+
+        response = self.client.post(
+            "/auth/login/", {"username": "testuser1", "password": "Secret-123"}
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(password_hashing.get_stats()["rejected"], 1)
+
+    def test_slots_bound_the_hashes_of_every_process(self):
+        # Pools of two processes serving one request at a time
+        pool = PasswordHashingPool(workers=0, max_concurrent=1)
+        other = PasswordHashingPool(workers=0, max_concurrent=1)
+        self.block_pool(pool)
+
+        with self.assertRaises(PasswordHashingBusy):
+            other.run(len, "password")
+        self.assertEqual(other.get_stats()["slots"]["taken"], 1)
+
+        pool.release_slot(pool.slot_keys[0])
+        self.assertEqual(other.run(len, "password"), 8)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0, PASSWORD_HASHING_MAX_CONCURRENT=1)
+    def test_registrations_get_service_unavailable_when_saturated(self):
+        self.block_pool(password_hashing)
+
+        response = self.client.post(
+            "/users/",
+            {
+                "username": "testuser2",
+                "first_name": "Test",
+                "last_name": "User",
+                "email": "t2@test.com",
+                "password": "Secret-123",
+            },
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertFalse(User.objects.filter(username="testuser2").exists())
+
+        # Not an API exception, for the callers outside of the API views
+        with self.assertRaises(PasswordHashingBusy):
+            check_password("Secret-123", self.user.password)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0, PASSWORD_HASHING_MAX_CONCURRENT=1)
+    def test_admin_logins_get_service_unavailable_when_saturated(self):
+        self.block_pool(password_hashing)
+
+        response = self.client.post(
+            "/admin/login/", {"username": "testuser1", "password": "Secret-123"}
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_process_local_slots_are_reported(self):
+        self.assertEqual(
+            [warning.id for warning in check_password_hashing_cache(None)],
+            ["authentication.W001"],
+        )
+
+        with override_settings(PASSWORD_HASHING_MAX_CONCURRENT=0):
+            self.assertEqual(check_password_hashing_cache(None), [])
@@ -0,0 +1,54 @@
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from user.cache import user_cache, user_versions
+
+# Fields of the user copied to the tokens, which `TokenClaimsAuthentication`
+# authenticates the requests from
+USER_CLAIMS = ("username", "is_active", "is_staff", "is_superuser")
+
+# Claim of the `user_versions` version the claims were read at
+USER_VERSION_CLAIM = "user_version"
+
+
+def set_user_claims(token, user, version=None):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+
+    if version is None:
+        version = user_versions.current(user.pk)
+
+    token[USER_VERSION_CLAIM] = version
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the `USER_CLAIMS` of its user. The claims of
+    the access tokens are read again from the database on every refresh,
+    so they are at most `ACCESS_TOKEN_LIFETIME` old, and the inactive
+    users, or the tokens issued before a password change, are refused.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_user_claims(token, user)
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        version = user_versions.current(self[api_settings.USER_ID_CLAIM])
+        user = user_cache.load(self[api_settings.USER_ID_CLAIM], version)
+
+        if user is None or not user.is_active:
+            raise TokenError("User is inactive or deleted")
+
+        if api_settings.CHECK_REVOKE_TOKEN and self.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise TokenError("The user's password has been changed")
+
+        set_user_claims(access, user, version)
+        return access
@@ -1,14 +1,16 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-    TokenVerifyView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
+from .views import LoginView, PasswordHashingStatsView
 
 app_name = "authentication"
 
 urlpatterns = [
-    path("login/", TokenObtainPairView.as_view(), name="login"),
+    path("login/", LoginView.as_view(), name="login"),
     path("refresh/", TokenRefreshView.as_view(), name="refresh"),
     path("verify/", TokenVerifyView.as_view(), name="verify"),
+    path(
+        "hashing/stats/",
+        PasswordHashingStatsView.as_view(),
+        name="password_hashing_stats",
+    ),
 ]
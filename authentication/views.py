@@ -0,0 +1,27 @@
+from rest_framework.generics import RetrieveAPIView
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
+from rest_framework_simplejwt.views import TokenObtainPairView
+from .hashers import password_hashing
+from .mixins import PasswordHashingBusyMixin
+
+
+class LoginView(PasswordHashingBusyMixin, TokenObtainPairView):
+    """
+    Returns an access and a refresh token for valid credentials, or a 503
+    while the password hashing pool is saturated.
+    """
+
+
+class PasswordHashingStatsView(RetrieveAPIView):
+    """
+    This resource returns the password hash counters and latency, and the
+    utilization of the hashing pool of the serving process. Must be an
+    admin to access.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(password_hashing.get_stats(), status=HTTP_200_OK)
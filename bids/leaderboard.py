@@ -0,0 +1,184 @@
+from django.conf import settings
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+import threading
+from .models import Bid
+
+Leaderboard = namedtuple("Leaderboard", ["version", "valid_till", "bids"])
+
+
+def ranking_key(bid):
+    # Keep in sync with `BID_RANKING`
+    return (-bid.bid_amount, bid.updated_at, bid.pk)
+
+
+def snapshot(bid, rank):
+    """
+    Copies the columns of `bid` and its bidder, detached from the product
+    and from the caller, which may keep changing the original.
+    """
+
+    copy = Bid(
+        id=bid.pk,
+        bid_amount=bid.bid_amount,
+        bidder_id=bid.bidder_id,
+        product_id=bid.product_id,
+        created_at=bid.created_at,
+        updated_at=bid.updated_at,
+    )
+    copy.bidder = bid.bidder
+    copy.rank = rank
+    return copy
+
+
+class LeaderboardCache:
+    """
+    Per process cache of the top bids of the products with an ongoing
+    auction, most polled towards the end of the auctions.
+
+    Every leaderboard is tagged with the `bid_version` of its product,
+    which is shared by all the processes through the database: a
+    leaderboard is only served for the version read by the request, and
+    is reloaded otherwise. The bid writes of this process are applied
+    in place, when the leaderboard holds the previous version and the
+    change can be made without looking past its last bid.
+
+    The leaderboards are dropped once their auction ends, and the least
+    recently used ones when there are more than `max_entries`.
+    """
+
+    def __init__(self, size=5, max_entries=None):
+        self.size = size
+        self._max_entries = max_entries
+        self._leaderboards = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_entries(self):
+        if self._max_entries is not None:
+            return self._max_entries
+
+        return settings.PRODUCT_LEADERBOARD_MAX_ENTRIES
+
+    def get(self, product_id, version, valid_till):
+        """
+        Returns the top bids of the product at the given version, or
+        `None` when they must be loaded from the database.
+        """
+
+        with self._lock:
+            leaderboard = self._leaderboards.get(product_id)
+
+            if leaderboard is None:
+                return None
+
+            if valid_till < datetime.now(tz=timezone.utc):
+                del self._leaderboards[product_id]
+                return None
+
+            if leaderboard.version != version or leaderboard.valid_till != valid_till:
+                return None
+
+            self._leaderboards.move_to_end(product_id)
+            return leaderboard.bids
+
+    def set(self, product_id, version, valid_till, bids):
+        """
+        Stores the top bids loaded from the database at the given version,
+        or a later one.
+        """
+
+        if valid_till < datetime.now(tz=timezone.utc):
+            return
+
+        bids = tuple(
+            snapshot(bid, rank) for rank, bid in enumerate(bids[: self.size], 1)
+        )
+
+        with self._lock:
+            self._leaderboards[product_id] = Leaderboard(version, valid_till, bids)
+            self._leaderboards.move_to_end(product_id)
+            self._evict()
+
+    def apply(self, bid, version, bid_count, deleted=False):
+        """
+        Applies a committed write of `bid`, which moved its product to
+        `version` with `bid_count` bids.
+        """
+
+        if not deleted and not Bid.bidder.is_cached(bid):
+            self.discard(bid.product_id)
+            return
+
+        with self._lock:
+            leaderboard = self._leaderboards.get(bid.product_id)
+
+            if leaderboard is None:
+                return
+
+            if leaderboard.version != version - 1:
+                # Missed a write, possibly from another process
+                del self._leaderboards[bid.product_id]
+                return
+
+            bids = self._apply(list(leaderboard.bids), bid, bid_count, deleted)
+
+            if bids is None:
+                del self._leaderboards[bid.product_id]
+                return
+
+            self._leaderboards[bid.product_id] = Leaderboard(
+                version,
+                leaderboard.valid_till,
+                tuple(snapshot(bid, rank) for rank, bid in enumerate(bids, 1)),
+            )
+
+    def _apply(self, bids, bid, bid_count, deleted):
+        """
+        Returns the top bids after the write, or `None` if they depend
+        on bids past the leaderboard.
+        """
+
+        was_listed = any(listed.pk == bid.pk for listed in bids)
+        bids = [listed for listed in bids if listed.pk != bid.pk]
+
+        if deleted:
+            # The next bid past the leaderboard moves up
+            if was_listed and bid_count >= self.size:
+                return None
+
+            return bids
+
+        bids.append(bid)
+        bids.sort(key=ranking_key)
+
+        # A listed bid which moved down to the last place could be
+        # outranked by a bid past the leaderboard
+        if was_listed and bid_count > self.size and bids.index(bid) >= self.size - 1:
+            return None
+
+        return bids[: self.size]
+
+    def discard(self, product_id):
+        with self._lock:
+            self._leaderboards.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._leaderboards.clear()
+
+    def _evict(self):
+        now = datetime.now(tz=timezone.utc)
+        ended = [
+            product_id
+            for product_id, leaderboard in self._leaderboards.items()
+            if leaderboard.valid_till < now
+        ]
+        for product_id in ended:
+            del self._leaderboards[product_id]
+
+        while len(self._leaderboards) > self.max_entries:
+            self._leaderboards.popitem(last=False)
+
+
+product_leaderboards = LeaderboardCache()
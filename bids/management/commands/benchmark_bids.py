@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from bids.services import place_bid, update_bid
+from categories.models import Category
+from products.models import Product
+from user.models import User
+from concurrent.futures import ThreadPoolExecutor
+import time
+import uuid
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the throughput of concurrent bid writes on a single hot "
+        "product, against the configured database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bidders", type=int, default=8)
+        parser.add_argument("--raises", type=int, default=25)
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            raise CommandError(
+                "Concurrent writers need a database shared across connections"
+            )
+
+        prefix = f"benchmark-{uuid.uuid4().hex[:8]}"
+        users = [
+            User.objects.create(
+                username=f"{prefix}-{i}", email=f"{prefix}-{i}@test.com"
+            )
+            for i in range(options["bidders"] + 1)
+        ]
+        category = Category.objects.create(title=prefix)
+        product = Product.objects.create(
+            title=prefix,
+            description=prefix,
+            base_price=100,
+            creator=users[0],
+            category=category,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(weeks=1),
+        )
+
+        try:
+            self.run(product, users[1:], options["raises"])
+        finally:
+            product.delete()
+            category.delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def run(self, product, bidders, raises):
+        def bid(i):
+            try:
+                bid = place_bid(product.pk, bidders[i], 100 + i)
+                for raise_by in range(1, raises + 1):
+                    bid = update_bid(bid, 100 + i + raise_by * len(bidders))
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(bidders)) as executor:
+            list(executor.map(bid, range(len(bidders))))
+        elapsed = time.perf_counter() - start
+
+        writes = len(bidders) * (raises + 1)
+        self.stdout.write(
+            f"{len(bidders)} bidders, {writes} writes: "
+            f"{writes / elapsed:9.1f} bids/s {elapsed * 1000 / writes:9.2f} ms/bid"
+        )
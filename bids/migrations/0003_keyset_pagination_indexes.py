@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bids', '0002_alter_bid_bid_amount_alter_bid_bidder_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['product', '-bid_amount', 'updated_at', 'id'], name='bids_bid_product_e79f7a_idx'),
+        ),
+    ]
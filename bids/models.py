@@ -1,9 +1,139 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Coalesce, Rank
 from django.core.exceptions import ValidationError
 from common.models import TimestampedModel
 from datetime import datetime, timezone
 from auctionwave.settings import AUTH_USER_MODEL
 
+# The order in which the bids of a product are ranked: the highest amount
+# first, equal amounts by the earliest `updated_at` (whoever reached the
+# amount first), then by `id` so that every bid gets a distinct rank.
+BID_RANKING = ("-bid_amount", "updated_at", "id")
+
+
+def outranking_q(bid_amount, updated_at, pk, prefix=""):
+    """
+    Returns the `Q` matching the bids ranked before the bid with the given
+    values, according to `BID_RANKING`.
+    """
+
+    return (
+        Q(**{f"{prefix}bid_amount__gt": bid_amount})
+        | Q(
+            **{
+                f"{prefix}bid_amount": bid_amount,
+                f"{prefix}updated_at__lt": updated_at,
+            }
+        )
+        | Q(
+            **{
+                f"{prefix}bid_amount": bid_amount,
+                f"{prefix}updated_at": updated_at,
+                f"{prefix}id__lt": pk,
+            }
+        )
+    )
+
+
+BID_STATUSES = ("pending", "won", "lost")
+
+
+def won_q():
+    """
+    Returns the `Q` matching the winning bids of the ended auctions: the
+    settled `winning_bid`, or the highest bid until the auction is settled.
+    Ongoing auctions must be excluded separately.
+    """
+
+    return Q(product__winning_bid=F("pk")) | Q(
+        product__closed_at__isnull=True, product__highest_bid=F("pk")
+    )
+
+
+class BidQuerySet(models.QuerySet):
+    def with_status(self, now=None):
+        """
+        Annotates `status`: `pending` while the product's auction is ongoing,
+        then `won` for the product's winning bid and `lost` for the others.
+        """
+
+        if now is None:
+            now = datetime.now(tz=timezone.utc)
+
+        return self.annotate(
+            status=Case(
+                When(
+                    product__is_sold=False,
+                    product__closed_at__isnull=True,
+                    product__valid_till__gt=now,
+                    then=Value("pending"),
+                ),
+                When(won_q(), then=Value("won")),
+                default=Value("lost"),
+                output_field=models.CharField(),
+            )
+        )
+
+    def filter_status(self, status, now=None):
+        if status not in BID_STATUSES:
+            return self.none()
+
+        queryset = self
+        if "status" not in self.query.annotations:
+            queryset = self.with_status(now)
+
+        return queryset.filter(status=status)
+
+    def with_rank(self):
+        """
+        Annotates `rank` with a `RANK()` window over the bids of each product.
+        The window only sees the rows selected by the queryset, so use this
+        on querysets holding every bid of their products, before slicing.
+        """
+
+        return self.annotate(
+            rank=Window(
+                expression=Rank(),
+                partition_by=F("product_id"),
+                order_by=[
+                    F(field[1:]).desc() if field.startswith("-") else F(field).asc()
+                    for field in BID_RANKING
+                ],
+            )
+        )
+
+    def with_product_rank(self):
+        """
+        Annotates `rank` with an indexed `COUNT` of the outranking bids on the
+        same product, for querysets holding only some of a product's bids.
+        """
+
+        outranking = (
+            Bid.objects.filter(
+                outranking_q(
+                    OuterRef("bid_amount"), OuterRef("updated_at"), OuterRef("pk")
+                ),
+                product_id=OuterRef("product_id"),
+            )
+            .order_by()
+            .values("product_id")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+
+        return self.annotate(rank=Coalesce(Subquery(outranking), 0) + 1)
+
 
 class Bid(TimestampedModel):
     """
@@ -13,6 +143,12 @@ class Bid(TimestampedModel):
 
     class Meta:
         unique_together = (("bidder", "product"),)
+        indexes = [
+            # Ranking and keyset pagination of a product's bids
+            models.Index(fields=["product", "-bid_amount", "updated_at", "id"]),
+        ]
+
+    objects = BidQuerySet.as_manager()
 
     # Columns
     bid_amount = models.PositiveIntegerField(verbose_name="Bid Amount")
@@ -31,6 +167,8 @@ class Bid(TimestampedModel):
         verbose_name="Product",
     )
 
+    _rank = None
+
     def __str__(self):
         return f"Bid of {self.bid_amount} on {self.product} by {self.bidder}"
 
@@ -47,9 +185,28 @@ class Bid(TimestampedModel):
             raise ValidationError("The product is not available now")
 
     def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+        # The product's bid summary is updated by a `post_save` handler,
+        # keep it in the same transaction as the bid itself
+        with transaction.atomic():
+            self.full_clean()
+            super().save(*args, **kwargs)
+
+        self._rank = None
 
     @property
     def rank(self):
-        return list(self.product.bids.all().order_by("-bid_amount")).index(self) + 1
+        # Annotated by `BidQuerySet.with_rank` or `with_product_rank`
+        if self._rank is None:
+            self._rank = (
+                Bid.objects.filter(
+                    outranking_q(self.bid_amount, self.updated_at, self.pk),
+                    product_id=self.product_id,
+                ).count()
+                + 1
+            )
+
+        return self._rank
+
+    @rank.setter
+    def rank(self, value):
+        self._rank = value
@@ -1,7 +1,9 @@
 from rest_framework import serializers, fields
 from .models import Bid
+from .services import place_bid, update_bid
 from products.models import Product
 from products.serializers import ProductReadSerializer
+from user.cache import get_full_user
 from user.serializers import UserSerializer
 from datetime import datetime, timezone
 
@@ -33,15 +35,33 @@ class UserBidReadSerializer(serializers.ModelSerializer):
         model = Bid
         exclude = ["bidder"]
 
+    def to_representation(self, instance):
+        current_user = self.context["request"].user
+
+        # The user's bid on the nested product is this very bid
+        if instance.bidder_id == current_user.id:
+            instance.bidder = get_full_user(current_user)
+            instance.product.current_user_bid_cache = instance
+
+        return super().to_representation(instance)
+
     def get_status(self, obj):
-        if obj.product.status == "ongoing":
-            return "pending"
+        # Annotated by `BidQuerySet.with_status`
+        if hasattr(obj, "status"):
+            return obj.status
 
-        highest_bidder = obj.product.highest_bid.bidder
+        product = obj.product
 
-        current_user = self.context["request"].user
+        if product.status == "ongoing":
+            return "pending"
+
+        # Until the auction is settled, the highest bid wins
+        if product.closed_at is not None:
+            winning_bid_id = product.winning_bid_id
+        else:
+            winning_bid_id = product.highest_bid_id
 
-        if highest_bidder == current_user:
+        if winning_bid_id == obj.pk:
             return "won"
 
         return "lost"
@@ -56,6 +76,10 @@ class UserBidUpdateSerializer(serializers.ModelSerializer):
         model = Bid
         fields = ["bid_amount"]
 
+    def update(self, instance, validated_data):
+        bid_amount = validated_data.get("bid_amount", instance.bid_amount)
+        return update_bid(instance, bid_amount)
+
 
 class BidWriteSerializer(serializers.ModelSerializer):
     """
@@ -115,3 +139,11 @@ class BidWriteSerializer(serializers.ModelSerializer):
             )
 
         return attrs
+
+    def create(self, validated_data):
+        # Re-checks the invariants above while holding the product's lock
+        return place_bid(
+            product_id=validated_data["product_id"],
+            bidder=validated_data["bidder"],
+            bid_amount=validated_data["bid_amount"],
+        )
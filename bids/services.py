@@ -0,0 +1,102 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from rest_framework import serializers
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.status import HTTP_409_CONFLICT
+from products.models import Product
+from .models import Bid
+
+
+class BidConflict(APIException):
+    """
+    Raised when a bid write loses a race against another write on the
+    same product, e.g. the auction ended or the user already bid meanwhile.
+    """
+
+    status_code = HTTP_409_CONFLICT
+    default_detail = "The bid conflicts with the current state of the auction"
+    default_code = "bid_conflict"
+
+
+def lock_product(product_id):
+    """
+    Locks the product row until the end of the current transaction, so
+    that the bid writes on a product are serialized, and returns it.
+    """
+
+    queryset = Product.objects.filter(pk=product_id)
+
+    try:
+        if connections[queryset.db].features.has_select_for_update:
+            return queryset.select_for_update().get()
+
+        # Without row locks (SQLite), take the write lock with a no-op update
+        # before reading, so that concurrent writers wait instead of failing
+        if not queryset.update(bid_count=F("bid_count")):
+            raise Product.DoesNotExist
+
+        return queryset.get()
+    except Product.DoesNotExist:
+        raise NotFound({"error": "Product not found"})
+
+
+def check_auction_open(product):
+    if product.is_sold or product.is_closed:
+        raise BidConflict({"error": "Product has been sold"})
+
+
+def save_bid(bid):
+    try:
+        with transaction.atomic():
+            bid.save()
+    except DjangoValidationError as e:
+        raise serializers.ValidationError({"error": e.messages})
+    except IntegrityError:
+        raise BidConflict({"error": "This user has already bid for this product"})
+
+    return bid
+
+
+def place_bid(product_id, bidder, bid_amount):
+    """
+    Creates the bid of `bidder` on the product, re-checking the auction
+    invariants while holding the product's lock.
+    """
+
+    with transaction.atomic():
+        product = lock_product(product_id)
+
+        check_auction_open(product)
+
+        if Bid.objects.filter(product=product, bidder=bidder).exists():
+            raise BidConflict({"error": "This user has already bid for this product"})
+
+        return save_bid(Bid(product=product, bidder=bidder, bid_amount=bid_amount))
+
+
+def update_bid(bid, bid_amount):
+    """
+    Changes the amount of an existing bid under the product's lock.
+    """
+
+    with transaction.atomic():
+        bid.product = lock_product(bid.product_id)
+
+        check_auction_open(bid.product)
+
+        bid.bid_amount = bid_amount
+        return save_bid(bid)
+
+
+def withdraw_bid(bid):
+    """
+    Deletes a bid under the product's lock.
+    """
+
+    with transaction.atomic():
+        bid.product = lock_product(bid.product_id)
+
+        check_auction_open(bid.product)
+
+        bid.delete()
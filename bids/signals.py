@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.events import bid_summary, product_events
+from products.models import Product
+from .leaderboard import product_leaderboards
+from .models import Bid
+from copy import copy
+
+
+@receiver(post_save, sender=Bid)
+@receiver(post_delete, sender=Bid)
+def update_product_bid_summary(sender, instance, using, **kwargs):
+    """
+    Keeps the denormalized bid summary on the `Product` in sync
+    whenever one of its bids is created, updated or removed.
+    """
+
+    # Nothing to keep in sync when the product itself is being deleted
+    origin = kwargs.get("origin")
+    if isinstance(origin, Product) and origin.pk == instance.product_id:
+        transaction.on_commit(
+            lambda: product_leaderboards.discard(instance.product_id), using=using
+        )
+        return
+
+    try:
+        product = instance.product
+    except Product.DoesNotExist:
+        return
+
+    previous = bid_summary(product)
+    product.update_bid_summary()
+    current = bid_summary(product)
+
+    # Publish the write to the leaderboards once it is visible to all, as
+    # it is now: the instance may change until then, e.g. lose its pk
+    bid, version, bid_count = copy(instance), product.bid_version, product.bid_count
+    deleted = kwargs["signal"] is post_delete
+    transaction.on_commit(
+        lambda: product_leaderboards.apply(bid, version, bid_count, deleted=deleted),
+        using=using,
+    )
+    transaction.on_commit(
+        lambda: product_events.publish_bids(product.pk, previous, current),
+        using=using,
+    )
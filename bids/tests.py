@@ -1,8 +1,13 @@
 from categories.models import Category
 from products.models import Product
 from user.models import User
-from django.test import TestCase
-from .models import Bid
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from .leaderboard import LeaderboardCache, product_leaderboards
+from .models import Bid, BID_RANKING
+from .services import BidConflict, place_bid, update_bid
+from rest_framework.exceptions import NotFound
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from django.core.exceptions import ValidationError
 import time
@@ -112,6 +117,11 @@ class BidModelTests(TestCase):
         with self.assertRaises(ValidationError):
             Bid.objects.create(product=car, bidder=user2, bid_amount=1400000)
 
+    def test_bid_for_missing_product(self):
+        user2 = User.objects.get(username="testuser2")
+        with self.assertRaises(NotFound):
+            place_bid(0, user2, 1300000)
+
     def test_highest_bid_for_product(self):
         user1 = User.objects.get(username="testuser1")
         user2 = User.objects.get(username="testuser2")
@@ -132,3 +142,271 @@ class BidModelTests(TestCase):
         bid3 = Bid.objects.create(product=car, bidder=user3, bid_amount=1400000)
 
         self.assertIs(car.highest_bid.pk, bid3.pk)
+
+    def test_product_bid_summary_follows_bid_writes(self):
+        user1 = User.objects.get(username="testuser1")
+        user2 = User.objects.get(username="testuser2")
+        user3 = User.objects.get(username="testuser3")
+        car_category = Category.objects.get(title="Car")
+        car = Product.objects.create(
+            title="title",
+            description="description",
+            base_price=1200000,
+            creator=user1,
+            category=car_category,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(weeks=1),
+        )
+
+        self.assertEqual(car.bid_count, 0)
+        self.assertIsNone(car.highest_bid_amount)
+
+        bid2 = Bid.objects.create(product=car, bidder=user2, bid_amount=1300000)
+        bid3 = Bid.objects.create(product=car, bidder=user3, bid_amount=1400000)
+
+        car.refresh_from_db()
+        self.assertEqual(car.bid_count, 2)
+        self.assertEqual(car.highest_bid_id, bid3.pk)
+        self.assertEqual(car.highest_bid_amount, 1400000)
+        self.assertEqual(car.highest_bidder_id, user3.pk)
+
+        bid2.bid_amount = 1500000
+        bid2.save()
+
+        car.refresh_from_db()
+        self.assertEqual(car.highest_bid_id, bid2.pk)
+        self.assertEqual(car.highest_bid_amount, 1500000)
+        self.assertEqual(car.highest_bidder_id, user2.pk)
+
+        bid2.delete()
+
+        car.refresh_from_db()
+        self.assertEqual(car.bid_count, 1)
+        self.assertEqual(car.highest_bid_id, bid3.pk)
+
+        Bid.objects.filter(product=car).delete()
+
+        car.refresh_from_db()
+        self.assertEqual(car.bid_count, 0)
+        self.assertIsNone(car.highest_bid)
+        self.assertIsNone(car.highest_bidder)
+
+    def test_bid_rank(self):
+        user1 = User.objects.get(username="testuser1")
+        user2 = User.objects.get(username="testuser2")
+        user3 = User.objects.get(username="testuser3")
+        user4 = User.objects.create(username="testuser4", email="testuser4@test.com")
+        car_category = Category.objects.get(title="Car")
+        car = Product.objects.create(
+            title="title",
+            description="description",
+            base_price=1200000,
+            creator=user1,
+            category=car_category,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(weeks=1),
+        )
+
+        bid2 = Bid.objects.create(product=car, bidder=user2, bid_amount=1300000)
+        bid3 = Bid.objects.create(product=car, bidder=user3, bid_amount=1400000)
+        # Ties are broken by the earliest update
+        bid4 = Bid.objects.create(product=car, bidder=user4, bid_amount=1300000)
+        expected = {bid3.pk: 1, bid2.pk: 2, bid4.pk: 3}
+
+        for bid in Bid.objects.filter(product=car):
+            with self.assertNumQueries(1):
+                self.assertEqual(bid.rank, expected[bid.pk])
+
+        with self.assertNumQueries(1):
+            ranks = {bid.pk: bid.rank for bid in Bid.objects.with_rank()}
+        self.assertEqual(ranks, expected)
+
+        with self.assertNumQueries(1):
+            ranks = {
+                bid.pk: bid.rank
+                for bid in Bid.objects.filter(bidder=user4).with_product_rank()
+            }
+        self.assertEqual(ranks, {bid4.pk: 3})
+
+    def test_bid_status(self):
+        user1 = User.objects.get(username="testuser1")
+        user2 = User.objects.get(username="testuser2")
+        user3 = User.objects.get(username="testuser3")
+        car_category = Category.objects.get(title="Car")
+        car = Product.objects.create(
+            title="title",
+            description="description",
+            base_price=1200000,
+            creator=user1,
+            category=car_category,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(weeks=1),
+        )
+
+        bid2 = Bid.objects.create(product=car, bidder=user2, bid_amount=1300000)
+        bid3 = Bid.objects.create(product=car, bidder=user3, bid_amount=1400000)
+
+        self.assertEqual(
+            {bid.pk: bid.status for bid in Bid.objects.with_status()},
+            {bid2.pk: "pending", bid3.pk: "pending"},
+        )
+
+        Product.objects.filter(pk=car.pk).update(
+            valid_till=datetime.now(tz=timezone.utc) - timedelta(days=1)
+        )
+
+        self.assertEqual(
+            {bid.pk: bid.status for bid in Bid.objects.with_status()},
+            {bid2.pk: "lost", bid3.pk: "won"},
+        )
+        self.assertQuerysetEqual(Bid.objects.filter_status("won"), [bid3])
+        self.assertQuerysetEqual(Bid.objects.filter_status("lost"), [bid2])
+        self.assertFalse(Bid.objects.filter_status("pending").exists())
+        self.assertFalse(Bid.objects.filter_status("unknown").exists())
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self) -> None:
+        product_leaderboards.clear()
+        self.creator = User.objects.create(username="creator", email="c@test.com")
+        self.bidders = [
+            User.objects.create(username=f"bidder{i}", email=f"bidder{i}@test.com")
+            for i in range(7)
+        ]
+        self.product = Product.objects.create(
+            title="title",
+            description="description",
+            base_price=100,
+            creator=self.creator,
+            category=Category.objects.create(title="Car"),
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(weeks=1),
+        )
+        self.bids = [
+            Bid.objects.create(
+                product=self.product, bidder=self.bidders[i], bid_amount=100 + i
+            )
+            for i in range(6)
+        ]
+
+    def get_leaderboard(self, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(f"/products/{self.product.pk}/bids/")
+
+        return [(bid["id"], bid["rank"]) for bid in response.json()]
+
+    def expected_leaderboard(self):
+        bids = Bid.objects.filter(product=self.product).order_by(*BID_RANKING)[:5]
+        return [(bid.pk, rank) for rank, bid in enumerate(bids, 1)]
+
+    def test_leaderboard_is_served_from_memory(self):
+        self.assertEqual(self.get_leaderboard(2), self.expected_leaderboard())
+        self.assertEqual(self.get_leaderboard(1), self.expected_leaderboard())
+
+    def test_committed_writes_are_applied_in_place(self):
+        self.get_leaderboard(2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_bid(self.product.pk, self.bidders[6], 500)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_bid(self.bids[0], 104)
+        self.assertEqual(self.get_leaderboard(1), self.expected_leaderboard())
+
+        # The next bid past the leaderboard is not known in memory
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bids[5].delete()
+        self.assertEqual(self.get_leaderboard(2), self.expected_leaderboard())
+
+    def test_other_writers_invalidate_the_leaderboard(self):
+        self.get_leaderboard(2)
+
+        # Not applied in memory, as if committed by another process
+        update_bid(self.bids[0], 1000)
+        self.assertEqual(self.get_leaderboard(2), self.expected_leaderboard())
+
+    def test_eviction(self):
+        leaderboards = LeaderboardCache(max_entries=2)
+        now = datetime.now(tz=timezone.utc)
+
+        for product_id in range(3):
+            leaderboards.set(product_id, 1, now + timedelta(days=1), self.bids)
+        leaderboards.set(3, 1, now - timedelta(days=1), self.bids)
+
+        self.assertIsNone(leaderboards.get(0, 1, now + timedelta(days=1)))
+        self.assertEqual(len(leaderboards.get(1, 1, now + timedelta(days=1))), 5)
+        self.assertIsNone(leaderboards.get(3, 1, now - timedelta(days=1)))
+
+        leaderboards.set(0, 1, now + timedelta(days=1), self.bids)
+        self.assertIsNone(leaderboards.get(2, 1, now + timedelta(days=1)))
+        self.assertIsNotNone(leaderboards.get(1, 1, now + timedelta(days=1)))
+
+
+class BidPlacementStressTests(TransactionTestCase):
+    BIDDERS = 8
+    RAISES = 25
+
+    def setUp(self) -> None:
+        self.creator = User.objects.create(username="creator", email="c@test.com")
+        self.bidders = [
+            User.objects.create(username=f"bidder{i}", email=f"bidder{i}@test.com")
+            for i in range(self.BIDDERS)
+        ]
+        self.product = Product.objects.create(
+            title="title",
+            description="description",
+            base_price=100,
+            creator=self.creator,
+            category=Category.objects.create(title="Car"),
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(weeks=1),
+        )
+
+    def run_concurrently(self, func, args):
+        def run(arg):
+            try:
+                return func(arg)
+            finally:
+                connection.close()
+
+        # An in-memory test database is shared by the connections of the
+        # threads, but its writers fail instead of waiting for each other
+        workers = len(args)
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            workers = 1
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(run, args))
+
+    def test_concurrent_bids_on_a_hot_product(self):
+        def bid(i):
+            bid = place_bid(self.product.pk, self.bidders[i], 100 + i)
+            for raise_by in range(1, self.RAISES + 1):
+                bid = update_bid(bid, 100 + i + raise_by * self.BIDDERS)
+            return bid.bid_amount
+
+        bid_version = self.product.bid_version
+        amounts = self.run_concurrently(bid, range(self.BIDDERS))
+
+        # No write was lost
+        self.assertEqual(
+            sorted(Bid.objects.values_list("bid_amount", flat=True)), sorted(amounts)
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(
+            self.product.bid_version,
+            bid_version + self.BIDDERS * (self.RAISES + 1),
+        )
+        self.assertEqual(self.product.bid_count, self.BIDDERS)
+        self.assertEqual(self.product.highest_bid_amount, max(amounts))
+        self.assertEqual(self.product.highest_bid.bid_amount, max(amounts))
+        self.assertEqual(
+            self.product.highest_bidder, self.bidders[amounts.index(max(amounts))]
+        )
+
+    def test_concurrent_duplicate_bids_conflict(self):
+        def bid(i):
+            try:
+                return place_bid(self.product.pk, self.bidders[0], 100 + i)
+            except BidConflict:
+                return None
+
+        bids = self.run_concurrently(bid, range(self.BIDDERS))
+
+        self.assertEqual(len([b for b in bids if b is not None]), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.bid_count, 1)
@@ -1,6 +1,7 @@
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
-from .models import Bid
+from .models import Bid, BID_STATUSES
+from .services import withdraw_bid
 from .serializers import (
     UserBidReadSerializer,
     UserBidUpdateSerializer,
@@ -8,6 +9,7 @@ from .serializers import (
 )
 from common.paginations import StandardResultsSetPagination
 from common.permissions import IsBidder, IsBidProductValid
+from common.throttling import TokenBucketThrottle
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
@@ -15,6 +17,15 @@ from drf_yasg.utils import swagger_auto_schema
 class UserBidsListView(ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "bids"
+
+    def get_throttles(self):
+        # Only placing bids is throttled
+        if self.request.method != "POST":
+            return []
+
+        return super().get_throttles()
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -23,31 +34,24 @@ class UserBidsListView(ListCreateAPIView):
             return BidWriteSerializer
         return super().get_serializer_class()
 
-    def get_status(self, obj):
-        if obj.product.status == "ongoing":
-            return "pending"
-
-        highest_bidder = obj.product.highest_bid.bidder
-
-        current_user = self.request.user
-
-        if highest_bidder == current_user:
-            return "won"
-
-        return "lost"
-
     def get_queryset(self):
         if self.request.method == "GET":
             status = self.request.query_params.get("status", None)
 
             queryset = (
                 Bid.objects.filter(bidder=self.request.user)
+                .with_product_rank()
+                .with_status()
                 .order_by("-created_at")
-                .select_related("product")
+                .select_related(
+                    "product__category",
+                    "product__creator",
+                    "product__highest_bid__bidder",
+                )
             )
 
             if status:
-                queryset = [o for o in queryset.all() if self.get_status(o) == status]
+                queryset = queryset.filter_status(status)
 
             return queryset
 
@@ -59,7 +63,7 @@ class UserBidsListView(ListCreateAPIView):
                 "status",
                 openapi.IN_QUERY,
                 type=openapi.TYPE_STRING,
-                enum=["pending", "won", "lost"],
+                enum=list(BID_STATUSES),
             ),
         ],
         responses={200: UserBidReadSerializer(many=True)},
@@ -76,7 +80,17 @@ class UserBidsDetailView(RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         if self.request.method == "GET":
-            return Bid.objects.all().order_by("-created_at").select_related("product")
+            return (
+                Bid.objects.all()
+                .with_product_rank()
+                .with_status()
+                .order_by("-created_at")
+                .select_related(
+                    "product__category",
+                    "product__creator",
+                    "product__highest_bid__bidder",
+                )
+            )
         else:
             return Bid.objects.all().order_by("-created_at")
 
@@ -87,6 +101,9 @@ class UserBidsDetailView(RetrieveUpdateDestroyAPIView):
             return UserBidUpdateSerializer
         return super().get_serializer_class()
 
+    def perform_destroy(self, instance):
+        withdraw_bid(instance)
+
     def get_permissions(self):
         self.permission_classes = [IsAuthenticated, IsBidder]
         if self.request.method not in SAFE_METHODS:
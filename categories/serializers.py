@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from common.images import ImageVariantsField
 from .models import Category
 
 
@@ -8,8 +9,9 @@ class CategorySerializer(serializers.ModelSerializer):
     """
 
     image = serializers.ImageField(required=True)
+    image_variants = ImageVariantsField(source="image")
 
     class Meta:
         model = Category
-        fields = ["id", "title", "image", "created_at", "updated_at"]
+        fields = ["id", "title", "image", "image_variants", "created_at", "updated_at"]
         
@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import TimestampedModel
+from .models import MediaBlob, TimestampedModel
 
 admin.register(TimestampedModel)
+admin.site.register(MediaBlob)
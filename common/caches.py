@@ -0,0 +1,5 @@
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Cache backends whose values other processes do not see
+PROCESS_LOCAL_CACHE_BACKENDS = (LocMemCache, DummyCache)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Tags, Warning, register
+from .caches import PROCESS_LOCAL_CACHE_BACKENDS
+
+
+@register(Tags.caches, deploy=True)
+def check_throttle_cache(app_configs, **kwargs):
+    if not isinstance(
+        caches[settings.THROTTLE_CACHE_ALIAS], PROCESS_LOCAL_CACHE_BACKENDS
+    ):
+        return []
+
+    return [
+        Warning(
+            "The throttles count the requests of each process apart, as the "
+            "cache holding their buckets is local to each process.",
+            hint=(
+                f"Point THROTTLE_CACHE_ALIAS ({settings.THROTTLE_CACHE_ALIAS!r}) "
+                "to a cache shared by the processes, such as Redis or Memcached."
+            ),
+            id="common.W001",
+        )
+    ]
@@ -0,0 +1,150 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from rest_framework import serializers
+from PIL import Image, ImageOps
+import os
+import posixpath
+import re
+import tempfile
+
+# Content type and extension of the variant formats
+VARIANT_FORMATS = {
+    "WEBP": ("image/webp", "webp"),
+    "JPEG": ("image/jpeg", "jpg"),
+    "PNG": ("image/png", "png"),
+}
+
+# Matches the names of the variants, e.g. `<name>.card-480x480q80.webp`
+VARIANT_NAME_RE = re.compile(r"\.[a-z]+-\d+x\d+q\d+\.[a-z]+$")
+
+
+class VariantError(Exception):
+    pass
+
+
+def get_variant_format():
+    format = settings.IMAGE_VARIANT_FORMAT.upper()
+    if format not in VARIANT_FORMATS:
+        raise VariantError(f"Unsupported variant format {format!r}")
+
+    return format
+
+
+def get_variant_name(name, variant):
+    """
+    Returns the name of the `variant` of the image `name`, stored next to
+    it. The name changes with the preset, so that editing a preset does
+    not serve the variants made with the previous one.
+    """
+
+    if variant not in settings.IMAGE_VARIANTS:
+        raise VariantError(f"Unknown image variant {variant!r}")
+
+    if not name.startswith("images/") or VARIANT_NAME_RE.search(name):
+        raise VariantError(f"No variants of {name!r}")
+
+    preset = settings.IMAGE_VARIANTS[variant]
+    width, height = preset["size"]
+    extension = VARIANT_FORMATS[get_variant_format()][1]
+    root = posixpath.splitext(name)[0]
+
+    return f"{root}.{variant}-{width}x{height}q{preset['quality']}.{extension}"
+
+
+def render_variant(file, variant, output):
+    """
+    Writes the `variant` of the image read from `file` to `output`. The
+    image is shrunk to fit the size of the preset, never enlarged, and
+    encoded at the quality of the preset.
+    """
+
+    preset = settings.IMAGE_VARIANTS[variant]
+    format = get_variant_format()
+
+    with Image.open(file) as image:
+        # Lets JPEG decode a downscaled image right away
+        image.draft("RGB", preset["size"])
+        image = ImageOps.exif_transpose(image)
+
+        if format == "JPEG" or image.mode not in ("RGB", "RGBA"):
+            image = image.convert(
+                "RGBA" if format != "JPEG" and image.has_transparency_data else "RGB"
+            )
+
+        image.thumbnail(preset["size"], Image.Resampling.LANCZOS)
+        image.save(output, format, quality=preset["quality"], optimize=True)
+
+
+def get_variant(name, variant, storage=default_storage):
+    """
+    Returns the name of the `variant` of the image `name`, generating it
+    on the first request. Concurrent requests may both generate it, the
+    file is replaced atomically.
+    """
+
+    variant_name = get_variant_name(name, variant)
+
+    if storage.exists(variant_name):
+        return variant_name
+
+    path = storage.path(variant_name)
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), suffix=".tmp"
+    )
+
+    try:
+        with os.fdopen(descriptor, "wb") as output, storage.open(name, "rb") as file:
+            render_variant(file, variant, output)
+        os.chmod(temporary_path, storage.file_permissions_mode or 0o644)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+    return variant_name
+
+
+def delete_variants(name, storage=default_storage):
+    """
+    Deletes the variants of the image `name`, made with any preset.
+    """
+
+    directory, filename = posixpath.split(name)
+    root = posixpath.splitext(filename)[0]
+
+    try:
+        filenames = storage.listdir(directory)[1]
+    except FileNotFoundError:
+        return
+
+    for filename in filenames:
+        if filename.startswith(f"{root}.") and VARIANT_NAME_RE.search(filename):
+            storage.delete(posixpath.join(directory, filename))
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only field of the URLs of the variants of an image field, by
+    variant name, or `None` when there is no image.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        # Missing, or not processed yet
+        if not value or not value.name.startswith("images/"):
+            return None
+
+        request = self.context.get("request")
+        urls = {}
+
+        for variant in settings.IMAGE_VARIANTS:
+            url = reverse(
+                "image_variant", kwargs={"variant": variant, "name": value.name}
+            )
+            urls[variant] = request.build_absolute_uri(url) if request else url
+
+        return urls
@@ -0,0 +1,236 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from rest_framework import serializers
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageOps
+import logging
+import posixpath
+import threading
+import uuid
+from .storage import STAGING_DIRECTORY
+
+logger = logging.getLogger(__name__)
+
+# Formats accepted in uploads, with the format, extension and options
+# they are re-encoded with
+INGESTED_FORMATS = {
+    "JPEG": ("JPEG", ".jpg", {"quality": 90}),
+    "MPO": ("JPEG", ".jpg", {"quality": 90}),
+    "PNG": ("PNG", ".png", {"optimize": True}),
+    "WEBP": ("WEBP", ".webp", {"quality": 90}),
+    "GIF": ("PNG", ".png", {"optimize": True}),
+}
+
+# Same as the extensions of the accepted formats
+INGESTED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+
+# Image fields uploaded through the staging area
+INGESTED_FIELDS = (
+    ("products.Product", "image"),
+    ("user.User", "profile_image"),
+)
+
+
+def get_staging_storage():
+    # Plain names under the media root, the uploads are not deduplicated
+    # until they are verified
+    return FileSystemStorage()
+
+
+def stage_upload(upload):
+    """
+    Streams an upload to the staging area as is, and returns its name.
+    """
+
+    extension = posixpath.splitext(upload.name)[1].lower()
+    return get_staging_storage().save(
+        f"{STAGING_DIRECTORY}/{uuid.uuid4().hex}{extension}", upload
+    )
+
+
+def process_image(file):
+    """
+    Verifies and decodes the image read from `file`, and re-encodes it
+    upright without its metadata, such as the EXIF location, shrunk to
+    fit `IMAGE_INGESTION_MAX_SIZE`. Returns its content and extension.
+    The images of more than `IMAGE_INGESTION_MAX_PIXELS` are refused from
+    their header, before they are decoded.
+    """
+
+    with Image.open(file) as image:
+        width, height = image.size
+        if width * height > settings.IMAGE_INGESTION_MAX_PIXELS:
+            raise ValueError(f"Image of {width}x{height} pixels is too large")
+
+        image.verify()
+
+    file.seek(0)
+    with Image.open(file) as image:
+        if image.format not in INGESTED_FORMATS:
+            raise ValueError(f"Unsupported image format {image.format}")
+
+        format, extension, options = INGESTED_FORMATS[image.format]
+        icc_profile = image.info.get("icc_profile")
+        # Lets JPEG decode a downscaled image right away
+        image.draft(image.mode, settings.IMAGE_INGESTION_MAX_SIZE)
+        image = ImageOps.exif_transpose(image)
+
+    if format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+        image = image.convert("RGBA")
+
+    image.thumbnail(settings.IMAGE_INGESTION_MAX_SIZE, Image.Resampling.LANCZOS)
+
+    output = BytesIO()
+    image.save(output, format, icc_profile=icc_profile, **options)
+
+    return output.getvalue(), extension
+
+
+def ingest_image(model, pk, field_name, staged_name):
+    """
+    Processes the image staged for the `field_name` of an instance of the
+    `model` label, then saves it to the field, unless the field was
+    changed since. The status of the field is `<field_name>_status`.
+    """
+
+    status_field = f"{field_name}_status"
+    staging_storage = get_staging_storage()
+    queryset = apps.get_model(model)._default_manager.filter(
+        pk=pk, **{field_name: staged_name}
+    )
+    instance = queryset.first()
+
+    if instance is not None:
+        try:
+            with staging_storage.open(staged_name, "rb") as file:
+                content, extension = process_image(file)
+        except Exception as error:
+            logger.info("Rejected the image %s: %r", staged_name, error)
+            content = None
+
+        # Stored before the row is locked, as it may take a while
+        if content is not None:
+            file = getattr(instance, field_name)
+            file.save(f"ingested{extension}", ContentFile(content), save=False)
+
+        with transaction.atomic():
+            # Write first, which locks the row or, on SQLite, the database
+            if queryset.update(**{status_field: "ready" if content else "failed"}):
+                if content is None:
+                    setattr(instance, field_name, "")
+
+                setattr(instance, status_field, "ready" if content else "failed")
+                update_fields = [field_name, status_field]
+                if any(field.name == "updated_at" for field in instance._meta.fields):
+                    update_fields.append("updated_at")
+                instance.save(update_fields=update_fields)
+
+    staging_storage.delete(staged_name)
+
+
+class ImageIngestionPool:
+    """
+    Runs the image ingestions on up to `workers` threads, once the upload
+    is acknowledged. Ingestions past `max_pending` queued ones are run by
+    the submitting thread, which slows down the clients instead of
+    buffering without limit, and so are all of them without workers, as
+    in the tests.
+
+    Jobs still queued when the process exits are resumed by the
+    `ingest_staged_images` command.
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self._workers = workers
+        self._max_pending = max_pending
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        if self._workers is not None:
+            return self._workers
+
+        return settings.IMAGE_INGESTION_WORKERS
+
+    @property
+    def max_pending(self):
+        if self._max_pending is not None:
+            return self._max_pending
+
+        return settings.IMAGE_INGESTION_MAX_PENDING
+
+    def submit(self, *args):
+        if self.workers:
+            with self._lock:
+                if self._pending < self.max_pending:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(
+                            self.workers, thread_name_prefix="image-ingestion"
+                        )
+                    self._pending += 1
+                    self._executor.submit(self._run, *args)
+                    return
+
+        ingest_image(*args)
+
+    def _run(self, *args):
+        close_old_connections()
+
+        try:
+            ingest_image(*args)
+        except Exception:
+            logger.exception("Failed to ingest the image %s", args[-1])
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._pending -= 1
+
+
+image_ingestion = ImageIngestionPool()
+
+
+def schedule_ingestion(instance, field_name):
+    """
+    Submits the image staged for the `field_name` of `instance` to the
+    pool once the current transaction commits.
+    """
+
+    args = (
+        instance._meta.label,
+        instance.pk,
+        field_name,
+        getattr(instance, field_name).name,
+    )
+    transaction.on_commit(lambda: image_ingestion.submit(*args))
+
+
+class StagedImageField(serializers.FileField):
+    """
+    Upload field accepting the images up to `IMAGE_UPLOAD_MAX_SIZE` bytes
+    by their extension only, as they are verified by the ingestion.
+    """
+
+    default_error_messages = {
+        "invalid_image": "Upload a JPEG, PNG, WebP or GIF image.",
+        "too_large": "The image must not be larger than {max_size} bytes.",
+    }
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        extension = posixpath.splitext(file.name)[1].lower()
+
+        if extension not in INGESTED_EXTENSIONS:
+            self.fail("invalid_image")
+
+        if file.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.fail("too_large", max_size=settings.IMAGE_UPLOAD_MAX_SIZE)
+
+        return file
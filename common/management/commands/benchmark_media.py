@@ -0,0 +1,74 @@
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils.http import http_date
+from django.views.static import serve
+from common.media import serve_media
+import os
+import shutil
+import tempfile
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the throughput of the media view with the static serve "
+        "view it replaces, for full, conditional and range requests"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=4, help="File size in MiB")
+        parser.add_argument("--requests", type=int, default=200)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        storage = FileSystemStorage(location=directory)
+        name = "images/blobs/benchmark.bin"
+
+        try:
+            path = storage.path(name)
+            os.makedirs(os.path.dirname(path))
+            with open(path, "wb") as file:
+                file.write(os.urandom(options["size"] * 1024 * 1024))
+
+            stat = os.stat(path)
+            validators = {
+                "HTTP_IF_NONE_MATCH": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+                "HTTP_IF_MODIFIED_SINCE": http_date(stat.st_mtime),
+            }
+            scenarios = [
+                ("full", {}),
+                ("conditional", validators),
+                ("range 64 KiB", {"HTTP_RANGE": "bytes=0-65535"}),
+            ]
+            views = [
+                ("static serve", lambda request: serve(request, name, directory)),
+                ("media view", lambda request: serve_media(request, name, storage)),
+            ]
+
+            for scenario, headers in scenarios:
+                for label, view in views:
+                    self.run(scenario, label, view, headers, options["requests"])
+        finally:
+            shutil.rmtree(directory)
+
+    def run(self, scenario, label, view, headers, count):
+        factory = RequestFactory()
+        size = 0
+        start = time.perf_counter()
+
+        for _ in range(count):
+            response = view(factory.get("/", **headers))
+            if response.streaming:
+                size += sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size += len(response.content)
+            response.close()
+
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{scenario:>14} {label:>13}: {response.status_code} "
+            f"{count / elapsed:9.1f} req/s {size / elapsed / 1024 / 1024:9.1f} MiB/s "
+            f"{size / count / 1024:9.1f} KiB/req"
+        )
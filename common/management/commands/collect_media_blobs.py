@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from common.services import collect_media_blobs, recount_media_blobs
+
+
+class Command(BaseCommand):
+    help = "Deletes the media blobs no image field references anymore"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=None,
+            help="Seconds a blob must have been unreferenced for, "
+            "defaults to MEDIA_BLOB_GC_GRACE",
+        )
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Recompute the reference counts from the image fields first",
+        )
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            count = recount_media_blobs()
+            self.stdout.write(f"Recounted the references of {count} blobs")
+
+        grace = options["grace"]
+        if grace is None:
+            grace = settings.MEDIA_BLOB_GC_GRACE
+
+        freed, size = collect_media_blobs(grace, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Freed {freed} blobs, {size} bytes"))
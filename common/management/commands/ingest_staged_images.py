@@ -0,0 +1,44 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from common.ingestion import INGESTED_FIELDS, get_staging_storage, ingest_image
+from datetime import datetime, timedelta, timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Processes the staged images whose ingestion was lost, e.g. when "
+        "the process was restarted before the pool ran it"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=600,
+            help="Seconds since the upload, to leave the queued ones to the pool",
+        )
+
+    def handle(self, *args, **options):
+        staging_storage = get_staging_storage()
+        before = datetime.now(tz=timezone.utc) - timedelta(seconds=options["min_age"])
+        count = 0
+
+        for model, field_name in INGESTED_FIELDS:
+            pending = (
+                apps.get_model(model)
+                ._default_manager.filter(**{f"{field_name}_status": "pending"})
+                .values_list("pk", field_name)
+            )
+
+            for pk, name in pending.iterator():
+                try:
+                    if staging_storage.get_modified_time(name) > before:
+                        continue
+                except FileNotFoundError:
+                    # Processed since, or lost, either way marked by the ingestion
+                    pass
+
+                ingest_image(model, pk, field_name, name)
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {count} staged images"))
@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from urllib.parse import quote
+import mimetypes
+import os
+import re
+from .images import VARIANT_NAME_RE
+from .storage import ContentAddressedStorage
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRange:
+    """
+    File-like view of `length` bytes of `file` from `start`. Servers with
+    a `wsgi.file_wrapper` send it with `sendfile()` from the offset of the
+    file descriptor, up to the `Content-Length` of the response.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def is_immutable(name):
+    """
+    Returns whether the content of `name` never changes, as it is named
+    after its content or is a variant of such a file.
+    """
+
+    return name.startswith(f"{ContentAddressedStorage.directory}/") or bool(
+        VARIANT_NAME_RE.search(name)
+    )
+
+
+def parse_range(header, size):
+    """
+    Returns the `(start, end)` byte positions of a single range `header`,
+    `None` to send the whole file, or `False` if the range is not
+    satisfiable. Multiple ranges are answered with the whole file.
+    """
+
+    match = RANGE_RE.match(header.strip())
+
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+
+    if start == "":
+        # The last `end` bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+
+    if start > end or start >= size:
+        return False
+
+    return start, end
+
+
+def serve_media(request, name, storage=default_storage, content_type=None):
+    """
+    Serves the media file `name` with validators and cache headers,
+    answering the conditional and range requests, either by streaming it
+    or through the front proxy as set by `MEDIA_SENDFILE`.
+    """
+
+    try:
+        path = storage.path(name)
+        stat = os.stat(path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("No such media file")
+
+    if not os.path.isfile(path):
+        raise Http404("No such media file")
+
+    etag = quote_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        content_type = content_type or mimetypes.guess_type(name)[0]
+        response = send_file(
+            request,
+            name,
+            path,
+            stat.st_size,
+            content_type or "application/octet-stream",
+            # A stale range must not be combined with the current file
+            if_range_matches(request, etag, last_modified),
+        )
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+
+    if is_immutable(name):
+        patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+
+    return response
+
+
+def if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get("If-Range")
+
+    if if_range is None:
+        return True
+
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def send_file(request, name, path, size, content_type, use_range):
+    byte_range = None
+    if use_range and "Range" in request.headers:
+        byte_range = parse_range(request.headers["Range"], size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if settings.MEDIA_SENDFILE:
+        # The proxy answers the range requests itself
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_SENDFILE == "x-accel-redirect":
+            response["X-Accel-Redirect"] = quote(
+                f"{settings.MEDIA_SENDFILE_PREFIX.rstrip('/')}/{name}"
+            )
+        else:
+            response["X-Sendfile"] = path
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    file = open(path, "rb")
+
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response["Content-Length"] = size
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            FileRange(file, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    return response
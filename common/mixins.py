@@ -0,0 +1,56 @@
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+from hashlib import sha256
+
+
+def make_etag(*parts):
+    """
+    Builds a strong, opaque ETag from the given version parts.
+    """
+
+    digest = sha256("|".join(str(part) for part in parts).encode("utf-8"))
+    return quote_etag(digest.hexdigest()[:32])
+
+
+class ConditionalGetMixin:
+    """
+    Answers `GET` requests with a `304 Not Modified` when their
+    `If-None-Match` header matches the ETag returned by `get_etag`,
+    before the view loads and serializes anything.
+
+    `get_etag` should be a cheap lookup of the version of the resource,
+    returning `None` to handle the request normally.
+    """
+
+    # Headers the representation depends on, besides the URL
+    etag_vary = ("Authorization",)
+
+    def get_etag(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request, *args, **kwargs)
+
+        if etag is not None:
+            if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+            if etag in if_none_match or "*" in if_none_match:
+                return self.conditional_response(
+                    Response(status=HTTP_304_NOT_MODIFIED), etag
+                )
+
+        response = super().get(request, *args, **kwargs)
+
+        if etag is not None and response.status_code == HTTP_200_OK:
+            self.conditional_response(response, etag)
+
+        return response
+
+    def conditional_response(self, response, etag):
+        response["ETag"] = etag
+        # Cached copies must be revalidated, which is cheap
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, self.etag_vary)
+
+        return response
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from datetime import datetime, timezone
 
 
 class TimestampedModel(models.Model):
@@ -16,3 +18,75 @@ class TimestampedModel(models.Model):
     # Columns
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Last Updated At")
+
+
+# Processing states of the uploaded images, see `common.ingestion`
+IMAGE_STATUSES = [("pending", "Pending"), ("ready", "Ready"), ("failed", "Failed")]
+
+
+class MediaBlobQuerySet(models.QuerySet):
+    def touch(self, name, size):
+        """
+        Records that the blob `name` was just written, so that it is not
+        collected before the upload is saved.
+        """
+
+        if not self.filter(name=name).update(updated_at=datetime.now(tz=timezone.utc)):
+            self.get_or_create(name=name, defaults={"size": size})
+
+    def acquire(self, name):
+        if not name:
+            return
+
+        if self.filter(name=name).update(
+            ref_count=F("ref_count") + 1, updated_at=datetime.now(tz=timezone.utc)
+        ):
+            return
+
+        blob, created = self.get_or_create(
+            name=name, defaults={"size": 0, "ref_count": 1}
+        )
+        if not created:
+            self.filter(pk=blob.pk).update(
+                ref_count=F("ref_count") + 1, updated_at=datetime.now(tz=timezone.utc)
+            )
+
+    def release(self, name):
+        if not name:
+            return
+
+        self.filter(name=name, ref_count__gt=0).update(
+            ref_count=F("ref_count") - 1, updated_at=datetime.now(tz=timezone.utc)
+        )
+
+    def collectable(self, before):
+        return self.filter(ref_count=0, updated_at__lt=before)
+
+
+class MediaBlob(models.Model):
+    """
+    A file of the content addressed media storage, with the number of
+    image fields referencing it. Unreferenced blobs are deleted by the
+    `collect_media_blobs` command.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["updated_at"],
+                condition=models.Q(ref_count=0),
+                name="media_blob_unreferenced_idx",
+            ),
+        ]
+
+    objects = MediaBlobQuerySet.as_manager()
+
+    # Columns
+    name = models.CharField(max_length=255, unique=True, verbose_name="Name")
+    size = models.PositiveBigIntegerField(default=0, verbose_name="Size")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="References")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Last Updated At")
+
+    def __str__(self):
+        return self.name
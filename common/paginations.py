@@ -1,4 +1,10 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.core.exceptions import ValidationError
+from django.db.models.query import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.utils.urls import replace_query_param
+import json
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -10,3 +16,160 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class KeysetResultsSetPagination(CursorPagination):
+    """
+    Cursor pagination seeking on a composite key instead of an offset,
+    so the cost of a page does not depend on how deep it is.
+
+    The ordering is taken from the view's `keyset_ordering` and must end
+    with a unique field (usually `id`). The cursor is an opaque encoding
+    of the ordering values of the row the page starts after.
+    """
+
+    page_size = StandardResultsSetPagination.page_size
+    page_size_query_param = StandardResultsSetPagination.page_size_query_param
+    max_page_size = StandardResultsSetPagination.max_page_size
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [
+            queryset.model._meta.get_field(order.lstrip("-")) for order in self.ordering
+        ]
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, position = (False, None)
+        else:
+            reverse, position = self.cursor
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._reverse_order(order) for order in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek_q(ordering, position))
+
+        # Fetch an extra item to find out if there is a following page
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_following = len(results) > len(self.page)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        if not self.page:
+            # A reversed page ran off the start, restart from the top
+            return replace_query_param(self.base_url, self.cursor_query_param, "")
+
+        return self.encode_cursor((False, self._get_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        if not self.page:
+            return replace_query_param(self.base_url, self.cursor_query_param, "")
+
+        return self.encode_cursor((True, self._get_position(self.page[0])))
+
+    def get_ordering(self, request, queryset, view):
+        # Client supplied orderings are not unique, always seek on the keyset
+        return tuple(getattr(view, "keyset_ordering", self.ordering))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padding = "=" * (-len(encoded) % 4)
+            reverse, position = json.loads(urlsafe_b64decode(encoded + padding))
+            if len(position) != len(self.fields):
+                raise ValueError
+            position = [
+                field.to_python(value) for field, value in zip(self.fields, position)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return (bool(reverse), position)
+
+    def encode_cursor(self, cursor):
+        encoded = urlsafe_b64encode(json.dumps(cursor).encode("ascii"))
+        encoded = encoded.decode("ascii").rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position(self, instance):
+        return [field.value_to_string(instance) for field in self.fields]
+
+    def _reverse_order(self, order):
+        return order[1:] if order.startswith("-") else f"-{order}"
+
+    def _seek_q(self, ordering, position):
+        """
+        Builds the row-value comparison `(a, b, c) > (x, y, z)` for the
+        given ordering, honouring the direction of each field.
+        """
+
+        q = Q()
+        equal = {}
+        for order, value in zip(ordering, position):
+            name = order.lstrip("-")
+            lookup = "lt" if order.startswith("-") else "gt"
+            q |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+
+        return q
+
+
+class OptionalKeysetResultsSetPagination(StandardResultsSetPagination):
+    """
+    Page number pagination which switches to `KeysetResultsSetPagination`
+    when the client sends a `cursor` query parameter. An empty `?cursor=`
+    requests the first page.
+    """
+
+    keyset_class = KeysetResultsSetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view=view)
+
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.keyset is not None:
+            return self.keyset.to_html()
+
+        return super().to_html()
@@ -25,7 +25,7 @@ class IsProductCreator(BasePermission):
 
 class IsProductAuctionEnded(BasePermission):
     def has_object_permission(self, request, view, obj):
-        if obj.is_available:
+        if not obj.is_closed:
             raise exceptions.PermissionDenied("The auction has not ended yet")
 
         return True
@@ -0,0 +1,304 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+import re
+
+
+def get_search_terms(search):
+    """
+    Splits the search string into lowercase word tokens, dropping any
+    punctuation which could be interpreted as query syntax.
+    """
+
+    return re.findall(r"\w+", search.lower())
+
+
+def load_search_backend(path, vendor_backends, fallback, using=DEFAULT_DB_ALIAS):
+    """
+    Returns the backend at `path`, or the backend of `vendor_backends`
+    matching the database vendor if it is not set, else `fallback`.
+    """
+
+    if not path:
+        path = vendor_backends.get(connections[using].vendor, fallback)
+
+    return import_string(path)(using=using)
+
+
+class IndexedFields:
+    """
+    Tracks the values of the indexed `fields` of the `model` instances since
+    they were loaded or last saved, so that the saves leaving them unchanged
+    are not reindexed. The deferred fields are not loaded to be compared.
+    Instances built with the primary key of an existing row, rather than
+    loaded, are taken to hold its values.
+    """
+
+    def __init__(self, model, fields):
+        self.names = set(fields)
+        self.attnames = [model._meta.get_field(name).attname for name in fields]
+        self.names.update(self.attnames)
+
+    def get_values(self, instance):
+        return [instance.__dict__.get(attname) for attname in self.attnames]
+
+    def remember(self, instance):
+        instance._indexed_values = self.get_values(instance)
+
+    def changed(self, instance, created, update_fields):
+        """
+        Whether the save of `instance` may have changed its indexed values,
+        and remembers them for the next save.
+        """
+
+        if update_fields is not None and not self.names & set(update_fields):
+            return False
+
+        values = self.get_values(instance)
+        changed = created or getattr(instance, "_indexed_values", None) != values
+        instance._indexed_values = values
+
+        return changed
+
+
+class BaseSearchBackend:
+    """
+    A search backend indexes text columns of the rows of `source`, a FROM
+    clause whose row id is `id_column`, and filters a queryset of these
+    rows down to the matching ones annotated with a `search_rank`, the
+    higher the better.
+    """
+
+    source = None
+    id_column = None
+    ordering = ("-search_rank",)
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def search(self, queryset, search):
+        raise NotImplementedError
+
+    def index(self, where="", params=()):
+        """
+        (Re)indexes the rows of the `source` matching the `where` clause.
+        """
+
+    def remove(self, ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def where_ids(self, ids=None):
+        if ids is None:
+            return "", []
+
+        ids = list(ids)
+        placeholders = ", ".join(["%s"] * len(ids)) or "NULL"
+        return f"WHERE {self.id_column} IN ({placeholders})", ids
+
+    def _order(self, queryset, search):
+        return queryset.order_by(*self.ordering)
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    Keeps an FTS5 shadow `table` of the `columns`, read from the `values`
+    of the source, keyed by the row id, and ranks the matches with
+    `bm25` weighted by `weights`. The table is created by a migration.
+    """
+
+    table = None
+    columns = ()
+    values = ()
+    weights = ()
+
+    def search(self, queryset, search):
+        terms = get_search_terms(search)
+
+        if not terms:
+            return queryset
+
+        match = self.get_match(terms)
+        queryset = queryset.filter(pk__in=RawSQL(*self.matches(match))).annotate(
+            search_rank=self.rank(queryset, match)
+        )
+
+        return self._order(queryset, search)
+
+    def get_match(self, terms, prefix=True):
+        star = "*" if prefix else ""
+        return " ".join(f'"{term}"{star}' for term in terms)
+
+    @property
+    def bm25(self):
+        return f"bm25({self.table}, {', '.join(map(str, self.weights))})"
+
+    def matches(self, match, limit=None, candidates=None):
+        """
+        Returns the SQL and parameters selecting the ids of the rows which
+        match, or of the `limit` most relevant ones among the first
+        `candidates` matches in the index order, so that the cost of the
+        ranking is bounded however many rows match.
+        """
+
+        sql = f"SELECT rowid AS id FROM {self.table} WHERE {self.table} MATCH %s"
+        if limit is None:
+            return sql, [match]
+
+        return (
+            f"SELECT id FROM (SELECT rowid AS id, {self.bm25} AS score "
+            f"FROM {self.table} WHERE {self.table} MATCH %s LIMIT %s) "
+            "ORDER BY score LIMIT %s",
+            [match, candidates or -1, limit],
+        )
+
+    def rank(self, queryset, match):
+        return RawSQL(
+            f"SELECT -{self.bm25} FROM {self.table} "
+            f"WHERE {self.table} MATCH %s "
+            f"AND rowid = {queryset.model._meta.db_table}.id",
+            [match],
+            output_field=FloatField(),
+        )
+
+    def index(self, where="", params=()):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN "
+                f"(SELECT {self.id_column} FROM {self.source} {where})",
+                params,
+            )
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, {', '.join(self.columns)}) "
+                f"SELECT {self.id_column}, {', '.join(self.values)} "
+                f"FROM {self.source} {where}",
+                params,
+            )
+
+    def remove(self, ids):
+        ids = list(ids)
+
+        if not ids:
+            return
+
+        placeholders = ", ".join(["%s"] * len(ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", ids
+            )
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+        self.index()
+
+
+class PostgresFTSBackend(BaseSearchBackend):
+    """
+    Keeps a `tsvector` per row in a shadow `table` keyed by `key_column`,
+    with a GIN index, and ranks the matches with `ts_rank`. The document
+    is made of the `documents` expressions of the source, each with its
+    weight letter. The table is created by a migration.
+    """
+
+    table = None
+    key_column = None
+    documents = ()
+
+    def search(self, queryset, search):
+        terms = get_search_terms(search)
+
+        if not terms:
+            return queryset
+
+        tsquery = self.get_tsquery(terms)
+        queryset = queryset.filter(pk__in=RawSQL(*self.matches(tsquery))).annotate(
+            search_rank=self.rank(queryset, tsquery)
+        )
+
+        return self._order(queryset, search)
+
+    def get_tsquery(self, terms, prefix=True):
+        suffix = ":*" if prefix else ""
+        return " & ".join(f"{term}{suffix}" for term in terms)
+
+    def matches(self, tsquery, limit=None, candidates=None):
+        """
+        Returns the SQL and parameters selecting the ids of the rows which
+        match, or of the `limit` most relevant ones among the first
+        `candidates` matches, so that the cost of the ranking is bounded
+        however many rows match.
+        """
+
+        where = f"FROM {self.table} WHERE document @@ to_tsquery('simple', %s)"
+        if limit is None:
+            return f"SELECT {self.key_column} {where}", [tsquery]
+
+        return (
+            f"SELECT {self.key_column} FROM "
+            f"(SELECT {self.key_column}, document {where} LIMIT %s) AS candidates "
+            "ORDER BY ts_rank(document, to_tsquery('simple', %s)) DESC LIMIT %s",
+            [tsquery, candidates, tsquery, limit],
+        )
+
+    def rank(self, queryset, tsquery):
+        return RawSQL(
+            f"SELECT ts_rank(document, to_tsquery('simple', %s)) "
+            f"FROM {self.table} "
+            f"WHERE {self.key_column} = {queryset.model._meta.db_table}.id",
+            [tsquery],
+            output_field=FloatField(),
+        )
+
+    def index(self, where="", params=()):
+        document = " || ".join(
+            f"setweight(to_tsvector('simple', {expression}), '{weight}')"
+            for expression, weight in self.documents
+        )
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.table} ({self.key_column}, document) "
+                f"SELECT {self.id_column}, {document} "
+                f"FROM {self.source} {where} "
+                f"ON CONFLICT ({self.key_column}) "
+                "DO UPDATE SET document = EXCLUDED.document",
+                params,
+            )
+
+    def remove(self, ids):
+        # Rows are removed by the foreign key cascade
+        pass
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+
+        self.index()
+
+
+class BackendSearchFilter(SearchFilter):
+    """
+    `SearchFilter` replacement which delegates to the search backend
+    returned by `get_backend`, ordering the results by relevance.
+    """
+
+    def get_backend(self, using):
+        raise NotImplementedError
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get(self.search_param, "")
+
+        if not get_search_terms(search):
+            return queryset
+
+        return self.get_backend(queryset.db).search(queryset, search)
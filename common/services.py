@@ -0,0 +1,120 @@
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from .images import delete_variants
+from .models import MediaBlob
+from .signals import MEDIA_BLOB_FIELDS
+
+
+def get_size(name, storage):
+    try:
+        return storage.size(name)
+    except OSError:
+        return 0
+
+
+def delete_media_blobs(names, storage=default_storage):
+    """
+    Deletes the files of the blobs `names`, and their image variants,
+    unless an upload has touched them again since their rows were deleted.
+    """
+
+    # An upload recreates the row before checking that the file exists
+    uploaded = set(
+        MediaBlob.objects.filter(name__in=names).values_list("name", flat=True)
+    )
+
+    for name in names:
+        if name not in uploaded:
+            storage.delete(name)
+            delete_variants(name, storage)
+
+
+def collect_media_blobs(grace, batch_size=500, storage=default_storage):
+    """
+    Deletes the blobs, and their image variants, which have not been
+    referenced for `grace` seconds, in transactions of `batch_size` blobs.
+    The grace period covers the uploads stored but not saved yet.
+
+    The files are only deleted once the deletion of their rows commits,
+    and are kept if an upload of the same content touched them meanwhile.
+
+    Returns the number of blobs and bytes freed.
+    """
+
+    before = datetime.now(tz=timezone.utc) - timedelta(seconds=grace)
+    freed = size = 0
+
+    while True:
+        with transaction.atomic():
+            queryset = MediaBlob.objects.collectable(before).order_by("updated_at")
+
+            # Leave the blobs being uploaded again to the next run
+            if connections[queryset.db].features.has_select_for_update_skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+
+            blobs = list(queryset.values_list("pk", "name", "size")[:batch_size])
+            if not blobs:
+                break
+
+            # Checked again, the blobs may have been touched since selected
+            pks = [pk for pk, _, _ in blobs]
+            MediaBlob.objects.collectable(before).filter(pk__in=pks).delete()
+            kept = set(
+                MediaBlob.objects.filter(pk__in=pks).values_list("pk", flat=True)
+            )
+            blobs = [blob for blob in blobs if blob[0] not in kept]
+
+            names = [name for _, name, _ in blobs]
+            transaction.on_commit(
+                lambda names=names: delete_media_blobs(names, storage),
+                using=queryset.db,
+            )
+
+            freed += len(blobs)
+            size += sum(blob_size for _, _, blob_size in blobs)
+
+    return freed, size
+
+
+def recount_media_blobs(chunk_size=500, storage=default_storage):
+    """
+    Recomputes the reference counts of the blobs from the image fields,
+    e.g. after updates made without saving the models. Blobs referenced
+    but not counted yet, such as the uploads stored before the content
+    addressed storage, are added.
+    """
+
+    counts = Counter()
+
+    for model, field_name in MEDIA_BLOB_FIELDS:
+        names = (
+            apps.get_model(model)
+            ._default_manager.values_list(field_name, flat=True)
+            .iterator(chunk_size)
+        )
+        counts.update(name for name in names if name)
+
+    items = list(counts.items())
+
+    with transaction.atomic():
+        MediaBlob.objects.filter(ref_count__gt=0).update(ref_count=0)
+
+        for start in range(0, len(items), chunk_size):
+            chunk = dict(items[start : start + chunk_size])
+            blobs = list(MediaBlob.objects.filter(name__in=list(chunk)))
+
+            for blob in blobs:
+                blob.ref_count = chunk.pop(blob.name)
+            MediaBlob.objects.bulk_update(blobs, ["ref_count"])
+
+            MediaBlob.objects.bulk_create(
+                [
+                    MediaBlob(name=name, size=get_size(name, storage), ref_count=count)
+                    for name, count in chunk.items()
+                ]
+            )
+
+    return len(counts)
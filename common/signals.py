@@ -0,0 +1,65 @@
+from django.apps import apps
+from django.db.models.signals import post_init, post_save, post_delete
+from .models import MediaBlob
+from .storage import STAGING_DIRECTORY
+
+# Image fields whose files are counted as references to the media blobs
+MEDIA_BLOB_FIELDS = (
+    ("products.Product", "image"),
+    ("categories.Category", "image"),
+    ("user.User", "profile_image"),
+)
+
+
+def get_file_name(value):
+    name = getattr(value, "name", value) or ""
+
+    # Staged uploads are not stored as blobs yet
+    if name.startswith(f"{STAGING_DIRECTORY}/"):
+        return ""
+
+    return name
+
+
+def count_blob_references(model, field_name):
+    """
+    Keeps the reference counts of the blobs in sync with the `field_name`
+    images of `model`. The name loaded with an instance is remembered so
+    that saving a changed image releases the previous one without a query.
+    """
+
+    attname = model._meta.get_field(field_name).attname
+    loaded_attr = f"_loaded_{attname}"
+
+    def remember_name(sender, instance, **kwargs):
+        # Missing when the field is deferred
+        if attname in instance.__dict__:
+            setattr(instance, loaded_attr, get_file_name(instance.__dict__[attname]))
+
+    def count_saved_name(sender, instance, created, update_fields, **kwargs):
+        if update_fields is not None and field_name not in update_fields:
+            return
+
+        if attname not in instance.__dict__:
+            return
+
+        name = get_file_name(instance.__dict__[attname])
+        previous = "" if created else getattr(instance, loaded_attr, name)
+
+        if name != previous:
+            MediaBlob.objects.acquire(name)
+            MediaBlob.objects.release(previous)
+
+        setattr(instance, loaded_attr, name)
+
+    def count_deleted_name(sender, instance, **kwargs):
+        MediaBlob.objects.release(getattr(instance, loaded_attr, ""))
+
+    post_init.connect(remember_name, sender=model, weak=False)
+    post_save.connect(count_saved_name, sender=model, weak=False)
+    post_delete.connect(count_deleted_name, sender=model, weak=False)
+
+
+def connect_media_blob_fields():
+    for model, field_name in MEDIA_BLOB_FIELDS:
+        count_blob_references(apps.get_model(model), field_name)
@@ -0,0 +1,81 @@
+from django.core.files.storage import FileSystemStorage
+from hashlib import sha256
+import os
+import posixpath
+import tempfile
+from .models import MediaBlob
+
+# Directory of the uploads waiting for `common.ingestion`
+STAGING_DIRECTORY = "staging"
+
+
+def is_staged(name):
+    """
+    Whether the media `name` is in the staging directory, or outside of
+    the media root, once its `.` and `..` segments are resolved.
+    """
+
+    name = posixpath.normpath(name.lstrip("/"))
+    return (
+        name in (STAGING_DIRECTORY, "..")
+        or name.startswith(f"{STAGING_DIRECTORY}/")
+        or name.startswith("../")
+    )
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage keeping each distinct upload once, named by the
+    SHA-256 of its content under `directory`, so that uploading the same
+    image again reuses the stored blob. Only the extension of the name
+    given by the `upload_to` of the field is kept.
+
+    The uploads are hashed while they are streamed to a temporary file,
+    which is then moved in place unless the blob already exists. The
+    references to the blobs are counted in `MediaBlob`.
+    """
+
+    directory = "images/blobs"
+    chunk_size = 64 * 1024
+
+    def get_available_name(self, name, max_length=None):
+        # Blobs are named after their content by `_save`
+        return name
+
+    def get_blob_name(self, digest, extension):
+        return f"{self.directory}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def _save(self, name, content):
+        extension = posixpath.splitext(name)[1].lower()
+        directory = self.path(self.directory)
+        os.makedirs(directory, exist_ok=True)
+
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        digest = sha256()
+        size = 0
+
+        try:
+            with os.fdopen(descriptor, "wb") as output:
+                for chunk in content.chunks(self.chunk_size):
+                    digest.update(chunk)
+                    output.write(chunk)
+                    size += len(chunk)
+
+            name = self.get_blob_name(digest.hexdigest(), extension)
+            # Before checking the blob, which the collection of a previous
+            # upload may be deleting
+            MediaBlob.objects.touch(name, size)
+
+            path = self.path(name)
+            if os.path.exists(path):
+                os.unlink(temporary_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temporary_path, self.file_permissions_mode or 0o644)
+                os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.unlink(temporary_path)
+            raise
+
+        return name
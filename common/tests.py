@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from bids.views import UserBidsListView
+from categories.models import Category
+from products.models import Product
+from user.models import User
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from .checks import check_throttle_cache
+from .throttling import TokenBucketThrottle
+
+
+class ClockThrottle(TokenBucketThrottle):
+    now = 1000.0
+
+    def timer(self):
+        return self.now
+
+
+@override_settings(
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {"bids": "2/min", "availability": "60/min"},
+    }
+)
+class ThrottleTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.creator = User.objects.create(username="creator", email="c@test.com")
+        self.bidder = User.objects.create(username="bidder", email="b@test.com")
+        self.products = [
+            Product.objects.create(
+                title="title",
+                description="description",
+                base_price=100,
+                creator=self.creator,
+                category=Category.objects.create(title=f"Category {i}"),
+                valid_till=datetime.now(tz=timezone.utc) + timedelta(weeks=1),
+            )
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.bidder)
+
+    def test_bid_placement_is_throttled_per_user(self):
+        for product in self.products[:2]:
+            response = self.client.post(
+                "/bids/", {"product_id": product.pk, "bid_amount": 200}
+            )
+            self.assertEqual(response.status_code, 201)
+
+        response = self.client.post(
+            "/bids/", {"product_id": self.products[2].pk, "bid_amount": 200}
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+        # Reading is not throttled, nor are the other users
+        self.assertEqual(self.client.get("/bids/").status_code, 200)
+        self.client.force_authenticate(self.creator)
+        response = self.client.post("/bids/", {"bid_amount": 200})
+        self.assertEqual(response.status_code, 400)
+
+    def test_bucket_refills_over_time(self):
+        throttle = ClockThrottle()
+        request = Request(APIRequestFactory().post("/bids/"))
+        request.user = self.bidder
+        view = UserBidsListView()
+
+        self.assertEqual(
+            [throttle.allow_request(request, view) for _ in range(3)],
+            [True, True, False],
+        )
+        self.assertAlmostEqual(throttle.wait(), 30)
+
+        throttle.now += 45
+        self.assertTrue(throttle.allow_request(request, view))
+        self.assertFalse(throttle.allow_request(request, view))
+        self.assertAlmostEqual(throttle.wait(), 15)
+
+    def test_abusive_client_is_rejected_without_queries(self):
+        client = APIClient()
+        statuses = [
+            client.post("/users/username-availability/", {"username": "x"}).status_code
+            for _ in range(100)
+        ]
+
+        self.assertEqual(statuses.count(200), 60)
+        self.assertEqual(statuses.count(429), 40)
+        with self.assertNumQueries(0):
+            client.post("/users/email-availability/", {"email": "x@test.com"})
+
+        self.client.force_authenticate(
+            User.objects.create(username="admin", is_staff=True)
+        )
+        stats = self.client.get("/throttles/stats/").json()
+        self.assertEqual(stats["availability"]["allowed"], 60)
+        self.assertEqual(stats["availability"]["throttled"], 41)
+
+    def test_concurrent_requests_share_the_bucket(self):
+        throttle = ClockThrottle()
+        request = Request(APIRequestFactory().post("/users/username-availability/"))
+        request.user = self.bidder
+        view = type("View", (), {"throttle_scope": "availability"})()
+
+        def take(_):
+            return ClockThrottle().allow_request(request, view)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            allowed = list(executor.map(take, range(200)))
+
+        self.assertEqual(allowed.count(True), 60)
+        self.assertFalse(throttle.allow_request(request, view))
+
+    def test_process_local_cache_is_reported(self):
+        self.assertIsInstance(caches[settings.THROTTLE_CACHE_ALIAS], LocMemCache)
+        self.assertEqual(
+            [warning.id for warning in check_throttle_cache(None)], ["common.W001"]
+        )
@@ -0,0 +1,147 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+import math
+import time
+
+
+def parse_rate(rate):
+    """
+    Parses a `"<requests>/<period>"` rate, e.g. `"30/min"`, into the
+    capacity of the bucket and its refill rate in tokens per second.
+    """
+
+    try:
+        num, period = rate.split("/")
+        capacity = int(num)
+        duration = {"s": 1, "m": 60, "h": 3600, "d": 86400}[period[0]]
+    except (AttributeError, ValueError, KeyError, IndexError):
+        raise ImproperlyConfigured(f"Invalid throttle rate {rate!r}")
+
+    return capacity, capacity / duration
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttles the requests of each user, or client IP when anonymous, per
+    `throttle_scope` of the views with a token bucket: a bucket holds up
+    to `<requests>` tokens, refilled continuously over `<period>` as set
+    in the `DEFAULT_THROTTLE_RATES`, and every request takes a token.
+
+    Only the token count and the time it was computed are stored per key,
+    in the `THROTTLE_CACHE_ALIAS` cache, along with the allowed and
+    throttled counters of each scope. The cache must be shared by the
+    processes, else each one has its own buckets. A bucket is updated under
+    a lock taken with `cache.add`, and the requests which cannot take it
+    within `lock_attempts` tries are throttled.
+    """
+
+    scope_attr = "throttle_scope"
+    prefix = "throttle"
+    timer = time.time
+    # Seconds before the lock of a bucket expires, in case its holder died
+    lock_timeout = 1
+    lock_attempts = 50
+    lock_delay = 0.001
+
+    def __init__(self):
+        self.wait_time = None
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        scope = getattr(view, self.scope_attr, None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+        if rate is None:
+            return True
+
+        capacity, refill_rate = parse_rate(rate)
+        key = f"{self.prefix}:{scope}:{self.get_ident_key(request)}"
+
+        if self.acquire_lock(key):
+            try:
+                allowed = self.take_token(key, capacity, refill_rate)
+            finally:
+                self.cache.delete(f"{key}:lock")
+        else:
+            # As many requests at once on a bucket are throttled anyway
+            allowed = False
+            self.wait_time = self.lock_timeout
+
+        self.count(scope, "allowed" if allowed else "throttled")
+
+        return allowed
+
+    def acquire_lock(self, key):
+        for _ in range(self.lock_attempts):
+            if self.cache.add(f"{key}:lock", 1, timeout=self.lock_timeout):
+                return True
+            time.sleep(self.lock_delay)
+
+        return False
+
+    def take_token(self, key, capacity, refill_rate):
+        now = self.timer()
+        tokens, updated_at = self.cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self.wait_time = (1 - tokens) / refill_rate
+
+        # A bucket left alone is full again once it expires
+        self.cache.set(
+            key, (tokens, now), timeout=math.ceil((capacity - tokens) / refill_rate) + 1
+        )
+
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+    def count(self, scope, name):
+        key = f"{self.prefix}:{scope}:{name}"
+
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 0, timeout=None)
+            self.cache.incr(key)
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Returns the allowed and throttled counters of each configured scope.
+        """
+
+        cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        scopes = list(api_settings.DEFAULT_THROTTLE_RATES)
+        counts = cache.get_many(
+            [
+                f"{cls.prefix}:{scope}:{name}"
+                for scope in scopes
+                for name in ("allowed", "throttled")
+            ]
+        )
+
+        return {
+            scope: {
+                "rate": api_settings.DEFAULT_THROTTLE_RATES[scope],
+                "allowed": counts.get(f"{cls.prefix}:{scope}:allowed", 0),
+                "throttled": counts.get(f"{cls.prefix}:{scope}:throttled", 0),
+            }
+            for scope in scopes
+        }
@@ -0,0 +1,64 @@
+from django.http import Http404
+from django.views import View
+from rest_framework.generics import RetrieveAPIView
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
+from PIL import Image
+from .images import VARIANT_FORMATS, VariantError, get_variant, get_variant_format
+from .media import serve_media
+from .storage import is_staged
+from .throttling import TokenBucketThrottle
+
+
+class ThrottleStatsView(RetrieveAPIView):
+    """
+    This resource returns the rate and the allowed and throttled request
+    counters of every throttle scope. Must be an admin to access.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(TokenBucketThrottle.get_stats(), status=HTTP_200_OK)
+
+
+class ImageVariantView(View):
+    """
+    Serves a sized variant of an uploaded image, generated on the first
+    request and read from the disk afterwards. The variants of a name
+    never change, so they are cacheable for good.
+    """
+
+    def get(self, request, variant, name):
+        if is_staged(name):
+            raise Http404("No such image variant")
+
+        try:
+            variant_name = get_variant(name, variant)
+        except (
+            VariantError,
+            OSError,
+            Image.DecompressionBombError,
+            Image.DecompressionBombWarning,
+        ):
+            # Unknown variant, missing, unreadable or too large original
+            raise Http404("No such image variant")
+
+        return serve_media(
+            request, variant_name, content_type=VARIANT_FORMATS[get_variant_format()][0]
+        )
+
+
+class MediaView(View):
+    """
+    Serves the uploaded media, with range and conditional requests and
+    cache headers, see `common.media.serve_media`. The staged uploads are
+    not served, as they still have their metadata.
+    """
+
+    def get(self, request, name):
+        if is_staged(name):
+            raise Http404("No such media file")
+
+        return serve_media(request, name)
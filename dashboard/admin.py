@@ -1,3 +1,22 @@
 from django.contrib import admin
+from .models import UserStats, UserCategoryStats
 
-# Register your models here.
+
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        "user",
+        "ongoing_auctions_count",
+        "completed_auctions_count",
+        "pending_bids_count",
+        "successful_bids_count",
+        "refresh_at",
+    )
+    readonly_fields = ("created_at", "updated_at")
+
+
+class UserCategoryStatsAdmin(admin.ModelAdmin):
+    list_display = ("user", "category", "product_count")
+
+
+admin.site.register(UserStats, UserStatsAdmin)
+admin.site.register(UserCategoryStats, UserCategoryStatsAdmin)
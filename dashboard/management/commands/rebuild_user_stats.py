@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from user.models import User
+from dashboard.models import UserStats
+
+
+class Command(BaseCommand):
+    help = "Recomputes the dashboard stats of every user from scratch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = 0
+
+        for user in User.objects.order_by("id").iterator(
+            chunk_size=options["batch_size"]
+        ):
+            UserStats.rebuild(user)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the stats of {count} users"))
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('user', '0003_user_profile_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('categories', '0003_category_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Updated At')),
+                ('ongoing_auctions_count', models.PositiveIntegerField(default=0)),
+                ('completed_auctions_count', models.PositiveIntegerField(default=0)),
+                ('pending_bids_count', models.PositiveIntegerField(default=0)),
+                ('successful_bids_count', models.PositiveIntegerField(default=0)),
+                ('refresh_at', models.DateTimeField(blank=True, help_text='When the next ongoing auction or pending bid of the user ends', null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='UserCategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='categories.category', verbose_name='Category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_stats', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'unique_together': {('user', 'category')},
+            },
+        ),
+    ]
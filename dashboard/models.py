@@ -0,0 +1,248 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, Min, Q, When
+from django.db.models.functions import Greatest
+from common.models import TimestampedModel
+from auctionwave.settings import AUTH_USER_MODEL
+from products.models import Product
+from bids.models import Bid, won_q
+from datetime import datetime, timezone
+
+
+class UserStats(TimestampedModel):
+    """
+    `UserStats` holds the dashboard counters of a `User`. They are updated
+    incrementally on product and bid events, except for the transitions
+    caused by time passing (an auction ending), which are recounted on
+    read once `refresh_at` is reached, and saved when the auction closes.
+    """
+
+    # Columns
+    ongoing_auctions_count = models.PositiveIntegerField(default=0)
+    completed_auctions_count = models.PositiveIntegerField(default=0)
+    pending_bids_count = models.PositiveIntegerField(default=0)
+    successful_bids_count = models.PositiveIntegerField(default=0)
+    refresh_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the next ongoing auction or pending bid of the user ends",
+    )
+
+    # Foreign keys
+    user = models.OneToOneField(
+        AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="User",
+    )
+
+    def __str__(self):
+        return f"Stats of {self.user_id}"
+
+    @classmethod
+    def for_user(cls, user, now=None):
+        """
+        Returns the up to date stats of `user` without writing them: the
+        stats not built yet are computed, and the counters past `refresh_at`
+        recounted, in memory. The closing of the ended auctions saves them.
+        """
+
+        if now is None:
+            now = datetime.now(tz=timezone.utc)
+
+        try:
+            stats = cls.objects.get(user=user)
+        except cls.DoesNotExist:
+            return cls.compute(user, now)
+
+        if stats.refresh_at is not None and stats.refresh_at <= now:
+            stats.count_time_dependent(now)
+
+        return stats
+
+    @classmethod
+    def compute(cls, user, now=None):
+        """
+        Counts the stats of `user` from scratch, without saving them.
+        """
+
+        if now is None:
+            now = datetime.now(tz=timezone.utc)
+
+        auctions = Product.objects.filter(creator=user).aggregate(
+            completed_count=Count("id", filter=Q(is_sold=True)),
+        )
+        bids = Bid.objects.filter(bidder=user).aggregate(
+            successful_count=Count("id", filter=Q(product__is_sold=True) & won_q()),
+        )
+
+        stats = cls(
+            user=user,
+            completed_auctions_count=auctions["completed_count"],
+            successful_bids_count=bids["successful_count"],
+        )
+        stats.count_time_dependent(now)
+
+        return stats
+
+    @classmethod
+    def rebuild(cls, user, now=None):
+        """
+        Recomputes every counter of `user` from scratch.
+        """
+
+        computed = cls.compute(user, now)
+
+        with transaction.atomic():
+            stats, _ = cls.objects.update_or_create(
+                user=user,
+                defaults={
+                    field: getattr(computed, field)
+                    for field in (
+                        "ongoing_auctions_count",
+                        "completed_auctions_count",
+                        "pending_bids_count",
+                        "successful_bids_count",
+                        "refresh_at",
+                    )
+                },
+            )
+
+            UserCategoryStats.objects.filter(user=user).delete()
+            UserCategoryStats.objects.bulk_create(
+                [
+                    UserCategoryStats(
+                        user=user,
+                        category_id=category["category_id"],
+                        product_count=category["product_count"],
+                    )
+                    for category in UserCategoryStats.compute(user)
+                ]
+            )
+
+        return stats
+
+    def count_time_dependent(self, now):
+        """
+        Recounts the ongoing auctions and pending bids, which change as
+        auctions end, and the next time they do.
+        """
+
+        auctions = Product.objects.filter(
+            creator_id=self.user_id, valid_till__gte=now
+        ).aggregate(count=Count("id"), ends_at=Min("valid_till"))
+        bids = Bid.objects.filter(
+            bidder_id=self.user_id, product__valid_till__gte=now
+        ).aggregate(count=Count("id"), ends_at=Min("product__valid_till"))
+
+        self.ongoing_auctions_count = auctions["count"]
+        self.pending_bids_count = bids["count"]
+        ends_at = [d for d in (auctions["ends_at"], bids["ends_at"]) if d is not None]
+        self.refresh_at = min(ends_at, default=None)
+
+    def refresh_time_dependent(self, now):
+        """
+        Recounts and saves the ongoing auctions and pending bids.
+        """
+
+        self.count_time_dependent(now)
+        self.save(
+            update_fields=[
+                "ongoing_auctions_count",
+                "pending_bids_count",
+                "refresh_at",
+                "updated_at",
+            ]
+        )
+
+    @classmethod
+    def refresh_ended(cls, user_ids, now=None):
+        """
+        Saves the recounted stats of the given users which are past their
+        `refresh_at`.
+        """
+
+        if now is None:
+            now = datetime.now(tz=timezone.utc)
+
+        for stats in cls.objects.filter(user_id__in=user_ids, refresh_at__lte=now):
+            stats.refresh_time_dependent(now)
+
+    @classmethod
+    def add(cls, user_id, refresh_at=None, **deltas):
+        """
+        Applies the given counter deltas to the stats of the user, if they
+        have been built, and moves `refresh_at` earlier if needed.
+        """
+
+        updates = {name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()}
+
+        if refresh_at is not None:
+            updates["refresh_at"] = Case(
+                When(
+                    Q(refresh_at__isnull=True) | Q(refresh_at__gt=refresh_at),
+                    then=refresh_at,
+                ),
+                default=F("refresh_at"),
+            )
+
+        cls.objects.filter(user_id=user_id).update(**updates)
+
+
+class UserCategoryStats(models.Model):
+    """
+    Number of products a `User` listed in a `Category`.
+    """
+
+    class Meta:
+        unique_together = (("user", "category"),)
+
+    # Columns
+    product_count = models.PositiveIntegerField(default=0)
+
+    # Foreign keys
+    user = models.ForeignKey(
+        AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="category_stats",
+        verbose_name="User",
+    )
+    category = models.ForeignKey(
+        "categories.Category",
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Category",
+    )
+
+    @classmethod
+    def compute(cls, user):
+        """
+        Counts the products of `user` per category from scratch, as the
+        `category_id`, `category__title` and `product_count` of each.
+        """
+
+        return (
+            Product.objects.filter(creator=user)
+            .values("category_id", "category__title")
+            .annotate(product_count=Count("id"))
+            .order_by("category_id")
+        )
+
+    @classmethod
+    def add(cls, user_id, category_id, delta):
+        if not UserStats.objects.filter(user_id=user_id).exists():
+            # Built from scratch on first use
+            return
+
+        updated = cls.objects.filter(user_id=user_id, category_id=category_id).update(
+            product_count=Greatest(F("product_count") + delta, 0)
+        )
+
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        user_id=user_id, category_id=category_id, product_count=delta
+                    )
+            except IntegrityError:
+                cls.add(user_id, category_id, delta)
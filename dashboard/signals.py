@@ -0,0 +1,110 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.models import Product
+from products.signals import auction_closed, product_sold
+from bids.models import Bid
+from user.models import User
+from datetime import datetime, timezone
+from .models import UserStats, UserCategoryStats
+
+
+def is_ongoing(product):
+    return product.valid_till >= datetime.now(tz=timezone.utc)
+
+
+def get_winning_bid_id(product):
+    # Until the auction is settled, the highest bid wins, as in `won_q`
+    if product.closed_at is not None:
+        return product.winning_bid_id
+
+    return product.highest_bid_id
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    # Nothing to count yet, the stats of the older users are built by
+    # the `rebuild_user_stats` command
+    if created and not kwargs.get("raw"):
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Product)
+def count_created_product(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    UserStats.add(
+        instance.creator_id,
+        refresh_at=instance.valid_till,
+        ongoing_auctions_count=int(is_ongoing(instance)),
+    )
+    UserCategoryStats.add(instance.creator_id, instance.category_id, 1)
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    UserStats.add(
+        instance.creator_id,
+        ongoing_auctions_count=-int(is_ongoing(instance)),
+        completed_auctions_count=-int(instance.is_sold),
+    )
+    UserCategoryStats.add(instance.creator_id, instance.category_id, -1)
+
+
+@receiver(product_sold)
+def count_sold_product(sender, instance, **kwargs):
+    UserStats.add(instance.creator_id, completed_auctions_count=1)
+
+    winner_id = (
+        Bid.objects.filter(pk=get_winning_bid_id(instance))
+        .values_list("bidder_id", flat=True)
+        .first()
+    )
+    if winner_id:
+        UserStats.add(winner_id, successful_bids_count=1)
+
+
+@receiver(auction_closed)
+def refresh_ended_stats(sender, product_ids, **kwargs):
+    UserStats.refresh_ended(
+        {
+            *Product.objects.filter(pk__in=product_ids).values_list(
+                "creator_id", flat=True
+            ),
+            *Bid.objects.filter(product_id__in=product_ids).values_list(
+                "bidder_id", flat=True
+            ),
+        }
+    )
+
+
+@receiver(post_save, sender=Bid)
+def count_placed_bid(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    product = instance.product
+    UserStats.add(
+        instance.bidder_id,
+        refresh_at=product.valid_till,
+        pending_bids_count=int(is_ongoing(product)),
+    )
+
+
+@receiver(post_delete, sender=Bid)
+def count_removed_bid(sender, instance, **kwargs):
+    # Use the product being deleted, if that is what removes the bid
+    product = kwargs.get("origin")
+    if not isinstance(product, Product) or product.pk != instance.product_id:
+        try:
+            product = instance.product
+        except Product.DoesNotExist:
+            return
+
+    UserStats.add(
+        instance.bidder_id,
+        pending_bids_count=-int(is_ongoing(product)),
+        successful_bids_count=-int(
+            product.is_sold and get_winning_bid_id(product) == instance.pk
+        ),
+    )
@@ -1,3 +1,185 @@
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from categories.models import Category
+from products.models import Product
+from products.services import close_auction, close_ended_auctions
+from products.signals import product_sold
+from bids.models import Bid
+from user.models import User
+from datetime import datetime, timezone, timedelta
+from io import StringIO
+from .models import UserStats, UserCategoryStats
 
-# Create your tests here.
+
+class DashboardTests(TestCase):
+    def setUp(self) -> None:
+        self.category = Category.objects.create(title="Car")
+        self.seller = User.objects.create(username="seller", email="s@test.com")
+        self.bidder = User.objects.create(username="bidder", email="b@test.com")
+        self.rival = User.objects.create(username="rival", email="r@test.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.bidder)
+
+    def create_auctions(self, count, sold=False):
+        for i in range(count):
+            product = Product.objects.create(
+                title="title",
+                description="description",
+                base_price=100,
+                creator=self.seller,
+                category=self.category,
+                valid_till=datetime.now(tz=timezone.utc) + timedelta(days=1),
+            )
+            Bid.objects.create(product=product, bidder=self.bidder, bid_amount=200)
+            Bid.objects.create(product=product, bidder=self.rival, bid_amount=200 + i)
+
+            if sold:
+                Product.objects.filter(pk=product.pk).update(
+                    valid_till=datetime.now(tz=timezone.utc) - timedelta(days=1),
+                    is_sold=True,
+                )
+
+    def get_dashboard(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/dashboard/")
+
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_stats(self):
+        self.create_auctions(3)
+        # The first sold auction is won by the bidder, the others are lost
+        self.create_auctions(3, sold=True)
+        # Counted from scratch, the sales are faked without their events
+        UserStats.objects.filter(user=self.bidder).delete()
+
+        data, _ = self.get_dashboard()
+
+        self.assertEqual(
+            data["stats"],
+            {
+                "ongoing_auctions_count": 0,
+                "completed_auctions_count": 0,
+                "pending_bids_count": 3,
+                "successful_bids_count": 1,
+            },
+        )
+        self.assertEqual(len(data["top_pending_bids"]), 3)
+
+    def test_dashboard_does_not_write(self):
+        self.create_auctions(2)
+        Product.objects.update(
+            valid_till=datetime.now(tz=timezone.utc) - timedelta(seconds=1)
+        )
+        UserStats.objects.update(
+            refresh_at=datetime.now(tz=timezone.utc) - timedelta(seconds=1)
+        )
+
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                data, _ = self.get_dashboard()
+
+            self.assertEqual(data["stats"]["pending_bids_count"], 0)
+            self.assertFalse([q for q in queries if not q["sql"].startswith("SELECT")])
+
+        # Saved once the ended auctions are closed
+        with self.captureOnCommitCallbacks(execute=True):
+            close_ended_auctions()
+        stats = UserStats.objects.get(user=self.bidder)
+        self.assertEqual(stats.pending_bids_count, 0)
+        self.assertIsNone(stats.refresh_at)
+
+    def test_query_count_does_not_grow_with_history(self):
+        # The stats are built on the first visit
+        self.get_dashboard()
+        self.create_auctions(2)
+        self.create_auctions(2, sold=True)
+        _, query_count = self.get_dashboard()
+
+        self.create_auctions(5)
+        self.create_auctions(5, sold=True)
+        _, larger_query_count = self.get_dashboard()
+
+        self.assertEqual(query_count, larger_query_count)
+
+
+class UserStatsTests(TestCase):
+    def setUp(self) -> None:
+        self.category = Category.objects.create(title="Car")
+        self.seller = User.objects.create(username="seller", email="s@test.com")
+        self.bidder = User.objects.create(username="bidder", email="b@test.com")
+        self.seller_stats = UserStats.rebuild(self.seller)
+        self.bidder_stats = UserStats.rebuild(self.bidder)
+
+    def create_product(self, **kwargs):
+        return Product.objects.create(
+            title="title",
+            description="description",
+            base_price=100,
+            creator=self.seller,
+            category=self.category,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(days=1),
+            **kwargs,
+        )
+
+    def assertStats(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for name, value in expected.items():
+            self.assertEqual(getattr(stats, name), value, name)
+
+    def test_counters_follow_events(self):
+        product = self.create_product()
+        bid = Bid.objects.create(product=product, bidder=self.bidder, bid_amount=200)
+
+        self.assertStats(self.seller, ongoing_auctions_count=1)
+        self.assertStats(self.bidder, pending_bids_count=1)
+        self.assertEqual(
+            UserCategoryStats.objects.get(user=self.seller).product_count, 1
+        )
+
+        product.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            close_auction(product)
+        product.is_sold = True
+        product.save()
+        product_sold.send(sender=Product, instance=product)
+
+        self.assertStats(self.seller, completed_auctions_count=1)
+        self.assertStats(self.bidder, successful_bids_count=1)
+
+        bid.delete()
+        self.assertStats(self.bidder, pending_bids_count=0)
+
+        product.delete()
+        self.assertStats(
+            self.seller, ongoing_auctions_count=0, completed_auctions_count=0
+        )
+        self.assertEqual(
+            UserCategoryStats.objects.get(user=self.seller).product_count, 0
+        )
+
+    def test_ended_auctions_are_refreshed_on_read(self):
+        product = self.create_product()
+        Bid.objects.create(product=product, bidder=self.bidder, bid_amount=200)
+
+        later = product.valid_till + timedelta(seconds=1)
+        stats = UserStats.for_user(self.bidder, now=later)
+
+        self.assertEqual(stats.pending_bids_count, 0)
+        self.assertIsNone(stats.refresh_at)
+        self.assertStats(self.bidder, pending_bids_count=1)
+
+    def test_rebuild_command(self):
+        self.create_product()
+        UserStats.objects.update(ongoing_auctions_count=10)
+        UserCategoryStats.objects.all().delete()
+
+        call_command("rebuild_user_stats", stdout=StringIO())
+
+        self.assertStats(self.seller, ongoing_auctions_count=1)
+        self.assertEqual(
+            UserCategoryStats.objects.get(user=self.seller).product_count, 1
+        )
@@ -5,8 +5,9 @@ from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
 from products.models import Product
 from bids.models import Bid
+from .models import UserStats, UserCategoryStats
 from datetime import datetime, timezone
-from django.db.models import F, Count, ExpressionWrapper, DecimalField
+from decimal import Decimal
 from products.serializers import ProductReadSerializer
 from bids.serializers import UserBidReadSerializer
 
@@ -17,39 +18,35 @@ class DashboardRetrieveView(RetrieveAPIView):
     @action(methods=["GET"], detail=False)
     def retrieve(self, request):
         user = request.user
+        now = datetime.now(tz=timezone.utc)
+
+        # Auction and bid counts, maintained incrementally
+        stats = UserStats.for_user(user=user, now=now)
 
         # Ongoing auctions
-        ongoing_auctions = self.get_ongoing_auctions(user=user)
         top_ongoing_auctions = ProductReadSerializer(
-            ongoing_auctions[:5], many=True, context={"request": request}
+            self.get_ongoing_auctions(user=user, now=now)[:5],
+            many=True,
+            context={"request": request},
         ).data
-        ongoing_auctions_count = ongoing_auctions.count()
-
-        # Completed auctions
-        completed_auctions = self.get_completed_auctions(user=user)
-        completed_auctions_count = completed_auctions.count()
 
         # Pending bids
-        pending_bids = self.get_pending_bids(user=user)
         top_pending_bids = UserBidReadSerializer(
-            pending_bids[:5], many=True, context={"request": request}
+            self.get_pending_bids(user=user, now=now)[:5],
+            many=True,
+            context={"request": request},
         ).data
-        pending_bids_count = pending_bids.count()
-
-        # Successful bids
-        successful_bids = self.get_successful_bids(user=user)
-        successful_bids_count = successful_bids.count()
 
         # Category counts
-        category_counts = self.get_category_counts(user=user)
+        category_counts = self.get_category_counts(user=user, stats=stats)
 
         return Response(
             data={
                 "stats": {
-                    "ongoing_auctions_count": ongoing_auctions_count,
-                    "completed_auctions_count": completed_auctions_count,
-                    "pending_bids_count": pending_bids_count,
-                    "successful_bids_count": successful_bids_count,
+                    "ongoing_auctions_count": stats.ongoing_auctions_count,
+                    "completed_auctions_count": stats.completed_auctions_count,
+                    "pending_bids_count": stats.pending_bids_count,
+                    "successful_bids_count": stats.successful_bids_count,
                 },
                 "top_ongoing_auctions": top_ongoing_auctions,
                 "top_pending_bids": top_pending_bids,
@@ -58,43 +55,45 @@ class DashboardRetrieveView(RetrieveAPIView):
             status=HTTP_200_OK,
         )
 
-    def get_ongoing_auctions(self, user):
-        return Product.objects.filter(
-            creator=user, valid_till__gte=datetime.now(tz=timezone.utc)
-        ).order_by("valid_till")
-
-    def get_completed_auctions(self, user):
-        return Product.objects.filter(creator=user, is_sold=True)
-
-    def get_pending_bids(self, user):
-        return Bid.objects.select_related("product").filter(
-            bidder=user, product__valid_till__gte=datetime.now(tz=timezone.utc)
+    def get_ongoing_auctions(self, user, now):
+        return (
+            Product.objects.filter(creator=user, valid_till__gte=now)
+            .order_by("valid_till")
+            .select_related("category", "creator", "highest_bid__bidder")
         )
 
-    def get_successful_bids(self, user):
-        successful_bids = Bid.objects.select_related("product").filter(
-            bidder=user,
-            product__is_sold=True,
+    def get_pending_bids(self, user, now):
+        return (
+            Bid.objects.select_related(
+                "product__category",
+                "product__creator",
+                "product__highest_bid__bidder",
+            )
+            .filter(bidder=user, product__valid_till__gte=now)
+            .with_product_rank()
+            .with_status(now)
         )
 
-        ids = [
-            b.id
-            for b in successful_bids.all()
-            if b.product.highest_bid != None and b.product.highest_bid.bidder == user
+    def get_category_counts(self, user, stats):
+        if stats._state.adding:
+            # Not built yet, counted from scratch
+            category_stats = UserCategoryStats.compute(user)
+        else:
+            category_stats = (
+                UserCategoryStats.objects.filter(user=user, product_count__gt=0)
+                .values("category_id", "category__title", "product_count")
+                .order_by("category_id")
+            )
+        total_product_count = sum(stats["product_count"] for stats in category_stats)
+
+        return [
+            {
+                "category__id": stats["category_id"],
+                "category__title": stats["category__title"],
+                "product_count": stats["product_count"],
+                "category_percentage": Decimal(
+                    stats["product_count"] * 100 // total_product_count
+                ).quantize(Decimal("0.01")),
+            }
+            for stats in category_stats
         ]
-
-        successful_bids = successful_bids.filter(pk__in=ids)
-
-        return successful_bids
-
-    def get_category_counts(self, user):
-        products = Product.objects.filter(creator=user)
-        total_product_count = products.count()
-        category_counts = products.values("category__id", "category__title").annotate(
-            product_count=Count("id"),
-            category_percentage=ExpressionWrapper(
-                F("product_count") * 100 / total_product_count,
-                output_field=DecimalField(max_digits=5, decimal_places=2),
-            ),
-        )
-        return category_counts
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Product
+from .search import get_search_backend, get_search_terms
 from bids.models import Bid
 
 
@@ -52,5 +53,11 @@ class ProductAdmin(admin.ModelAdmin):
     )
     inlines = (BidInline,)
 
+    def get_search_results(self, request, queryset, search_term):
+        if not get_search_terms(search_term):
+            return queryset, False
+
+        return get_search_backend(queryset.db).search(queryset, search_term), False
+
 
 admin.site.register(Product, ProductAdmin)
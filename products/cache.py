@@ -0,0 +1,230 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+from hashlib import sha256
+from urllib.parse import urlencode
+import time
+
+# Query parameters which change the content of a product list page
+PRODUCT_LIST_CACHE_PARAMS = (
+    "category",
+    "min_price",
+    "max_price",
+    "creator",
+    "exclude",
+    "status",
+    "search",
+    "ordering",
+    "page",
+    "page_size",
+    "cursor",
+)
+
+
+# Fields of a product which may add it to, remove it from or move it in
+# a list page, as opposed to the fields only shown in its entry
+PRODUCT_LIST_FIELDS = {
+    "title",
+    "description",
+    "base_price",
+    "valid_till",
+    "is_sold",
+    "closed_at",
+    "category",
+    "category_id",
+    "creator",
+    "creator_id",
+}
+
+# Orderings of the list by the bids of the products
+BID_ORDERING_FIELDS = ("bid_count", "highest_bid")
+
+
+class ProductListCache:
+    """
+    Caches the anonymous product list responses under the list version,
+    which is bumped by the changes that may add, remove or move products
+    in any page: product creations, deletions and edits of their
+    `PRODUCT_LIST_FIELDS`, sales, settlements and category edits.
+
+    Every page also records the version of each product it shows, bumped
+    by the bid writes and the other edits of the product, and is skipped
+    once one of them changed, so that a bid only invalidates the pages
+    showing its product. The pages ordered by the bids also depend on the
+    version of all the bids. Entries expire after a short timeout, as the
+    `time_left` of the products and the set of ongoing auctions change
+    with time.
+    """
+
+    prefix = "products:list"
+
+    def __init__(self, alias=None, timeout=None):
+        self._alias = alias
+        self._timeout = timeout
+
+    @property
+    def alias(self):
+        return self._alias or settings.PRODUCT_LIST_CACHE_ALIAS
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+
+        return settings.PRODUCT_LIST_CACHE_TIMEOUT
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def version_key(self):
+        return f"{self.prefix}:version"
+
+    @property
+    def bids_version_key(self):
+        return f"{self.prefix}:bids"
+
+    def get_product_version_key(self, product_id):
+        return f"{self.prefix}:product:{product_id}"
+
+    def get_versions(self, keys):
+        """
+        Returns the versions under `keys`, starting the missing ones.
+        """
+
+        versions = self.cache.get_many(keys)
+
+        for key in keys:
+            if key not in versions:
+                versions[key] = self.bump_version(key)
+
+        return versions
+
+    def bump_version(self, key=None):
+        key = key or self.version_key
+
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Start from the clock, so that a lost version number can
+            # not be reused by the entries cached before it was lost
+            version = time.time_ns()
+            self.cache.set(key, version, timeout=None)
+            return version
+
+    def bump_versions(self, keys, using=None):
+        """
+        Bumps the versions under `keys`, right away and again once the
+        current transaction commits, as readers may cache the old data
+        under the new versions until then.
+        """
+
+        def bump():
+            for key in keys:
+                self.bump_version(key)
+
+        bump()
+        transaction.on_commit(bump, using=using)
+
+    def invalidate(self, using=None):
+        """
+        Skips every cached page.
+        """
+
+        self.bump_versions([self.version_key], using=using)
+
+    def invalidate_product(self, product_id, bids=False, using=None):
+        """
+        Skips the cached pages showing the product, and with `bids` the
+        pages ordered by the bids.
+        """
+
+        keys = [self.get_product_version_key(product_id)]
+        if bids:
+            keys.append(self.bids_version_key)
+
+        self.bump_versions(keys, using=using)
+
+    def get_key(self, request):
+        params = sorted(
+            (name, value)
+            for name in PRODUCT_LIST_CACHE_PARAMS
+            for value in request.query_params.getlist(name)
+            if value != "" or name == "cursor"
+        )
+        digest = sha256(
+            f"{request.get_host()}?{urlencode(params)}".encode("utf-8")
+        ).hexdigest()
+
+        keys = [self.version_key]
+        ordering = request.query_params.get("ordering", "")
+        if any(field in ordering for field in BID_ORDERING_FIELDS):
+            keys.append(self.bids_version_key)
+
+        versions = self.get_versions(keys)
+        version = ".".join(str(versions[key]) for key in keys)
+
+        return f"{self.prefix}:{version}:{digest}"
+
+    def get_product_ids(self, data):
+        results = data.get("results", []) if isinstance(data, dict) else data
+        return [item["id"] for item in results]
+
+    def get_response(self, request, get_response):
+        """
+        Returns the cached response for the request, or the response of
+        `get_response()` after caching it if it was successful.
+        """
+
+        key = self.get_key(request)
+        entry = self.cache.get(key)
+
+        if entry is not None:
+            data, products = entry
+
+            if self.cache.get_many(list(products)) == products:
+                self.count("hits")
+                return Response(data, headers={"X-Cache": "HIT"})
+
+        self.count("misses")
+        response = get_response()
+
+        if response.status_code == 200:
+            products = self.get_versions(
+                [
+                    self.get_product_version_key(product_id)
+                    for product_id in self.get_product_ids(response.data)
+                ]
+            )
+            self.cache.set(key, (response.data, products), timeout=self.timeout)
+
+        response["X-Cache"] = "MISS"
+        return response
+
+    def count(self, name):
+        key = f"{self.prefix}:{name}"
+
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 0, timeout=None)
+            self.cache.incr(key)
+
+    def get_stats(self):
+        counts = self.cache.get_many([f"{self.prefix}:hits", f"{self.prefix}:misses"])
+        hits = counts.get(f"{self.prefix}:hits", 0)
+        misses = counts.get(f"{self.prefix}:misses", 0)
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+
+    def reset_stats(self):
+        self.cache.delete_many([f"{self.prefix}:hits", f"{self.prefix}:misses"])
+
+
+product_list_cache = ProductListCache()
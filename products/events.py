@@ -0,0 +1,141 @@
+from django.conf import settings
+from collections import defaultdict
+import asyncio
+import json
+import threading
+
+# Columns of the product sent with the bid events
+BID_EVENT_FIELDS = (
+    "bid_version",
+    "bid_count",
+    "highest_bid_id",
+    "highest_bid_amount",
+    "highest_bidder_id",
+)
+
+
+def format_event(event, data, id=None):
+    """
+    Encodes a Server-Sent Events frame.
+    """
+
+    lines = [f"event: {event}"]
+    if id is not None:
+        lines.append(f"id: {id}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+
+    return "\n".join(lines) + "\n\n"
+
+
+def bid_summary(product):
+    """
+    Returns the data of the bid events of `product`, either an instance
+    or a `values()` dict.
+    """
+
+    if isinstance(product, dict):
+        return {field: product[field] for field in BID_EVENT_FIELDS}
+
+    return {field: getattr(product, field) for field in BID_EVENT_FIELDS}
+
+
+def bid_event_name(previous, current):
+    """
+    Names the event going from the `previous` to the `current` bid
+    summary, or returns `None` if the change is not published.
+    """
+
+    if (previous["highest_bid_id"], previous["highest_bid_amount"]) != (
+        current["highest_bid_id"],
+        current["highest_bid_amount"],
+    ):
+        return "bid"
+
+    if previous["bid_count"] != current["bid_count"]:
+        return "bid-count"
+
+    return None
+
+
+class Subscription:
+    """
+    The queue of events of one client, bounded so that a slow client does
+    not make the server buffer without limit: when it is full the oldest
+    event is dropped, as every event carries the full bid summary.
+    """
+
+    def __init__(self, product_id, max_size):
+        self.product_id = product_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.dropped = 0
+
+    def push(self, event):
+        # Runs in the loop of the subscriber
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class ProductEventHub:
+    """
+    In-process fan-out of the product events to the subscribed streams.
+    Events are published from any thread, typically once a transaction
+    commits, and handed over to the event loop of each subscriber.
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, product_id):
+        subscription = Subscription(
+            product_id, max_size=settings.PRODUCT_EVENTS_QUEUE_SIZE
+        )
+
+        with self._lock:
+            self._subscriptions[product_id].add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.product_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.product_id]
+
+    def subscriber_count(self, product_id):
+        with self._lock:
+            return len(self._subscriptions.get(product_id, ()))
+
+    def publish_bids(self, product_id, previous, current):
+        event = bid_event_name(previous, current)
+
+        if event is not None:
+            self.publish(product_id, event, current, id=current["bid_version"])
+
+    def publish_closed(self, product_id, reason):
+        self.publish(product_id, "auction-closed", {"reason": reason})
+
+    def publish(self, product_id, event, data, id=None):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(product_id, ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.push, (event, data, id)
+                )
+            except RuntimeError:
+                # The loop of the subscriber is closed
+                self.unsubscribe(subscription)
+
+
+product_events = ProductEventHub()
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from products.services import close_ended_auctions
+import time
+
+
+class Command(BaseCommand):
+    help = "Settles the auctions which ended, recording their winning bid"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, checking for ended auctions every --interval",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5, help="Seconds between the checks"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            closed = close_ended_auctions(batch_size=options["batch_size"])
+
+            if closed or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Closed {closed} auctions"))
+
+            if not options["loop"]:
+                return
+
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_bid_summary(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    Bid = apps.get_model("bids", "Bid")
+
+    for product in Product.objects.all().iterator():
+        bids = Bid.objects.filter(product=product)
+        top_bid = bids.order_by("-bid_amount", "updated_at").first()
+        product.bid_count = bids.count()
+        product.highest_bid = top_bid
+        product.highest_bid_amount = top_bid.bid_amount if top_bid else None
+        product.highest_bidder_id = top_bid.bidder_id if top_bid else None
+        product.save(
+            update_fields=[
+                "bid_count",
+                "highest_bid",
+                "highest_bid_amount",
+                "highest_bidder",
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bids', '0002_alter_bid_bid_amount_alter_bid_bidder_and_more'),
+        ('products', '0006_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Bid Count'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='highest_bid',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='bids.bid', verbose_name='Highest Bid'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='highest_bid_amount',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Highest Bid Amount'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='highest_bidder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Highest Bidder'),
+        ),
+        migrations.RunPython(backfill_bid_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_bid_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_sold', 'valid_till'], name='products_pr_is_sold_806256_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['creator', 'is_sold', 'valid_till'], name='products_pr_creator_7f8350_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='bid_version',
+            field=models.PositiveIntegerField(default=0, help_text="Incremented on every change to the product's bids", verbose_name='Bid Version'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F
+from django.utils import timezone
+
+
+def settle_ended_auctions(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    Product.objects.filter(valid_till__lte=timezone.now()).update(
+        closed_at=F("valid_till"),
+        winning_bid=F("highest_bid"),
+        final_price=F("highest_bid_amount"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bids', '0003_keyset_pagination_indexes'),
+        ('products', '0010_product_bid_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Closed At'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='final_price',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Final Price'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='winning_bid',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='bids.bid', verbose_name='Winning Bid'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('closed_at__isnull', True)), fields=['valid_till'], name='product_open_valid_till_idx'),
+        ),
+        migrations.RunPython(settle_ended_auctions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+
+def create_product_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    # `IF NOT EXISTS` and the filled rows skipped for the databases where
+    # the index was created after `migrate` by the previous versions
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts USING fts5('
+            "title, description, category, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            'INSERT INTO products_product_fts (rowid, title, description, category) '
+            'SELECT p.id, p.title, p.description, c.title FROM products_product p '
+            'JOIN categories_category c ON c.id = p.category_id '
+            'WHERE p.id NOT IN (SELECT rowid FROM products_product_fts)'
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE IF NOT EXISTS products_product_search ('
+            'product_id bigint PRIMARY KEY REFERENCES products_product (id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS products_product_search_document_idx '
+            'ON products_product_search USING GIN (document)'
+        )
+        schema_editor.execute(
+            'INSERT INTO products_product_search (product_id, document) '
+            'SELECT p.id, '
+            "setweight(to_tsvector('simple', p.title), 'A') || "
+            "setweight(to_tsvector('simple', p.description), 'B') || "
+            "setweight(to_tsvector('simple', c.title), 'C') "
+            'FROM products_product p JOIN categories_category c ON c.id = p.category_id '
+            'ON CONFLICT (product_id) DO NOTHING'
+        )
+
+
+def drop_product_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS products_product_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS products_product_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0003_category_image'),
+        ('products', '0012_product_image_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_product_search_index, drop_product_search_index),
+    ]
@@ -1,10 +1,21 @@
 from django.db import models
-from common.models import TimestampedModel
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from common.models import IMAGE_STATUSES, TimestampedModel
 from datetime import datetime, timedelta, timezone
 from django.core.exceptions import ValidationError
 from auctionwave.settings import AUTH_USER_MODEL
+from bids.models import Bid, BID_RANKING
 import uuid
 
+BID_SUMMARY_FIELDS = [
+    "bid_count",
+    "bid_version",
+    "highest_bid",
+    "highest_bid_amount",
+    "highest_bidder",
+]
+
 
 def no_past(value):
     now = datetime.now(tz=timezone.utc)
@@ -18,12 +29,80 @@ def upload_to(instance, filename):
     return "images/products/{filename}.{ext}".format(filename=filename, ext=ext)
 
 
+PRODUCT_STATUSES = ("ongoing", "finished", "sold")
+
+
+def status_q(status, now=None):
+    """
+    Returns the `Q` matching the products whose `Product.status`
+    equals `status`, or `None` if `status` is not a known status.
+    """
+
+    if now is None:
+        now = datetime.now(tz=timezone.utc)
+
+    if status == "sold":
+        return Q(is_sold=True)
+    elif status == "ongoing":
+        return Q(is_sold=False, closed_at__isnull=True, valid_till__gt=now)
+    elif status == "finished":
+        return Q(is_sold=False) & (Q(closed_at__isnull=False) | Q(valid_till__lte=now))
+
+    return None
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_status(self, now=None):
+        """
+        Annotates `auction_status`, the SQL equivalent of `Product.status`,
+        so that it can be used for ordering, and so that the listed statuses
+        agree with `filter_status` when given the same `now`.
+        """
+
+        if now is None:
+            now = datetime.now(tz=timezone.utc)
+
+        return self.annotate(
+            auction_status=Case(
+                When(status_q("sold", now), then=Value("sold")),
+                When(status_q("ongoing", now), then=Value("ongoing")),
+                default=Value("finished"),
+                output_field=models.CharField(),
+            )
+        )
+
+    def filter_status(self, status, now=None):
+        q = status_q(status, now)
+
+        if q is None:
+            return self.none()
+
+        return self.filter(q)
+
+
 class Product(TimestampedModel):
     """
     `Product` is an item whose ad is created by the `User`.
     A `User` can create multiple `Product`s.
     """
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_sold", "valid_till"]),
+            models.Index(fields=["creator", "is_sold", "valid_till"]),
+            # Keyset pagination of the product lists
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["creator", "created_at", "id"]),
+            # Auctions to close, see `close_ended_auctions`
+            models.Index(
+                fields=["valid_till"],
+                condition=Q(closed_at__isnull=True),
+                name="product_open_valid_till_idx",
+            ),
+        ]
+
+    objects = ProductQuerySet.as_manager()
+
     # Columns
     title = models.CharField(max_length=100, verbose_name="Product Title")
     description = models.CharField(max_length=500, verbose_name="Product Description")
@@ -31,6 +110,29 @@ class Product(TimestampedModel):
     valid_till = models.DateTimeField(validators=[no_past], verbose_name="Valid Till")
     is_sold = models.BooleanField(default=False)
     image = models.ImageField(upload_to=upload_to)
+    image_status = models.CharField(
+        max_length=7,
+        choices=IMAGE_STATUSES,
+        default="ready",
+        verbose_name="Image Status",
+    )
+
+    # Bid summary, kept in sync with the product's bids by `update_bid_summary`
+    bid_count = models.PositiveIntegerField(default=0, verbose_name="Bid Count")
+    bid_version = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Bid Version",
+        help_text="Incremented on every change to the product's bids",
+    )
+    highest_bid_amount = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name="Highest Bid Amount"
+    )
+
+    # Auction outcome, settled once by `close_auction` after the auction ends
+    closed_at = models.DateTimeField(null=True, blank=True, verbose_name="Closed At")
+    final_price = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name="Final Price"
+    )
 
     # Foreign keys
     category = models.ForeignKey(
@@ -45,6 +147,30 @@ class Product(TimestampedModel):
         related_name="products",
         verbose_name="Creator",
     )
+    highest_bid = models.ForeignKey(
+        "bids.Bid",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Highest Bid",
+    )
+    highest_bidder = models.ForeignKey(
+        AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Highest Bidder",
+    )
+    winning_bid = models.ForeignKey(
+        "bids.Bid",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Winning Bid",
+    )
 
     def __str__(self):
         return f"{self.title} ({self.base_price})"
@@ -59,28 +185,50 @@ class Product(TimestampedModel):
         if self.is_available:
             time_left = self.valid_till - datetime.now(tz=timezone.utc)
 
-        return time_left
+        # In whole seconds, the detail ETag changes with it
+        return timedelta(seconds=int(time_left.total_seconds()))
 
     @property
-    def highest_bid(self):
-        if self.bids.count() == 0:
-            return None
-
-        return self.bids.order_by("-bid_amount")[0]
-
-    @property
-    def bid_count(self):
-        return self.bids.count()
+    def is_closed(self) -> bool:
+        # Until it is settled, an auction is closed once it ended
+        return self.closed_at is not None or not self.is_available
 
     @property
     def status(self):
+        # Keep in sync with `status_q`
         if self.is_sold:
             return "sold"
-        elif self.valid_till > datetime.now(tz=timezone.utc):
+        elif self.closed_at is None and self.valid_till > datetime.now(tz=timezone.utc):
             return "ongoing"
         else:
             return "finished"
 
+    def update_bid_summary(self):
+        """
+        Recomputes `bid_count` and the highest bid columns from the
+        product's bids in a single `UPDATE`, then reloads them on
+        this instance.
+        """
+        bids = Bid.objects.filter(product_id=OuterRef("pk"))
+        top_bid = bids.order_by(*BID_RANKING)[:1]
+
+        Product.objects.filter(pk=self.pk).update(
+            bid_count=Coalesce(
+                Subquery(
+                    bids.order_by()
+                    .values("product_id")
+                    .annotate(c=Count("pk"))
+                    .values("c")
+                ),
+                0,
+            ),
+            highest_bid=Subquery(top_bid.values("pk")),
+            highest_bid_amount=Subquery(top_bid.values("bid_amount")),
+            highest_bidder=Subquery(top_bid.values("bidder_id")),
+            bid_version=F("bid_version") + 1,
+        )
+        self.refresh_from_db(fields=BID_SUMMARY_FIELDS)
+
     # def clean(self):
     #     now = datetime.now(tz=timezone.utc)
     #     if self.valid_till < now:
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import FloatField, Value
+from django.db.models.query import Q
+from common.search import (
+    BackendSearchFilter,
+    BaseSearchBackend,
+    PostgresFTSBackend,
+    SQLiteFTSBackend,
+    get_search_terms,
+    load_search_backend,
+)
+
+VENDOR_SEARCH_BACKENDS = {
+    "sqlite": "products.search.SQLiteSearchBackend",
+    "postgresql": "products.search.PostgresSearchBackend",
+}
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS):
+    """
+    Returns the `PRODUCT_SEARCH_BACKEND` from the settings, or the
+    backend matching the database vendor if it is not set.
+    """
+
+    return load_search_backend(
+        getattr(settings, "PRODUCT_SEARCH_BACKEND", None),
+        VENDOR_SEARCH_BACKENDS,
+        "products.search.IContainsSearchBackend",
+        using,
+    )
+
+
+class ProductSearchBackend(BaseSearchBackend):
+    """
+    Indexes the title, description and category title of the products.
+    """
+
+    source = "products_product p JOIN categories_category c ON c.id = p.category_id"
+    id_column = "p.id"
+    ordering = ("-search_rank", "-created_at", "-id")
+
+    def update(self, product_ids=None, category_id=None):
+        """
+        (Re)indexes the given products, or the products of the given category.
+        """
+
+        if category_id is not None and product_ids is None:
+            self.index("WHERE p.category_id = %s", [category_id])
+        else:
+            self.index(*self.where_ids(product_ids))
+
+
+class IContainsSearchBackend(ProductSearchBackend):
+    """
+    Fallback backend without an index, every term must be contained in
+    one of the searched columns.
+    """
+
+    def search(self, queryset, search):
+        terms = get_search_terms(search)
+
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term)
+                | Q(description__icontains=term)
+                | Q(category__title__icontains=term)
+            )
+
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteSearchBackend(ProductSearchBackend, SQLiteFTSBackend):
+    """
+    Weights the title over the description and the description over the
+    category.
+    """
+
+    table = "products_product_fts"
+    columns = ("title", "description", "category")
+    values = ("p.title", "p.description", "c.title")
+    weights = (10.0, 5.0, 1.0)
+
+
+class PostgresSearchBackend(ProductSearchBackend, PostgresFTSBackend):
+    table = "products_product_search"
+    key_column = "product_id"
+    documents = (("p.title", "A"), ("p.description", "B"), ("c.title", "C"))
+
+
+class ProductSearchFilter(BackendSearchFilter):
+    """
+    `SearchFilter` replacement for products, ordered by relevance unless
+    the client asks for another ordering.
+    """
+
+    def get_backend(self, using):
+        return get_search_backend(using)
@@ -1,5 +1,9 @@
+from django.db import models
 from rest_framework import serializers
 from categories.serializers import CategorySerializer
+from common.images import ImageVariantsField
+from common.ingestion import StagedImageField
+from user.cache import get_full_user
 from user.serializers import UserSerializer
 from .models import Product
 from django.core.exceptions import ValidationError
@@ -25,16 +29,53 @@ class ProductBidsReadSerializer(serializers.ModelSerializer):
         exclude = ["product"]
 
 
+def prefetch_current_user_bids(products, user):
+    """
+    Loads the bids made by `user` on `products` in a single query and
+    attaches each one to its product as `current_user_bid_cache`, which
+    `ProductReadSerializer.get_current_user_bid` reads instead of querying.
+    Products which already have it attached are left untouched.
+    """
+
+    pending = [p for p in products if not hasattr(p, "current_user_bid_cache")]
+
+    if not pending:
+        return
+
+    bids = {}
+    if user.id:
+        user = get_full_user(user)
+        user_bids = Bid.objects.filter(bidder_id=user.id, product__in=pending)
+        for bid in user_bids.with_product_rank():
+            # The bidder is the current user, no need to fetch it again
+            bid.bidder = user
+            bids[bid.product_id] = bid
+
+    for product in pending:
+        bid = bids.get(product.pk)
+        if bid is not None:
+            bid.product = product
+        product.current_user_bid_cache = bid
+
+
+class ProductReadListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        products = list(data.all() if isinstance(data, models.Manager) else data)
+        prefetch_current_user_bids(products, self.context["request"].user)
+        return super().to_representation(products)
+
+
 class ProductReadSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     creator = UserSerializer(read_only=True)
+    image_variants = ImageVariantsField(source="image")
     is_available = serializers.BooleanField(read_only=True)
     time_left = serializers.CharField(read_only=True)
     highest_bid = ProductBidReadSerializer(read_only=True)
     current_user_bid = serializers.SerializerMethodField(read_only=True)
     bid_count = serializers.IntegerField(read_only=True)
     is_creator = serializers.SerializerMethodField()
-    status = serializers.CharField(read_only=True)
+    status = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -43,6 +84,8 @@ class ProductReadSerializer(serializers.ModelSerializer):
             "title",
             "description",
             "image",
+            "image_status",
+            "image_variants",
             "base_price",
             "valid_till",
             "is_sold",
@@ -54,6 +97,9 @@ class ProductReadSerializer(serializers.ModelSerializer):
             "highest_bid",
             "current_user_bid",
             "bid_count",
+            "closed_at",
+            "winning_bid",
+            "final_price",
             "is_creator",
             "created_at",
             "updated_at",
@@ -61,21 +107,39 @@ class ProductReadSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             "id": {"read_only": True},
             "highest_bid": {"read_only": True},
+            "winning_bid": {"read_only": True},
+            "image_status": {"read_only": True},
         }
+        list_serializer_class = ProductReadListSerializer
+
+    def to_representation(self, instance):
+        # The highest bid is ranked first by definition
+        if instance.highest_bid is not None:
+            instance.highest_bid.rank = 1
+
+        return super().to_representation(instance)
 
     def get_current_user_bid(self, obj):
         current_user = self.context["request"].user
 
-        if current_user.id:
-            try:
-                current_user_bid = obj.bids.get(bidder=current_user)
-                return ProductBidReadSerializer(current_user_bid).data
-            except Bid.DoesNotExist:
-                return None
+        if not current_user.id:
+            return None
+
+        prefetch_current_user_bids([obj], current_user)
+        current_user_bid = obj.current_user_bid_cache
 
-        else:
+        if current_user_bid is None:
             return None
 
+        return ProductBidReadSerializer(current_user_bid).data
+
+    def get_status(self, obj):
+        # Annotated by `ProductQuerySet.with_status`
+        if hasattr(obj, "auction_status"):
+            return obj.auction_status
+
+        return obj.status
+
     def get_is_creator(self, obj):
         current_user = self.context["request"].user
 
@@ -85,7 +149,7 @@ class ProductReadSerializer(serializers.ModelSerializer):
 
 
 class ProductWriteSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField(required=True)
+    image = StagedImageField(required=True)
 
     class Meta:
         model = Product
@@ -96,7 +160,9 @@ class ProductWriteSerializer(serializers.ModelSerializer):
             "base_price",
             "valid_till",
             "image",
+            "image_status",
         ]
+        extra_kwargs = {"image_status": {"read_only": True}}
 
     def validate(self, attrs):
         if attrs["valid_till"] < datetime.now(tz=timezone.utc):
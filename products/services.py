@@ -0,0 +1,84 @@
+from django.db import connections, transaction
+from django.db.models import F
+from datetime import datetime, timezone
+from .cache import product_list_cache
+from .models import Product
+from .signals import auction_closed
+
+
+def settle(queryset, now):
+    """
+    Closes the open auctions of `queryset`, recording their highest bid
+    as the winning bid, and returns how many were closed.
+    """
+
+    settled = queryset.filter(closed_at__isnull=True).update(
+        closed_at=now,
+        winning_bid=F("highest_bid"),
+        final_price=F("highest_bid_amount"),
+        updated_at=now,
+    )
+
+    # The update sends no signals
+    if settled:
+        product_list_cache.invalidate(using=queryset.db)
+
+    return settled
+
+
+def close_auction(product, now=None):
+    """
+    Settles the auction of `product` if it is not yet, e.g. when it is
+    sold before the scheduler got to it. Call it under the product's lock.
+    """
+
+    if product.closed_at is not None:
+        return
+
+    if now is None:
+        now = datetime.now(tz=timezone.utc)
+
+    if settle(Product.objects.filter(pk=product.pk), now):
+        product.refresh_from_db(
+            fields=["closed_at", "winning_bid", "final_price", "updated_at"]
+        )
+        transaction.on_commit(
+            lambda: auction_closed.send(sender=Product, product_ids=[product.pk])
+        )
+
+
+def close_ended_auctions(now=None, batch_size=100):
+    """
+    Settles the auctions which ended before `now`, oldest first and
+    `batch_size` per transaction, and returns how many were closed.
+    """
+
+    if now is None:
+        now = datetime.now(tz=timezone.utc)
+
+    closed = 0
+    while True:
+        with transaction.atomic():
+            queryset = Product.objects.filter(
+                closed_at__isnull=True, valid_till__lte=now
+            ).order_by("valid_till")
+
+            # Leave the products locked by a bid write or a sale to the next run
+            if connections[queryset.db].features.has_select_for_update_skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+
+            product_ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not product_ids:
+                break
+
+            closed += settle(Product.objects.filter(pk__in=product_ids), now)
+            transaction.on_commit(
+                lambda product_ids=product_ids: auction_closed.send(
+                    sender=Product, product_ids=product_ids
+                )
+            )
+
+        if len(product_ids) < batch_size:
+            break
+
+    return closed
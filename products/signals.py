@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver, Signal
+from categories.models import Category
+from bids.models import Bid
+from common.search import IndexedFields
+from .cache import PRODUCT_LIST_FIELDS, product_list_cache
+from .events import product_events
+from .models import Product
+from .search import get_search_backend
+
+# Sent with the `instance` once a product is marked as sold
+product_sold = Signal()
+
+# Sent with the `product_ids` of the auctions settled by `close_auction`
+auction_closed = Signal()
+
+
+# The columns of the products and of their category in the search index
+indexed_product_fields = IndexedFields(Product, ["title", "description", "category"])
+indexed_category_fields = IndexedFields(Category, ["title"])
+
+
+@receiver(post_init, sender=Product)
+def remember_indexed_product_fields(sender, instance, **kwargs):
+    indexed_product_fields.remember(instance)
+
+
+@receiver(post_init, sender=Category)
+def remember_indexed_category_fields(sender, instance, **kwargs):
+    indexed_category_fields.remember(instance)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, created, update_fields, using, **kwargs):
+    if indexed_product_fields.changed(instance, created, update_fields):
+        get_search_backend(using).update(product_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, using, **kwargs):
+    get_search_backend(using).remove([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def index_category_products(sender, instance, using, created, update_fields, **kwargs):
+    if not created and indexed_category_fields.changed(
+        instance, created, update_fields
+    ):
+        get_search_backend(using).update(category_id=instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_product_list_cache_on_save(
+    sender, instance, created, update_fields, using, **kwargs
+):
+    if created or update_fields is None or PRODUCT_LIST_FIELDS & update_fields:
+        product_list_cache.invalidate(using=using)
+    else:
+        # e.g. the processed image
+        product_list_cache.invalidate_product(instance.pk, using=using)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_product_list_cache(sender, using, **kwargs):
+    product_list_cache.invalidate(using=using)
+
+
+@receiver(post_save, sender=Bid)
+@receiver(post_delete, sender=Bid)
+def invalidate_product_list_cache_on_bid(sender, instance, using, **kwargs):
+    product_list_cache.invalidate_product(instance.product_id, bids=True, using=using)
+
+
+@receiver(product_sold)
+def publish_product_sold(sender, instance, **kwargs):
+    transaction.on_commit(lambda: product_events.publish_closed(instance.pk, "sold"))
+
+
+@receiver(auction_closed)
+def publish_auction_closed(sender, product_ids, **kwargs):
+    for product_id in product_ids:
+        product_events.publish_closed(product_id, "ended")
+
+
+@receiver(post_delete, sender=Product)
+def publish_product_deleted(sender, instance, using, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(
+        lambda: product_events.publish_closed(product_id, "deleted"), using=using
+    )
@@ -1,10 +1,35 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from asgiref.sync import sync_to_async
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
 from user.models import User
+from .cache import product_list_cache
+from .events import product_events
 from .models import Product
+from .serializers import prefetch_current_user_bids
+from .services import close_ended_auctions
+from .signals import auction_closed, product_sold
+from bids.models import Bid
+from bids.services import place_bid
 from categories.models import Category
+from common.models import MediaBlob
 from datetime import datetime, timedelta, timezone
+from io import BytesIO, StringIO
+from PIL import Image
+import os
+import shutil
+import tempfile
+import asyncio
+import json
 import time
+import warnings
 
 
 class ProductModelTests(TestCase):
@@ -89,3 +114,968 @@ class ProductModelTests(TestCase):
         self.assertEqual(product.is_available, True)
         time.sleep(SECONDS)
         self.assertEqual(product.is_available, False)
+
+    def test_filter_status_matches_status_property(self):
+        car_category = Category.objects.get(title="Car")
+        user1 = User.objects.get(username="testuser1")
+        now = datetime.now(tz=timezone.utc)
+
+        ongoing = Product.objects.create(
+            title="ongoing",
+            description="test",
+            base_price=1200,
+            valid_till=now + timedelta(days=1),
+            category=car_category,
+            creator=user1,
+        )
+        finished = Product.objects.create(
+            title="finished",
+            description="test",
+            base_price=1200,
+            valid_till=now + timedelta(days=1),
+            category=car_category,
+            creator=user1,
+        )
+        sold = Product.objects.create(
+            title="sold",
+            description="test",
+            base_price=1200,
+            valid_till=now + timedelta(days=1),
+            category=car_category,
+            creator=user1,
+        )
+        Product.objects.filter(pk__in=[finished.pk, sold.pk]).update(
+            valid_till=now - timedelta(days=1)
+        )
+        Product.objects.filter(pk=sold.pk).update(is_sold=True)
+
+        for product in Product.objects.with_status():
+            self.assertEqual(product.auction_status, product.status)
+
+        self.assertQuerysetEqual(
+            Product.objects.filter_status("ongoing"), [ongoing], ordered=False
+        )
+        self.assertQuerysetEqual(
+            Product.objects.filter_status("finished"), [finished], ordered=False
+        )
+        self.assertQuerysetEqual(
+            Product.objects.filter_status("sold"), [sold], ordered=False
+        )
+
+        client = APIClient()
+        client.force_authenticate(user1)
+        for status in ["ongoing", "finished", "sold"]:
+            response = client.get("/products/my/", {"status": status})
+            self.assertEqual(
+                [product["status"] for product in response.json()["results"]],
+                [status],
+            )
+        self.assertFalse(Product.objects.filter_status("unknown").exists())
+
+    def test_current_user_bids_are_loaded_in_one_query(self):
+        car_category = Category.objects.get(title="Car")
+        user1 = User.objects.get(username="testuser1")
+        user2 = User.objects.get(username="testuser2")
+        valid_till = datetime.now(tz=timezone.utc) + timedelta(days=1)
+        products = [
+            Product.objects.create(
+                title=f"test {i}",
+                description="test",
+                base_price=1200,
+                valid_till=valid_till,
+                category=car_category,
+                creator=user1,
+            )
+            for i in range(3)
+        ]
+        bid = Bid.objects.create(product=products[1], bidder=user2, bid_amount=1300)
+
+        products = list(Product.objects.all())
+        with self.assertNumQueries(1):
+            prefetch_current_user_bids(products, user2)
+
+        with self.assertNumQueries(0):
+            bids = [p.current_user_bid_cache for p in products]
+
+        self.assertEqual(bids, [None, bid, None])
+
+
+class ProductKeysetPaginationTests(TestCase):
+    def setUp(self) -> None:
+        category = Category.objects.create(title="Car")
+        user = User.objects.create(username="testuser1", email="testuser1@test.com")
+        valid_till = datetime.now(tz=timezone.utc) + timedelta(days=1)
+
+        for i in range(12):
+            Product.objects.create(
+                title=f"test {i}",
+                description="test",
+                base_price=1200,
+                valid_till=valid_till,
+                category=category,
+                creator=user,
+            )
+
+        # Force ties on the first ordering key
+        first = Product.objects.order_by("id").first()
+        Product.objects.filter(pk__lte=first.pk + 5).update(created_at=first.created_at)
+
+    def test_walk_forward_and_back(self):
+        client = APIClient()
+        expected = list(
+            Product.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+        url = "/products/?cursor=&page_size=5"
+        seen = []
+        while url:
+            response = client.get(url).json()
+            seen += [product["id"] for product in response["results"]]
+            last_page, url = response, response["next"]
+
+        self.assertEqual(seen, expected)
+
+        url = last_page["previous"]
+        seen = [product["id"] for product in last_page["results"]]
+        while url:
+            response = client.get(url).json()
+            seen = [product["id"] for product in response["results"]] + seen
+            url = response["previous"]
+
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        response = APIClient().get("/products/?cursor=invalid")
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self) -> None:
+        self.car = Category.objects.create(title="Car")
+        self.mobile = Category.objects.create(title="Mobile")
+        user = User.objects.create(username="testuser1", email="testuser1@test.com")
+        valid_till = datetime.now(tz=timezone.utc) + timedelta(days=1)
+
+        def create(title, description, category):
+            return Product.objects.create(
+                title=title,
+                description=description,
+                base_price=1200,
+                valid_till=valid_till,
+                category=category,
+                creator=user,
+            )
+
+        self.civic = create("Honda Civic", "A red sedan", self.car)
+        self.phone = create("Phone X", "Comes with a red case", self.mobile)
+        self.charger = create("Charger", "Fits every phone", self.mobile)
+
+    def search(self, query, **params):
+        response = APIClient().get("/products/", {"search": query, **params})
+        return [product["id"] for product in response.json()["results"]]
+
+    def test_search_ranks_title_matches_first(self):
+        self.assertEqual(self.search("red"), [self.civic.pk, self.phone.pk])
+        self.assertEqual(self.search("phone"), [self.phone.pk, self.charger.pk])
+
+    def test_search_matches_category_title(self):
+        self.assertEqual(self.search("mobile"), [self.charger.pk, self.phone.pk])
+
+    def test_search_keeps_other_filters(self):
+        self.assertEqual(self.search("red", category=self.car.pk), [self.civic.pk])
+
+    def test_index_follows_writes(self):
+        self.mobile.title = "Gadget"
+        self.mobile.save()
+        self.assertEqual(self.search("mobile"), [])
+        self.assertEqual(self.search("gadget"), [self.charger.pk, self.phone.pk])
+
+        self.civic.title = "Toyota Corolla"
+        self.civic.save()
+        self.assertEqual(self.search("corolla"), [self.civic.pk])
+
+        self.civic.delete()
+        self.assertEqual(self.search("red"), [self.phone.pk])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self.search('"red* -'), [self.civic.pk, self.phone.pk])
+
+    def test_saves_keeping_the_indexed_values_are_not_reindexed(self):
+        def index_queries(save):
+            with CaptureQueriesContext(connection) as queries:
+                save()
+            return [query for query in queries if "_fts" in query["sql"]]
+
+        product = Product.objects.get(pk=self.civic.pk)
+        product.base_price = 1500
+        self.assertEqual(index_queries(product.save), [])
+        self.assertEqual(
+            index_queries(lambda: product.save(update_fields=["is_sold"])), []
+        )
+        self.assertEqual(index_queries(self.car.save), [])
+
+        product.description = "A blue sedan"
+        self.assertNotEqual(index_queries(product.save), [])
+        self.assertEqual(self.search("blue"), [self.civic.pk])
+
+
+class ProductListCacheTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.category = Category.objects.create(title="Car")
+        self.user = User.objects.create(username="testuser1", email="t1@test.com")
+        self.bidder = User.objects.create(username="testuser2", email="t2@test.com")
+        self.product = Product.objects.create(
+            title="test",
+            description="test",
+            base_price=1200,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(days=1),
+            category=self.category,
+            creator=self.user,
+        )
+        self.client = APIClient()
+
+    def test_repeated_request_is_served_from_cache(self):
+        response = self.client.get("/products/", {"category": self.category.pk})
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        with self.assertNumQueries(0):
+            cached = self.client.get("/products/", {"category": self.category.pk})
+
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(cached.json(), response.json())
+
+        # Irrelevant and empty parameters share the entry, others do not
+        response = self.client.get(
+            "/products/", {"category": self.category.pk, "status": "", "utm": "x"}
+        )
+        self.assertEqual(response["X-Cache"], "HIT")
+        response = self.client.get("/products/", {"category": self.category.pk + 1})
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        self.assertEqual(
+            product_list_cache.get_stats(),
+            {"hits": 2, "misses": 2, "hit_ratio": 0.5},
+        )
+
+    def test_writes_invalidate_the_cache(self):
+        self.client.get("/products/")
+
+        Bid.objects.create(product=self.product, bidder=self.bidder, bid_amount=1500)
+        response = self.client.get("/products/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"][0]["bid_count"], 1)
+
+        self.category.title = "Cars"
+        self.category.save()
+        response = self.client.get("/products/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"][0]["category"]["title"], "Cars")
+
+        self.product.delete()
+        response = self.client.get("/products/")
+        self.assertEqual(response.json()["results"], [])
+
+    def test_bids_only_invalidate_the_pages_of_their_product(self):
+        other = Product.objects.create(
+            title="other",
+            description="other",
+            base_price=100,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(days=1),
+            category=Category.objects.create(title="Phone"),
+            creator=self.user,
+        )
+        self.client.get("/products/", {"category": self.category.pk})
+        self.client.get("/products/", {"category": other.category_id})
+        self.client.get("/products/", {"ordering": "-bid_count"})
+
+        Bid.objects.create(product=self.product, bidder=self.bidder, bid_amount=1500)
+
+        response = self.client.get("/products/", {"category": self.category.pk})
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"][0]["bid_count"], 1)
+        response = self.client.get("/products/", {"category": other.category_id})
+        self.assertEqual(response["X-Cache"], "HIT")
+        response = self.client.get("/products/", {"ordering": "-bid_count"})
+        self.assertEqual(response["X-Cache"], "MISS")
+
+    def test_settled_auctions_invalidate_the_cache(self):
+        self.client.get("/products/", {"status": "ongoing"})
+
+        close_ended_auctions(now=self.product.valid_till + timedelta(seconds=1))
+
+        response = self.client.get("/products/", {"status": "ongoing"})
+        self.assertEqual(response["X-Cache"], "MISS")
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        self.client.force_authenticate(self.bidder)
+        response = self.client.get("/products/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("X-Cache"))
+        self.assertEqual(product_list_cache.get_stats()["misses"], 0)
+
+    def test_stats_require_admin(self):
+        self.assertEqual(self.client.get("/products/cache/stats/").status_code, 401)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/products/cache/stats/").status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get("/products/cache/stats/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["hits"], 0)
+
+
+class ProductConditionalGetTests(TestCase):
+    def setUp(self) -> None:
+        category = Category.objects.create(title="Car")
+        self.user = User.objects.create(username="testuser1", email="t1@test.com")
+        self.bidder = User.objects.create(username="testuser2", email="t2@test.com")
+        self.product = Product.objects.create(
+            title="test",
+            description="test",
+            base_price=1200,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(days=1),
+            category=category,
+            creator=self.user,
+        )
+        self.client = APIClient()
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_unchanged_resources_are_not_modified(self):
+        # The detail changes every second with its `time_left`
+        time.sleep(1 - time.time() % 1)
+
+        for url in [
+            f"/products/{self.product.pk}/",
+            f"/products/{self.product.pk}/bids/",
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotModified(url, response["ETag"])
+
+    def test_bid_writes_change_the_etags(self):
+        detail_etag = self.client.get(f"/products/{self.product.pk}/")["ETag"]
+        bids_etag = self.client.get(f"/products/{self.product.pk}/bids/")["ETag"]
+
+        bid = Bid.objects.create(
+            product=self.product, bidder=self.bidder, bid_amount=1500
+        )
+        bid.bid_amount = 1600
+        bid.save()
+
+        response = self.client.get(
+            f"/products/{self.product.pk}/bids/", HTTP_IF_NONE_MATCH=bids_etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["bid_amount"], 1600)
+
+        response = self.client.get(
+            f"/products/{self.product.pk}/", HTTP_IF_NONE_MATCH=detail_etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], detail_etag)
+
+    def test_detail_etag_changes_with_time(self):
+        url = f"/products/{self.product.pk}/"
+        first = self.client.get(url)
+        time.sleep(1)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()["time_left"], first.json()["time_left"])
+
+    def test_detail_etag_depends_on_the_user(self):
+        etag = self.client.get(f"/products/{self.product.pk}/")["ETag"]
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(
+            f"/products/{self.product.pk}/", HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["is_creator"])
+
+
+class ProductEventsTests(TestCase):
+    def setUp(self) -> None:
+        category = Category.objects.create(title="Car")
+        self.user = User.objects.create(username="testuser1", email="t1@test.com")
+        self.bidders = [
+            User.objects.create(username=f"bidder{i}", email=f"b{i}@test.com")
+            for i in range(2)
+        ]
+        self.product = Product.objects.create(
+            title="test",
+            description="test",
+            base_price=1200,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(days=1),
+            category=category,
+            creator=self.user,
+        )
+
+    async def open_stream(self):
+        response = await self.async_client.get(f"/products/{self.product.pk}/events/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return response.streaming_content
+
+    async def next_event(self, stream):
+        frame = (await asyncio.wait_for(anext(stream), timeout=5)).decode()
+        if frame.startswith((":", "retry:")):
+            return frame.strip(), None
+
+        fields = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+        return fields["event"], json.loads(fields["data"])
+
+    def commit(self, func, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return func(*args, **kwargs)
+
+    async def test_bid_events_are_pushed(self):
+        stream = await self.open_stream()
+        event, data = await self.next_event(stream)
+        self.assertEqual((event, data["bid_count"]), ("bid", 0))
+
+        await sync_to_async(self.commit)(
+            place_bid, self.product.pk, self.bidders[0], 1500
+        )
+        event, data = await self.next_event(stream)
+        self.assertEqual((event, data["highest_bid_amount"]), ("bid", 1500))
+
+        await sync_to_async(self.commit)(
+            place_bid, self.product.pk, self.bidders[1], 1300
+        )
+        event, data = await self.next_event(stream)
+        self.assertEqual((event, data["bid_count"]), ("bid-count", 2))
+
+        await sync_to_async(self.commit)(
+            product_sold.send, sender=Product, instance=self.product
+        )
+        event, data = await self.next_event(stream)
+        self.assertEqual((event, data), ("auction-closed", {"reason": "sold"}))
+
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(product_events.subscriber_count(self.product.pk), 0)
+
+    @override_settings(PRODUCT_EVENTS_HEARTBEAT=0.01)
+    async def test_heartbeat_and_auction_end(self):
+        await Product.objects.filter(pk=self.product.pk).aupdate(
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(seconds=0.5)
+        )
+        stream = await self.open_stream()
+        await self.next_event(stream)
+
+        self.assertEqual(await self.next_event(stream), (": heartbeat", None))
+
+        while (event := await self.next_event(stream))[0] == ": heartbeat":
+            pass
+        self.assertEqual(event, ("auction-closed", {"reason": "ended"}))
+
+    @override_settings(PRODUCT_EVENTS_HEARTBEAT=0.01, PRODUCT_EVENTS_MAX_AGE=0.1)
+    async def test_streams_are_closed_after_max_age(self):
+        stream = await self.open_stream()
+        await self.next_event(stream)
+
+        while (event := await self.next_event(stream))[0] == ": heartbeat":
+            pass
+        self.assertEqual(event, ("retry: 1000", None))
+
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(product_events.subscriber_count(self.product.pk), 0)
+
+    @override_settings(PRODUCT_EVENTS_QUEUE_SIZE=2)
+    async def test_slow_subscribers_drop_the_oldest_events(self):
+        subscription = product_events.subscribe(self.product.pk)
+
+        for i in range(3):
+            subscription.push(("bid", {"bid_version": i}, i))
+
+        self.assertEqual(subscription.dropped, 1)
+        self.assertEqual((await subscription.get(timeout=1))[2], 1)
+        product_events.unsubscribe(subscription)
+
+    async def test_unknown_product(self):
+        response = await self.async_client.get("/products/0/events/")
+        self.assertEqual(response.status_code, 404)
+
+
+class AuctionClosingTests(TestCase):
+    def setUp(self) -> None:
+        self.category = Category.objects.create(title="Car")
+        self.user = User.objects.create(username="testuser1", email="t1@test.com")
+        self.bidders = [
+            User.objects.create(username=f"bidder{i}", email=f"b{i}@test.com")
+            for i in range(2)
+        ]
+
+    def create_product(self, bid_amounts=(), ended=True):
+        product = Product.objects.create(
+            title="test",
+            description="test",
+            base_price=1200,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(days=1),
+            category=self.category,
+            creator=self.user,
+        )
+        for bidder, bid_amount in zip(self.bidders, bid_amounts):
+            Bid.objects.create(product=product, bidder=bidder, bid_amount=bid_amount)
+
+        if ended:
+            Product.objects.filter(pk=product.pk).update(
+                valid_till=datetime.now(tz=timezone.utc) - timedelta(minutes=1)
+            )
+
+        product.refresh_from_db()
+        return product
+
+    def test_ended_auctions_are_settled_in_batches(self):
+        products = [self.create_product((1300, 1500)) for _ in range(3)]
+        unsold = self.create_product()
+        ongoing = self.create_product((1300,), ended=False)
+        closed = []
+
+        def receiver(sender, product_ids, **kwargs):
+            closed.extend(product_ids)
+
+        auction_closed.connect(receiver)
+        self.addCleanup(auction_closed.disconnect, receiver)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(close_ended_auctions(batch_size=2), 4)
+
+        self.assertEqual(sorted(closed), sorted(p.pk for p in products + [unsold]))
+        for product in products:
+            product.refresh_from_db()
+            self.assertIsNotNone(product.closed_at)
+            self.assertEqual(product.winning_bid, product.highest_bid)
+            self.assertEqual(product.final_price, 1500)
+
+        unsold.refresh_from_db()
+        self.assertIsNotNone(unsold.closed_at)
+        self.assertIsNone(unsold.winning_bid)
+        ongoing.refresh_from_db()
+        self.assertIsNone(ongoing.closed_at)
+
+        self.assertEqual(close_ended_auctions(), 0)
+
+    def test_settled_winner_is_used_by_the_reads(self):
+        product = self.create_product((1300, 1500))
+        call_command("close_auctions", stdout=StringIO())
+        winning_bid = product.highest_bid
+
+        # Later changes to the bids do not change the outcome
+        Product.objects.filter(pk=product.pk).update(highest_bid=None)
+
+        statuses = dict(
+            Bid.objects.filter(product=product)
+            .with_status()
+            .values_list("id", "status")
+        )
+        self.assertEqual(statuses.pop(winning_bid.pk), "won")
+        self.assertEqual(list(statuses.values()), ["lost"])
+
+    def test_selling_settles_the_auction(self):
+        product = self.create_product((1300, 1500))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.patch(f"/products/sell/{product.pk}/")
+
+        self.assertEqual(response.status_code, 200)
+        product.refresh_from_db()
+        self.assertTrue(product.is_sold)
+        self.assertEqual(product.winning_bid, product.highest_bid)
+        self.assertEqual(product.final_price, 1500)
+
+
+class ProductImageVariantTests(TestCase):
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        buffer = BytesIO()
+        Image.new("RGB", (2400, 1200), "red").save(buffer, "JPEG")
+        self.user = User.objects.create(username="testuser1", email="t1@test.com")
+        self.product = Product.objects.create(
+            title="test",
+            description="test",
+            base_price=1200,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(days=1),
+            category=Category.objects.create(title="Car"),
+            creator=self.user,
+            image=SimpleUploadedFile("car.jpg", buffer.getvalue()),
+        )
+        self.client = APIClient()
+
+    def get_variant(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        return Image.open(BytesIO(b"".join(response.streaming_content)))
+
+    def test_variants_are_generated_once_within_their_preset(self):
+        variants = self.client.get(f"/products/{self.product.pk}/").json()[
+            "image_variants"
+        ]
+        self.assertEqual(list(variants), ["thumb", "card", "full"])
+
+        self.assertEqual(self.get_variant(variants["card"]).size, (480, 240))
+        self.assertEqual(self.get_variant(variants["full"]).size, (1600, 800))
+
+        root = os.path.splitext(self.product.image.path)[0]
+        path = f"{root}.card-480x480q80.webp"
+        self.assertTrue(os.path.exists(path))
+        modified = os.stat(path).st_mtime_ns
+
+        self.assertEqual(self.get_variant(variants["card"]).size, (480, 240))
+        self.assertEqual(os.stat(path).st_mtime_ns, modified)
+
+    def test_unknown_variants_are_not_found(self):
+        name = self.product.image.name
+
+        for url in [
+            f"/images/huge/{name}",
+            "/images/card/images/products/missing.jpg",
+            f"/images/card/{os.path.splitext(name)[0]}.card-480x480q80.webp",
+            "/images/card/../settings.py",
+        ]:
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_decompression_bombs_are_not_found(self):
+        self.addCleanup(setattr, Image, "MAX_IMAGE_PIXELS", Image.MAX_IMAGE_PIXELS)
+        url = f"/images/card/{self.product.image.name}"
+
+        # Past twice the limit Pillow raises, past the limit it warns
+        for max_pixels in (1000, 2400 * 1200 - 1):
+            Image.MAX_IMAGE_PIXELS = max_pixels
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", Image.DecompressionBombWarning)
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class MediaViewTests(TestCase):
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.content = bytes(range(256)) * 16
+        self.name = default_storage.save("images/car.png", ContentFile(self.content))
+        self.client = APIClient()
+
+    def get(self, name=None, **headers):
+        return self.client.get(f"/media/{name or self.name}", **headers)
+
+    def test_files_are_served_with_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response["Content-Length"], str(len(self.content)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+
+        cached = self.get(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+        cached = self.get(HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_files_not_named_by_content_are_revalidated(self):
+        name = FileSystemStorage().save("legacy/car.png", ContentFile(self.content))
+
+        response = self.get(name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+
+    def test_range_requests(self):
+        for header, start, end in [
+            ("bytes=0-99", 0, 99),
+            ("bytes=4000-", 4000, 4095),
+            ("bytes=-10", 4086, 4095),
+            ("bytes=4000-9999", 4000, 4095),
+        ]:
+            response = self.get(HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response["Content-Range"], f"bytes {start}-{end}/4096")
+            self.assertEqual(response["Content-Length"], str(end - start + 1))
+            self.assertEqual(
+                b"".join(response.streaming_content), self.content[start : end + 1]
+            )
+
+        response = self.get(HTTP_RANGE="bytes=5000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */4096")
+
+        # Multiple ranges and stale validators get the whole file
+        for headers in [
+            {"HTTP_RANGE": "bytes=0-1,5-6"},
+            {"HTTP_RANGE": "bytes=0-1", "HTTP_IF_RANGE": '"stale"'},
+        ]:
+            self.assertEqual(self.get(**headers).status_code, 200)
+
+        etag = self.get()["ETag"]
+        response = self.get(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    @override_settings(MEDIA_SENDFILE="x-accel-redirect")
+    def test_files_are_sent_by_the_proxy(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.name}")
+        self.assertEqual(response["Content-Type"], "image/png")
+
+        with override_settings(MEDIA_SENDFILE="x-sendfile"):
+            response = self.get()
+        self.assertEqual(response["X-Sendfile"], default_storage.path(self.name))
+
+    def test_missing_and_staged_files_are_not_found(self):
+        FileSystemStorage().save("staging/upload.png", ContentFile(self.content))
+
+        for name in [
+            "images/missing.png",
+            "staging/upload.png",
+            "./staging/upload.png",
+            "images/../staging/upload.png",
+            "images//..//staging/upload.png",
+            "../manage.py",
+        ]:
+            self.assertEqual(self.get(name).status_code, 404)
+
+    def test_staged_files_have_no_variants(self):
+        buffer = BytesIO()
+        Image.new("RGB", (64, 64), "red").save(buffer, "PNG")
+        name = FileSystemStorage().save(
+            "staging/upload.png", ContentFile(buffer.getvalue())
+        )
+
+        for prefix in ["", "./", "images/../"]:
+            response = self.client.get(f"/images/thumb/{prefix}{name}")
+            self.assertEqual(response.status_code, 404)
+
+
+class MediaBlobTests(TestCase):
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create(username="testuser1", email="t1@test.com")
+        self.category = Category.objects.create(title="Car")
+
+    def upload(self, color):
+        buffer = BytesIO()
+        Image.new("RGB", (64, 64), color).save(buffer, "PNG")
+        return SimpleUploadedFile("photo.PNG", buffer.getvalue())
+
+    def create_product(self, color):
+        return Product.objects.create(
+            title="test",
+            description="test",
+            base_price=1200,
+            valid_till=datetime.now(tz=timezone.utc) + timedelta(days=1),
+            category=self.category,
+            creator=self.user,
+            image=self.upload(color),
+        )
+
+    def ref_counts(self):
+        return dict(MediaBlob.objects.values_list("name", "ref_count"))
+
+    def test_identical_uploads_share_a_blob(self):
+        first = self.create_product("red")
+        second = self.create_product("red")
+        self.user.profile_image = self.upload("red")
+        self.user.save()
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.user.profile_image.name, first.image.name)
+        self.assertTrue(first.image.name.startswith("images/blobs/"))
+        self.assertTrue(first.image.name.endswith(".png"))
+        self.assertEqual(self.ref_counts(), {first.image.name: 3})
+        self.assertEqual(len(os.listdir(os.path.dirname(first.image.path))), 1)
+
+    def test_replaced_and_deleted_images_are_released(self):
+        product = self.create_product("red")
+        red = product.image.name
+
+        product = Product.objects.get(pk=product.pk)
+        product.image = self.upload("blue")
+        product.save()
+        blue = product.image.name
+        self.assertEqual(self.ref_counts(), {red: 0, blue: 1})
+
+        Product.objects.get(pk=product.pk).delete()
+        self.assertEqual(self.ref_counts(), {red: 0, blue: 0})
+
+    def test_unreferenced_blobs_are_collected_after_the_grace_period(self):
+        kept = self.create_product("red")
+        deleted = self.create_product("blue")
+        path = deleted.image.path
+        self.client.get(f"/images/thumb/{deleted.image.name}")
+        deleted.delete()
+
+        call_command("collect_media_blobs", stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("collect_media_blobs", grace=0, stdout=StringIO())
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(os.listdir(os.path.dirname(path)), [])
+        self.assertEqual(self.ref_counts(), {kept.image.name: 1})
+        self.assertTrue(os.path.exists(kept.image.path))
+
+    def test_files_are_deleted_once_the_collection_commits(self):
+        product = self.create_product("red")
+        path = product.image.path
+        product.delete()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            call_command("collect_media_blobs", grace=0, stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.ref_counts(), {})
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(os.path.exists(path))
+
+    def test_blobs_uploaded_again_during_the_collection_are_kept(self):
+        product = self.create_product("red")
+        name, path = product.image.name, product.image.path
+        product.delete()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            call_command("collect_media_blobs", grace=0, stdout=StringIO())
+
+        # The same image is uploaded before the collection commits: the
+        # upload finds the file in place and keeps it
+        again = self.create_product("red")
+        self.assertEqual(again.image.name, name)
+
+        for callback in callbacks:
+            callback()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.ref_counts(), {name: 1})
+
+    def test_recount_restores_the_references(self):
+        product = self.create_product("red")
+        MediaBlob.objects.all().delete()
+
+        call_command("collect_media_blobs", recount=True, grace=0, stdout=StringIO())
+
+        self.assertEqual(self.ref_counts(), {product.image.name: 1})
+        self.assertTrue(os.path.exists(product.image.path))
+
+
+@override_settings(IMAGE_INGESTION_WORKERS=0)
+class ProductImageIngestionTests(TestCase):
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create(username="testuser1", email="t1@test.com")
+        self.category = Category.objects.create(title="Car")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_product(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/products/",
+                {
+                    "title": "test",
+                    "description": "test",
+                    "category": self.category.pk,
+                    "base_price": 1200,
+                    "valid_till": (
+                        datetime.now(tz=timezone.utc) + timedelta(days=1)
+                    ).isoformat(),
+                    "image": SimpleUploadedFile("photo.jpg", content),
+                },
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["image_status"], "pending")
+        self.assertTrue(
+            response.json()["image"].startswith("http://testserver/media/staging/")
+        )
+
+        return Product.objects.get()
+
+    def test_images_are_reencoded_upright_without_exif(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 degrees
+        exif[0x010F] = "Camera"
+        buffer = BytesIO()
+        Image.new("RGB", (40, 20), "red").save(buffer, "JPEG", exif=exif.tobytes())
+
+        product = self.create_product(buffer.getvalue())
+
+        self.assertEqual(product.image_status, "ready")
+        self.assertTrue(product.image.name.startswith("images/blobs/"))
+        with Image.open(product.image.path) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertEqual(dict(image.getexif()), {})
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "staging")), [])
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+
+        response = self.client.get(f"/products/{product.pk}/")
+        self.assertEqual(response.json()["image_status"], "ready")
+        self.assertIsNotNone(response.json()["image_variants"])
+
+    def test_invalid_images_are_rejected(self):
+        product = self.create_product(b"not an image")
+
+        self.assertEqual(product.image_status, "failed")
+        self.assertEqual(product.image.name, "")
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "staging")), [])
+
+    @override_settings(IMAGE_INGESTION_MAX_PIXELS=40 * 20 - 1)
+    def test_oversized_images_are_rejected(self):
+        buffer = BytesIO()
+        Image.new("RGB", (40, 20), "red").save(buffer, "PNG")
+
+        product = self.create_product(buffer.getvalue())
+
+        self.assertEqual(product.image_status, "failed")
+        self.assertEqual(product.image.name, "")
+
+    @override_settings(IMAGE_INGESTION_MAX_SIZE=(100, 100))
+    def test_large_jpegs_are_shrunk(self):
+        buffer = BytesIO()
+        Image.new("RGB", (800, 400), "red").save(buffer, "JPEG")
+
+        product = self.create_product(buffer.getvalue())
+
+        self.assertEqual(product.image_status, "ready")
+        with Image.open(product.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    def test_unsupported_extensions_are_refused(self):
+        response = self.client.post(
+            "/products/", {"image": SimpleUploadedFile("photo.svg", b"<svg/>")}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.json())
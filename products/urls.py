@@ -7,15 +7,19 @@ from .views import (
     ProductBidsListView,
     UserProductBidsListView,
     ProductSellView,
+    ProductListCacheStatsView,
+    ProductEventsView,
 )
 
 app_name = "products"
 
 urlpatterns = [
     path("", ProductListView.as_view(), name="list"),
+    path("cache/stats/", ProductListCacheStatsView.as_view(), name="cache_stats"),
     path("<int:pk>/", ProductDetailView.as_view(), name="detail"),
     path("sell/<int:pk>/", ProductSellView.as_view(), name="product_sell"),
     path("<int:pk>/bids/", ProductBidsListView.as_view(), name="bids_list"),
+    path("<int:pk>/events/", ProductEventsView.as_view(), name="events"),
     path("my/", CurrentUserProductListView.as_view(), name="owned_list"),
     path(
         "my/<int:pk>/",
@@ -1,15 +1,25 @@
-from .models import Product
+from .models import Product, PRODUCT_STATUSES
+from .cache import product_list_cache
+from .events import BID_EVENT_FIELDS, bid_summary, format_event, product_events
+from .search import ProductSearchFilter
+from .services import close_auction
+from .signals import product_sold
 from .serializers import (
     ProductReadSerializer,
     ProductWriteSerializer,
     ProductBidsReadSerializer,
 )
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import asyncio
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from common.paginations import StandardResultsSetPagination
+from common.ingestion import schedule_ingestion, stage_upload
+from common.mixins import ConditionalGetMixin, make_etag
+from common.paginations import OptionalKeysetResultsSetPagination
 from common.permissions import IsProductCreator, IsProductAuctionEnded, IsProductNotSold
-from bids.models import Bid
+from bids.leaderboard import product_leaderboards
+from bids.models import Bid, BID_RANKING
+from bids.services import lock_product
 from rest_framework.generics import (
     ListCreateAPIView,
     RetrieveDestroyAPIView,
@@ -17,20 +27,52 @@ from rest_framework.generics import (
     RetrieveAPIView,
     UpdateAPIView,
 )
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.permissions import (
+    IsAuthenticatedOrReadOnly,
+    IsAuthenticated,
+    IsAdminUser,
+)
+from rest_framework.filters import OrderingFilter
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from django.views import View
 from django.db.models.query import Q
 
 
-class ProductDetailView(RetrieveDestroyAPIView):
+class ProductDetailView(ConditionalGetMixin, RetrieveDestroyAPIView):
     serializer_class = ProductReadSerializer
 
     queryset = Product.objects.filter(
         valid_till__gte=datetime.now(tz=timezone.utc)
-    ).select_related("category", "creator")
+    ).select_related("category", "creator", "highest_bid__bidder")
+
+    def get_etag(self, request, *args, **kwargs):
+        version = (
+            self.get_queryset()
+            .filter(pk=kwargs["pk"])
+            .values("updated_at", "bid_version", "is_sold", "valid_till", "closed_at")
+            .first()
+        )
+
+        if version is None:
+            return None
+
+        # The status and `time_left` change with time, `current_user_bid`
+        # and `is_creator` with the user
+        product = Product(**version)
+        return make_etag(
+            "product",
+            kwargs["pk"],
+            version["updated_at"].isoformat(),
+            version["bid_version"],
+            product.status,
+            product.time_left,
+            request.user.id,
+        )
 
     def get_permissions(self):
         if self.request.method == "DELETE":
@@ -40,9 +82,9 @@ class ProductDetailView(RetrieveDestroyAPIView):
 
 class ProductListView(ListCreateAPIView):
     serializer_class = ProductReadSerializer
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ["title"]
+    pagination_class = OptionalKeysetResultsSetPagination
+    keyset_ordering = ("-created_at", "-id")
+    filter_backends = [ProductSearchFilter, OrderingFilter]
     parser_classes = [MultiPartParser, FormParser]
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -55,15 +97,22 @@ class ProductListView(ListCreateAPIView):
         return super().get_serializer_class()
 
     def perform_create(self, serializer):
-        serializer.save(creator=self.request.user)
+        product = serializer.save(
+            creator=self.request.user,
+            image=stage_upload(serializer.validated_data["image"]),
+            image_status="pending",
+        )
+        schedule_ingestion(product, "image")
 
     def get_queryset(self):
         if self.request.method == "GET":
             # Filter the products which are available
+            now = datetime.now(tz=timezone.utc)
             queryset = (
-                Product.objects.filter(valid_till__gte=datetime.now(tz=timezone.utc))
+                Product.objects.filter(valid_till__gte=now)
+                .with_status(now)
                 .order_by("-created_at")
-                .select_related("category", "creator")
+                .select_related("category", "creator", "highest_bid__bidder")
             )
 
             # Get the ?query=& params from request
@@ -91,8 +140,7 @@ class ProductListView(ListCreateAPIView):
                 queryset = queryset.filter(base_price__lte=max_price)
 
             if status:
-                ids = [o.id for o in queryset.all() if o.status == status]
-                queryset = queryset.filter(pk__in=ids)
+                queryset = queryset.filter_status(status, now)
 
             return queryset
 
@@ -110,13 +158,19 @@ class ProductListView(ListCreateAPIView):
                 "status",
                 openapi.IN_QUERY,
                 type=openapi.TYPE_STRING,
-                enum=["ongoing", "finished", "sold"],
+                enum=list(PRODUCT_STATUSES),
             ),
         ],
         responses={200: ProductReadSerializer(many=True)},
     )
     def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            # The response includes the bids of the user
+            return super().get(request, *args, **kwargs)
+
+        return product_list_cache.get_response(
+            request, lambda: super(ProductListView, self).get(request, *args, **kwargs)
+        )
 
 
 class CurrentUserProductListView(ListAPIView):
@@ -126,19 +180,21 @@ class CurrentUserProductListView(ListAPIView):
     """
 
     serializer_class = ProductReadSerializer
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ["title"]
+    pagination_class = OptionalKeysetResultsSetPagination
+    keyset_ordering = ("-created_at", "-id")
+    filter_backends = [ProductSearchFilter, OrderingFilter]
     parser_classes = [MultiPartParser, FormParser]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
+        now = datetime.now(tz=timezone.utc)
         queryset = (
             Product.objects.filter(
                 creator_id=self.request.user.pk,
             )
+            .with_status(now)
             .order_by("-created_at")
-            .select_related("category")
+            .select_related("category", "creator", "highest_bid__bidder")
         )
 
         # Get the ?query=& params from request
@@ -158,8 +214,7 @@ class CurrentUserProductListView(ListAPIView):
             queryset = queryset.filter(base_price__lte=max_price)
 
         if status:
-            ids = [o.id for o in queryset.all() if o.status == status]
-            queryset = queryset.filter(pk__in=ids)
+            queryset = queryset.filter_status(status, now)
 
         return queryset
 
@@ -172,7 +227,7 @@ class CurrentUserProductListView(ListAPIView):
                 "status",
                 openapi.IN_QUERY,
                 type=openapi.TYPE_STRING,
-                enum=["ongoing", "finished", "sold"],
+                enum=list(PRODUCT_STATUSES),
             ),
         ],
         responses={200: ProductReadSerializer(many=True)},
@@ -187,26 +242,63 @@ class CurrentUserProductRetrieveView(RetrieveAPIView):
     Must be logged in to access.
     """
 
-    queryset = Product.objects.all().order_by("-created_at").select_related("category")
+    queryset = (
+        Product.objects.all()
+        .order_by("-created_at")
+        .select_related("category", "creator", "highest_bid__bidder")
+    )
     serializer_class = ProductReadSerializer
     permission_classes = [IsAuthenticated, IsProductCreator]
 
 
-class ProductBidsListView(ListAPIView):
+class ProductBidsListView(ConditionalGetMixin, ListAPIView):
     """
     This resource returns the top 5 list of bids for a specific product
     which is valid.
     """
 
     serializer_class = ProductBidsReadSerializer
+    etag_vary = ()
+
+    def get_etag(self, request, *args, **kwargs):
+        self.product_version = (
+            Product.objects.filter(pk=kwargs["pk"])
+            .values("bid_version", "valid_till")
+            .first()
+        )
+
+        if self.product_version is None:
+            return None
+
+        return make_etag("bids", kwargs["pk"], self.product_version["bid_version"])
 
     def get_queryset(self):
         return (
             Bid.objects.filter(product__id=self.kwargs["pk"])
-            .order_by("-bid_amount", "updated_at")
-            .select_related("bidder")[:5]
+            .with_rank()
+            .order_by(*BID_RANKING)
+            .select_related("bidder")[: product_leaderboards.size]
         )
 
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_top_bids(), many=True)
+        return Response(serializer.data)
+
+    def get_top_bids(self):
+        version = getattr(self, "product_version", None)
+
+        if version is None:
+            return self.get_queryset()
+
+        args = (self.kwargs["pk"], version["bid_version"], version["valid_till"])
+        bids = product_leaderboards.get(*args)
+
+        if bids is None:
+            bids = list(self.get_queryset())
+            product_leaderboards.set(*args, bids)
+
+        return bids
+
 
 class UserProductBidsListView(ListAPIView):
     """
@@ -216,7 +308,8 @@ class UserProductBidsListView(ListAPIView):
 
     serializer_class = ProductBidsReadSerializer
     permission_classes = [IsAuthenticated, IsProductCreator]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = OptionalKeysetResultsSetPagination
+    keyset_ordering = BID_RANKING
 
     def get_queryset(self):
         return (
@@ -224,7 +317,8 @@ class UserProductBidsListView(ListAPIView):
                 product__id=self.kwargs["pk"],
                 product__creator__id=self.request.user.id,
             )
-            .order_by("-bid_amount")
+            .with_product_rank()
+            .order_by(*BID_RANKING)
             .select_related("bidder")
         )
 
@@ -244,6 +338,110 @@ class ProductSellView(UpdateAPIView):
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
-        instance.is_sold = True
-        instance.save()
+
+        # Serialize with the bid writes on the product, re-checking under the lock
+        with transaction.atomic():
+            instance = lock_product(instance.pk)
+            self.check_object_permissions(request, instance)
+            close_auction(instance)
+            instance.is_sold = True
+            instance.save()
+            product_sold.send(sender=Product, instance=instance)
+
         return Response({"detail": "Product marked as sold"}, status=HTTP_200_OK)
+
+
+class ProductListCacheStatsView(RetrieveAPIView):
+    """
+    This resource returns the hit and miss counters of the anonymous
+    product list cache. Must be an admin to access.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(product_list_cache.get_stats(), status=HTTP_200_OK)
+
+
+class ProductEventsView(View):
+    """
+    This resource streams the bid events of a product as Server-Sent
+    Events: `bid` when the highest bid changes, `bid-count` when only the
+    number of bids does, and `auction-closed` once the product is sold,
+    deleted or its auction ends. Must be served over ASGI.
+
+    The streams are closed after `PRODUCT_EVENTS_MAX_AGE`, as the clients
+    which went away are not noticed, and the `EventSource` reconnects.
+    """
+
+    # Milliseconds before the client reconnects to a closed stream
+    retry = 1000
+
+    async def get(self, request, pk):
+        if not await Product.objects.filter(pk=pk).aexists():
+            raise Http404
+
+        response = StreamingHttpResponse(
+            self.stream(pk), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Disable the response buffering of nginx
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, pk):
+        heartbeat = settings.PRODUCT_EVENTS_HEARTBEAT
+        expires_at = datetime.now(tz=timezone.utc) + timedelta(
+            seconds=settings.PRODUCT_EVENTS_MAX_AGE
+        )
+        # Subscribe first, so that no event is missed while reading the product
+        subscription = product_events.subscribe(pk)
+
+        try:
+            product = (
+                await Product.objects.filter(pk=pk)
+                .values("valid_till", "is_sold", *BID_EVENT_FIELDS)
+                .afirst()
+            )
+
+            if product is None:
+                yield format_event("auction-closed", {"reason": "deleted"})
+                return
+
+            summary = bid_summary(product)
+            yield format_event("bid", summary, id=summary["bid_version"])
+
+            if product["is_sold"]:
+                yield format_event("auction-closed", {"reason": "sold"})
+                return
+
+            while True:
+                now = datetime.now(tz=timezone.utc)
+                remaining = product["valid_till"] - now
+                if remaining.total_seconds() <= 0:
+                    yield format_event("auction-closed", {"reason": "ended"})
+                    return
+
+                expires_in = (expires_at - now).total_seconds()
+                if expires_in <= 0:
+                    yield f"retry: {self.retry}\n\n"
+                    return
+
+                try:
+                    event, data, id = await subscription.get(
+                        timeout=min(heartbeat, remaining.total_seconds(), expires_in)
+                    )
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+
+                if id is not None and id <= summary["bid_version"]:
+                    # Already included in the first event
+                    continue
+
+                yield format_event(event, data, id=id)
+
+                if event == "auction-closed":
+                    return
+        finally:
+            product_events.unsubscribe(subscription)
@@ -0,0 +1,271 @@
+from django.conf import settings
+from django.core.cache import caches
+from hashlib import blake2b, sha256
+from collections import namedtuple
+import math
+import threading
+import time
+from common.caches import PROCESS_LOCAL_CACHE_BACKENDS
+from .models import User
+
+# Fields whose availability is answered, keep in sync with `user.signals`
+AVAILABILITY_FIELDS = ("username", "email")
+
+FilterState = namedtuple("FilterState", ["filter", "version", "built_at"])
+
+STATS_COUNTERS = ("definite_misses", "true_positives", "false_positives", "unfiltered")
+
+
+def normalize(value):
+    return value.strip().lower()
+
+
+class BloomFilter:
+    """
+    A set of strings which may answer that it contains a string it was
+    never given, at about `error_rate` once it holds `capacity` strings,
+    but never that it misses a string it was given.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(
+            8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, value):
+        # Double hashing of a single digest, see Kirsch and Mitzenmacher
+        digest = blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        positions = self._positions(value)
+
+        with self._lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+    def estimated_false_positive_rate(self):
+        filled = int.from_bytes(self.bits, "little").bit_count() / self.size
+        return filled**self.hash_count
+
+
+class UserAvailabilityFilter:
+    """
+    Answers whether a username or email is taken without querying the
+    database when it is definitely not, which is the case of most checks
+    made while a user fills in the signup form.
+
+    Each process keeps a Bloom filter of the normalized usernames and
+    emails, built from a streamed query on the first check and rebuilt
+    every `max_age` seconds, when it fills up, or when the shared version
+    is bumped by the `rebuild_availability_filter` command. The values
+    saved since are added to the filter of the saving process and, for
+    the other processes, kept under a short-lived key of the shared cache.
+
+    The filter is only used with a cache shared by the processes, without
+    one every check queries the database, see the `user.W001` check.
+    """
+
+    prefix = "users:availability"
+
+    def __init__(self, alias=None, error_rate=None, max_age=None):
+        self._alias = alias
+        self._error_rate = error_rate
+        self._max_age = max_age
+        self._state = None
+        self._build_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self._alias or settings.USER_AVAILABILITY_CACHE_ALIAS]
+
+    @property
+    def is_shared(self):
+        """
+        Whether the other processes see the versions and recent values
+        written by this one.
+        """
+
+        return not isinstance(self.cache, PROCESS_LOCAL_CACHE_BACKENDS)
+
+    @property
+    def error_rate(self):
+        if self._error_rate is not None:
+            return self._error_rate
+
+        return settings.USER_AVAILABILITY_FILTER_ERROR_RATE
+
+    @property
+    def max_age(self):
+        if self._max_age is not None:
+            return self._max_age
+
+        return settings.USER_AVAILABILITY_FILTER_MAX_AGE
+
+    @property
+    def version_key(self):
+        return f"{self.prefix}:version"
+
+    def get_entry(self, field, value):
+        return f"{field}:{normalize(value)}"
+
+    def get_recent_key(self, entry):
+        digest = sha256(entry.encode("utf-8")).hexdigest()[:32]
+        return f"{self.prefix}:recent:{digest}"
+
+    def exists(self, field, value):
+        """
+        Returns whether a user has the given `field` value.
+        """
+
+        if not self.is_shared:
+            # The values saved by the other processes would be missed
+            self.count("unfiltered")
+            return User.objects.filter(**{field: value}).exists()
+
+        entry = self.get_entry(field, value)
+        recent_key = self.get_recent_key(entry)
+        shared = self.cache.get_many([self.version_key, recent_key])
+        bloom = self.get_filter(shared.get(self.version_key))
+
+        if entry not in bloom and recent_key not in shared:
+            self.count("definite_misses")
+            return False
+
+        exists = User.objects.filter(**{field: value}).exists()
+        self.count("true_positives" if exists else "false_positives")
+
+        return exists
+
+    def add(self, field, value):
+        """
+        Adds a `field` value saved by this process. Must be called once
+        the value is committed.
+        """
+
+        entry = self.get_entry(field, value)
+        state = self._state
+
+        if state is not None and entry not in state.filter:
+            state.filter.add(entry)
+
+        # Until every process rebuilt its filter
+        self.cache.set(self.get_recent_key(entry), 1, timeout=2 * self.max_age)
+
+    def get_filter(self, version):
+        if version is None:
+            self.cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = self.cache.get(self.version_key)
+
+        state = self._state
+
+        if state is not None and not self.is_stale(state, version):
+            return state.filter
+
+        # Only the first check waits, the others use the previous filter
+        # until the new one is built
+        if self._build_lock.acquire(blocking=state is None):
+            try:
+                state = self._state
+
+                if state is None or self.is_stale(state, version):
+                    self._state = FilterState(self.build(), version, time.monotonic())
+            finally:
+                self._build_lock.release()
+
+        return self._state.filter
+
+    def is_stale(self, state, version):
+        return (
+            state.version != version
+            or time.monotonic() - state.built_at > self.max_age
+            or state.filter.count > state.filter.capacity
+        )
+
+    def build(self, chunk_size=2000):
+        """
+        Builds a filter of the values of every user, sized for twice as
+        many users so that it keeps its error rate until it is rebuilt.
+        """
+
+        bloom = BloomFilter(
+            capacity=2 * len(AVAILABILITY_FIELDS) * User.objects.count(),
+            error_rate=self.error_rate,
+        )
+
+        for values in User.objects.values_list(*AVAILABILITY_FIELDS).iterator(
+            chunk_size=chunk_size
+        ):
+            for field, value in zip(AVAILABILITY_FIELDS, values):
+                if value:
+                    bloom.add(self.get_entry(field, value))
+
+        return bloom
+
+    def bump_version(self):
+        """
+        Makes every process rebuild its filter on its next check.
+        """
+
+        self.cache.set(self.version_key, time.time_ns(), timeout=None)
+
+    def count(self, name):
+        key = f"{self.prefix}:{name}"
+
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 0, timeout=None)
+            self.cache.incr(key)
+
+    def get_stats(self):
+        """
+        Returns the check counters, with the share of the values absent
+        from the database which still had to be looked up, and the size of
+        the filter of this process.
+        """
+
+        keys = [f"{self.prefix}:{name}" for name in STATS_COUNTERS]
+        counts = self.cache.get_many(keys)
+        stats = {name: counts.get(key, 0) for name, key in zip(STATS_COUNTERS, keys)}
+        stats["shared"] = self.is_shared
+
+        absent = stats["definite_misses"] + stats["false_positives"]
+        stats["false_positive_rate"] = (
+            round(stats["false_positives"] / absent, 4) if absent else None
+        )
+
+        state = self._state
+        stats["filter"] = state and {
+            "entries": state.filter.count,
+            "capacity": state.filter.capacity,
+            "bits": state.filter.size,
+            "hash_count": state.filter.hash_count,
+            "estimated_false_positive_rate": round(
+                state.filter.estimated_false_positive_rate(), 6
+            ),
+        }
+
+        return stats
+
+    def reset_stats(self):
+        self.cache.delete_many([f"{self.prefix}:{name}" for name in STATS_COUNTERS])
+
+
+user_availability = UserAvailabilityFilter()
@@ -0,0 +1,170 @@
+from django.conf import settings
+from django.core.cache import caches
+from collections import OrderedDict, namedtuple
+import threading
+import time
+import uuid
+from .models import User
+
+CachedUser = namedtuple("CachedUser", ["expires_at", "version", "db", "values"])
+
+
+class UserVersions:
+    """
+    Version of each user, in the `USER_VERSION_CACHE_ALIAS` cache shared by
+    the processes, replaced by a new random one whenever the user is saved
+    or deleted. What was read from a user, e.g. its cached row or the claims
+    of its tokens, is stale once the version changed. A version evicted
+    from the cache is replaced as well, which only makes them all stale.
+    """
+
+    prefix = "user:version"
+
+    def __init__(self, alias=None):
+        self._alias = alias
+
+    @property
+    def cache(self):
+        return caches[self._alias or settings.USER_VERSION_CACHE_ALIAS]
+
+    def get(self, pk):
+        """
+        Returns the version of the user `pk`, or `None` if it has none.
+        """
+
+        return self.cache.get(f"{self.prefix}:{pk}")
+
+    def current(self, pk):
+        """
+        Returns the version of the user `pk`, giving it one if needed. Read
+        it before the user, so that a save in between makes the user stale.
+        """
+
+        key = f"{self.prefix}:{pk}"
+        self.cache.add(key, uuid.uuid4().hex, timeout=None)
+        return self.cache.get(key)
+
+    def bump(self, pk):
+        self.cache.set(f"{self.prefix}:{pk}", uuid.uuid4().hex, timeout=None)
+
+
+user_versions = UserVersions()
+
+
+class UserCache:
+    """
+    Per process cache of the users whose requests need the full row, see
+    `authentication.authentication.CachedUserAuthentication`. Holds the
+    column values of up to `max_entries` users, the least recently used
+    ones dropped first, for `timeout` seconds each.
+
+    Every entry is kept under the `user_versions` version it was loaded
+    at, and reloaded once it changed, so that the saves of a user made by
+    any process apply to the next requests.
+    """
+
+    def __init__(self, max_entries=None, timeout=None, versions=None):
+        self._max_entries = max_entries
+        self._timeout = timeout
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self.versions = versions or user_versions
+
+    @property
+    def max_entries(self):
+        if self._max_entries is not None:
+            return self._max_entries
+
+        return settings.USER_CACHE_MAX_ENTRIES
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+
+        return settings.USER_CACHE_TIMEOUT
+
+    @property
+    def attnames(self):
+        return [field.attname for field in User._meta.concrete_fields]
+
+    def get(self, pk):
+        """
+        Returns a new instance of the user `pk`, loaded from the database
+        unless cached, or `None` if there is no such user.
+        """
+
+        version = self.versions.current(pk)
+
+        with self._lock:
+            cached = self._users.get(pk)
+
+            if cached is not None and (
+                cached.expires_at <= time.monotonic() or cached.version != version
+            ):
+                del self._users[pk]
+                cached = None
+
+            if cached is not None:
+                self._users.move_to_end(pk)
+
+        if cached is None:
+            return self.load(pk, version)
+
+        # Callers may change their instance, not the cached values
+        return User.from_db(cached.db, self.attnames, cached.values)
+
+    def load(self, pk, version=None):
+        """
+        Loads the user `pk` from the database into the cache, and returns
+        it, or `None` if there is no such user. The `version` of the user
+        is read first if not given.
+        """
+
+        if version is None:
+            version = self.versions.current(pk)
+
+        queryset = User._default_manager.filter(pk=pk).values_list(*self.attnames)
+        values = queryset.first()
+
+        if values is None:
+            self.discard(pk)
+            return None
+
+        if self.max_entries > 0:
+            cached = CachedUser(
+                time.monotonic() + self.timeout, version, queryset.db, values
+            )
+
+            with self._lock:
+                self._users[pk] = cached
+                self._users.move_to_end(pk)
+
+                while len(self._users) > self.max_entries:
+                    self._users.popitem(last=False)
+
+        return User.from_db(queryset.db, self.attnames, values)
+
+    def discard(self, pk):
+        with self._lock:
+            self._users.pop(pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+def get_full_user(user):
+    """
+    Returns `user` itself if none of its fields are deferred, else the full
+    user from the `user_cache`, e.g. for the users authenticated from the
+    token claims, whose other fields would each cost a query when read.
+    """
+
+    if not user.get_deferred_fields():
+        return user
+
+    return user_cache.get(user.pk) or user
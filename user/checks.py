@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from common.caches import PROCESS_LOCAL_CACHE_BACKENDS
+from .availability import user_availability
+from .cache import user_versions
+
+
+@register(Tags.caches, deploy=True)
+def check_availability_cache(app_configs, **kwargs):
+    if user_availability.is_shared:
+        return []
+
+    return [
+        Warning(
+            "The availability checks query the database every time, as the "
+            "cache they share is local to each process.",
+            hint=(
+                "Point USER_AVAILABILITY_CACHE_ALIAS "
+                f"({settings.USER_AVAILABILITY_CACHE_ALIAS!r}) to a cache "
+                "shared by the processes, such as Redis or Memcached."
+            ),
+            id="user.W001",
+        )
+    ]
+
+
+@register(Tags.caches, deploy=True)
+def check_user_version_cache(app_configs, **kwargs):
+    if not isinstance(user_versions.cache, PROCESS_LOCAL_CACHE_BACKENDS):
+        return []
+
+    return [
+        Warning(
+            "The saves of a user, such as a deactivation or a password change, "
+            "only apply to the cached users and token claims of the process "
+            "which made them, as the cache of the user versions is local to "
+            "each process.",
+            hint=(
+                "Point USER_VERSION_CACHE_ALIAS "
+                f"({settings.USER_VERSION_CACHE_ALIAS!r}) to a cache shared by "
+                "the processes, such as Redis or Memcached."
+            ),
+            id="user.W002",
+        )
+    ]
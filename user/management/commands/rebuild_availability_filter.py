@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from user.availability import user_availability
+import uuid
+
+
+class Command(BaseCommand):
+    help = (
+        "Makes every process rebuild its username and email availability "
+        "filter, and measures the false positive rate of a fresh filter"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--samples",
+            type=int,
+            default=10000,
+            help="Number of absent values probed to measure the rate",
+        )
+
+    def handle(self, *args, **options):
+        if not user_availability.is_shared:
+            self.stderr.write(
+                self.style.WARNING(
+                    "The availability cache is local to each process, the "
+                    "running servers do not use a filter"
+                )
+            )
+
+        user_availability.bump_version()
+        bloom = user_availability.build()
+
+        samples = options["samples"]
+        false_positives = sum(
+            user_availability.get_entry("username", uuid.uuid4().hex) in bloom
+            for _ in range(samples)
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built a filter of {bloom.count} values in {bloom.size} bits "
+                f"with {bloom.hash_count} hashes, measured false positive rate "
+                f"{false_positives / max(samples, 1):.4f} "
+                f"(expected {bloom.estimated_false_positive_rate():.4f})"
+            )
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from user.search import get_user_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the search index of the users"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        backend = get_user_search_backend(options["database"])
+        backend.rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the index with {type(backend).__name__}")
+        )
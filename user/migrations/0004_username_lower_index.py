@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_username_lower_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        # The pattern operator class lets `LIKE 'prefix%'` use the index
+        # whatever the collation of the database
+        schema_editor.execute(
+            'CREATE INDEX auth_user_username_lower_idx ON auth_user (LOWER(username) text_pattern_ops)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE INDEX auth_user_username_lower_idx ON auth_user (LOWER(username))'
+        )
+
+
+def drop_username_lower_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute('DROP INDEX IF EXISTS auth_user_username_lower_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_user_profile_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_username_lower_index, drop_username_lower_index),
+    ]
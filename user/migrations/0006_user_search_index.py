@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+def create_user_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    # `IF NOT EXISTS` and the filled rows skipped for the databases where
+    # the index was created after `migrate` by the previous versions
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS auth_user_fts USING fts5('
+            'username, first_name, last_name, email, '
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')"
+        )
+        schema_editor.execute(
+            'INSERT INTO auth_user_fts (rowid, username, first_name, last_name, email) '
+            'SELECT u.id, u.username, u.first_name, u.last_name, u.email FROM auth_user u '
+            'WHERE u.id NOT IN (SELECT rowid FROM auth_user_fts)'
+        )
+    elif vendor == 'postgresql':
+        # Split on the same word boundaries as `common.search.get_search_terms`
+        words = "regexp_replace(lower({}), '\\W+', ' ', 'g')"
+        schema_editor.execute(
+            'CREATE TABLE IF NOT EXISTS auth_user_search ('
+            'user_id bigint PRIMARY KEY REFERENCES auth_user (id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS auth_user_search_document_idx '
+            'ON auth_user_search USING GIN (document)'
+        )
+        schema_editor.execute(
+            'INSERT INTO auth_user_search (user_id, document) '
+            'SELECT u.id, '
+            f"setweight(to_tsvector('simple', {words.format('u.username')}), 'A') || "
+            f"setweight(to_tsvector('simple', {words.format('u.first_name')}), 'B') || "
+            f"setweight(to_tsvector('simple', {words.format('u.last_name')}), 'B') || "
+            f"setweight(to_tsvector('simple', {words.format('u.email')}), 'C') "
+            'FROM auth_user u ON CONFLICT (user_id) DO NOTHING'
+        )
+
+
+def drop_user_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS auth_user_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS auth_user_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_user_profile_image_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_user_search_index, drop_user_search_index),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from common.models import IMAGE_STATUSES
 import uuid
 
 
@@ -13,4 +14,7 @@ class User(AbstractUser):
     class Meta:
         db_table = 'auth_user'
 
-    profile_image = models.ImageField(upload_to=upload_to, blank=True, null=True)
\ No newline at end of file
+    profile_image = models.ImageField(upload_to=upload_to, blank=True, null=True)
+    profile_image_status = models.CharField(
+        max_length=7, choices=IMAGE_STATUSES, default='ready'
+    )
\ No newline at end of file
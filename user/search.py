@@ -0,0 +1,188 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Case, FloatField, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+from django.db.models.query import Q
+from common.search import (
+    BackendSearchFilter,
+    BaseSearchBackend,
+    PostgresFTSBackend,
+    SQLiteFTSBackend,
+    get_search_terms,
+    load_search_backend,
+)
+
+VENDOR_USER_SEARCH_BACKENDS = {
+    "sqlite": "user.search.SQLiteUserSearchBackend",
+    "postgresql": "user.search.PostgresUserSearchBackend",
+}
+
+# Columns of the users matched by the search, by decreasing weight
+USER_SEARCH_FIELDS = ("username", "first_name", "last_name", "email")
+
+
+def get_user_search_backend(using=DEFAULT_DB_ALIAS):
+    """
+    Returns the `USER_SEARCH_BACKEND` from the settings, or the backend
+    matching the database vendor if it is not set.
+    """
+
+    return load_search_backend(
+        getattr(settings, "USER_SEARCH_BACKEND", None),
+        VENDOR_USER_SEARCH_BACKENDS,
+        "user.search.IStartsWithUserSearchBackend",
+        using,
+    )
+
+
+class BaseUserSearchBackend(BaseSearchBackend):
+    """
+    A user search backend matches every search term against the start
+    of the words of the searched columns, and filters a user queryset
+    down to the matching users annotated with a `search_rank`.
+
+    The users whose username, name or email is exactly one of the terms
+    are annotated with an `exact_match` and listed first. Only the
+    `USER_SEARCH_MAX_RESULTS` most relevant exact and as many prefix
+    matches are listed, chosen among the first `USER_SEARCH_MAX_CANDIDATES`
+    matches of each, so that a short search on millions of users stays
+    cheap. Past that many matches, the most relevant users may be missed,
+    a longer search narrows them down.
+    """
+
+    source = "auth_user u"
+    id_column = "u.id"
+
+    @property
+    def max_results(self):
+        return settings.USER_SEARCH_MAX_RESULTS
+
+    @property
+    def max_candidates(self):
+        return settings.USER_SEARCH_MAX_CANDIDATES
+
+    def update(self, user_ids=None):
+        """
+        (Re)indexes the given users, or every user.
+        """
+
+        self.index(*self.where_ids(user_ids))
+
+    def _order(self, queryset, search):
+        values = sorted({*get_search_terms(search), search.strip().lower()})
+        exact = Q()
+        for field in USER_SEARCH_FIELDS:
+            exact |= Q(**{f"{field}_lower__in": values})
+
+        return (
+            queryset.alias(
+                **{f"{field}_lower": Lower(field) for field in USER_SEARCH_FIELDS}
+            )
+            .annotate(
+                exact_match=Case(
+                    When(exact, then=Value(1)),
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+            .order_by("-exact_match", "-search_rank", "id")
+        )
+
+
+class IStartsWithUserSearchBackend(BaseUserSearchBackend):
+    """
+    Fallback backend without an index, every term must start one of the
+    searched columns.
+    """
+
+    def search(self, queryset, search):
+        terms = get_search_terms(search)
+
+        for term in terms:
+            q = Q()
+            for field in USER_SEARCH_FIELDS:
+                q |= Q(**{f"{field}__istartswith": term})
+            queryset = queryset.filter(q)
+
+        queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return self._order(queryset, search)
+
+
+class SQLiteUserSearchBackend(BaseUserSearchBackend, SQLiteFTSBackend):
+    """
+    Weights the username over the names and the names over the email. The
+    table has prefix indexes on the first letters of the words.
+    """
+
+    table = "auth_user_fts"
+    columns = USER_SEARCH_FIELDS
+    values = tuple(f"u.{field}" for field in USER_SEARCH_FIELDS)
+    weights = (10.0, 5.0, 5.0, 2.0)
+
+    def search(self, queryset, search):
+        terms = get_search_terms(search)
+
+        if not terms:
+            return queryset
+
+        prefix = self.get_match(terms)
+        exact_matches, exact_params = self.matches(
+            self.get_match(terms, prefix=False), self.max_results, self.max_candidates
+        )
+        prefix_matches, prefix_params = self.matches(
+            prefix, self.max_results, self.max_candidates
+        )
+        queryset = queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT id FROM ({exact_matches}) AS exact_matches "
+                f"UNION SELECT id FROM ({prefix_matches}) AS prefix_matches",
+                exact_params + prefix_params,
+            )
+        ).annotate(search_rank=self.rank(queryset, prefix))
+
+        return self._order(queryset, search)
+
+
+class PostgresUserSearchBackend(BaseUserSearchBackend, PostgresFTSBackend):
+    table = "auth_user_search"
+    key_column = "user_id"
+    # Split on the same word boundaries as `get_search_terms`, the default
+    # parser would keep e.g. an email as a single word
+    documents = tuple(
+        (f"regexp_replace(lower(u.{field}), '\\W+', ' ', 'g')", weight)
+        for field, weight in zip(USER_SEARCH_FIELDS, "ABBC")
+    )
+
+    def search(self, queryset, search):
+        terms = get_search_terms(search)
+
+        if not terms:
+            return queryset
+
+        prefix = self.get_tsquery(terms)
+        exact_matches, exact_params = self.matches(
+            self.get_tsquery(terms, prefix=False),
+            self.max_results,
+            self.max_candidates,
+        )
+        prefix_matches, prefix_params = self.matches(
+            prefix, self.max_results, self.max_candidates
+        )
+        queryset = queryset.filter(
+            pk__in=RawSQL(
+                f"({exact_matches}) UNION ({prefix_matches})",
+                exact_params + prefix_params,
+            )
+        ).annotate(search_rank=self.rank(queryset, prefix))
+
+        return self._order(queryset, search)
+
+
+class UserSearchFilter(BackendSearchFilter):
+    """
+    `SearchFilter` replacement for users, ordered by relevance.
+    """
+
+    def get_backend(self, using):
+        return get_user_search_backend(using)
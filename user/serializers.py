@@ -8,6 +8,8 @@ from rest_framework.serializers import (
     BooleanField,
 )
 from rest_framework.validators import UniqueValidator
+from common.images import ImageVariantsField
+from common.ingestion import StagedImageField
 
 
 class UserSerializer(ModelSerializer):
@@ -28,6 +30,8 @@ class UserSerializer(ModelSerializer):
 
     is_self = BooleanField(read_only=True)
 
+    profile_image_variants = ImageVariantsField(source="profile_image")
+
     class Meta:
         model = User
         fields = [
@@ -39,22 +43,26 @@ class UserSerializer(ModelSerializer):
             "password",
             "is_self",
             "profile_image",
+            "profile_image_status",
+            "profile_image_variants",
         ]
 
         extra_kwargs = {
             "first_name": {"required": True},
             "last_name": {"required": True},
             "profile_image": {"read_only": True},
+            "profile_image_status": {"read_only": True},
         }
 
     def create(self, validated_data):
-        user = User.objects.create(
+        user = User(
             username=validated_data["username"],
             email=validated_data["email"],
             first_name=validated_data["first_name"],
             last_name=validated_data["last_name"],
         )
 
+        # Hashed before the user is saved, as the hashing pool may be busy
         user.set_password(validated_data["password"])
         user.save()
 
@@ -83,6 +91,12 @@ class UserUpdatePasswordSerializer(ModelSerializer):
         model = User
         fields = ["password"]
 
+    def update(self, instance, validated_data):
+        instance.set_password(validated_data["password"])
+        instance.save(update_fields=["password"])
+
+        return instance
+
 
 class UsernameSuggestionSerializer(Serializer):
     first_name = CharField(required=True)
@@ -98,6 +112,9 @@ class EmailAvailabilitySerializer(Serializer):
 
 
 class ProfileImageUpdateSerializer(ModelSerializer):
+    profile_image = StagedImageField(allow_null=True)
+
     class Meta:
         model = User
-        fields = ("profile_image",)
+        fields = ("profile_image", "profile_image_status")
+        extra_kwargs = {"profile_image_status": {"read_only": True}}
@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from common.search import IndexedFields
+from .availability import AVAILABILITY_FIELDS, user_availability
+from .cache import user_cache, user_versions
+from .models import User
+from .search import USER_SEARCH_FIELDS, get_user_search_backend
+
+
+@receiver(post_save, sender=User)
+def add_available_values(sender, instance, created, update_fields, using, **kwargs):
+    if update_fields is not None and not set(AVAILABILITY_FIELDS) & update_fields:
+        # e.g. the `last_login` update of every login
+        return
+
+    values = {field: getattr(instance, field) for field in AVAILABILITY_FIELDS}
+
+    def add():
+        for field, value in values.items():
+            if value:
+                user_availability.add(field, value)
+
+    transaction.on_commit(add, using=using)
+
+
+indexed_user_fields = IndexedFields(User, USER_SEARCH_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_indexed_user_fields(sender, instance, **kwargs):
+    indexed_user_fields.remember(instance)
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, created, update_fields, using, **kwargs):
+    # e.g. not the `last_login` update of every login
+    if indexed_user_fields.changed(instance, created, update_fields):
+        get_user_search_backend(using).update(user_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, using, **kwargs):
+    get_user_search_backend(using).remove([instance.pk])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def discard_cached_user(sender, instance, using, update_fields=None, **kwargs):
+    # e.g. not the `last_login` update of every login
+    if update_fields is not None and update_fields <= {"last_login"}:
+        return
+
+    # e.g. after a password change or a deactivation, in every process
+    pk = instance.pk
+
+    def discard():
+        user_versions.bump(pk)
+        user_cache.discard(pk)
+
+    transaction.on_commit(discard, using=using)
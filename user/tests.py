@@ -0,0 +1,184 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from .availability import UserAvailabilityFilter
+from .models import User
+from .views import UsernameSuggestionView
+from io import StringIO
+import shutil
+import tempfile
+
+
+class UsernameSuggestionTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+
+    def suggest(self, first_name, last_name):
+        return self.client.post(
+            "/users/username-suggestions/",
+            {"first_name": first_name, "last_name": last_name},
+        )
+
+    def test_suggestions_are_made_from_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.suggest("John", "Doe")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), ["jdoe0", "johnd0", "john.doe0"])
+
+    def test_taken_usernames_are_skipped(self):
+        for username in ["jdoe0", "JDoe1", "jdoe3", "john.doe0", "johndoe0"]:
+            User.objects.create(username=username, email=f"{username}@test.com")
+
+        self.assertEqual(
+            self.suggest("John", "Doe").json(), ["jdoe2", "johnd0", "john.doe1"]
+        )
+
+    def test_one_letter_names_get_distinct_suggestions(self):
+        self.assertEqual(self.suggest("J", "D").json(), ["jd0", "jd1", "j.d0"])
+
+    def test_random_numbers_once_the_first_ones_are_taken(self):
+        for x in range(UsernameSuggestionView.sequential_candidates):
+            User.objects.create(username=f"jdoe{x}", email=f"jdoe{x}@test.com")
+
+        suggestion = self.suggest("John", "Doe").json()[0]
+
+        self.assertRegex(suggestion, r"^jdoe\d+$")
+        self.assertGreaterEqual(
+            int(suggestion[4:]), UsernameSuggestionView.sequential_candidates
+        )
+
+
+class UserAvailabilityFilterTests(TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                "availability": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": directory,
+                },
+            },
+            USER_AVAILABILITY_CACHE_ALIAS="availability",
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        User.objects.create(username="taken", email="taken@test.com")
+        # Two processes sharing the cache
+        self.filter = UserAvailabilityFilter()
+        self.other = UserAvailabilityFilter()
+
+    def test_definite_misses_are_answered_without_queries(self):
+        self.assertTrue(self.filter.exists("username", "taken"))
+
+        with self.assertNumQueries(0):
+            self.assertFalse(self.filter.exists("username", "free"))
+
+        self.assertEqual(self.filter.get_stats()["definite_misses"], 1)
+        self.assertEqual(self.filter.get_stats()["true_positives"], 1)
+
+    def test_false_positives_fall_back_to_the_database(self):
+        self.filter.exists("email", "taken@test.com")
+        # Still in the filter, which has no deletions
+        User.objects.filter(username="taken").delete()
+
+        with self.assertNumQueries(1):
+            self.assertFalse(self.filter.exists("email", "taken@test.com"))
+        self.assertEqual(self.filter.get_stats()["false_positives"], 1)
+
+    def test_users_created_by_other_processes_are_found(self):
+        self.filter.exists("username", "taken")
+
+        User.objects.create(username="recent", email="recent@test.com")
+        self.other.add("username", "recent")
+
+        self.assertTrue(self.filter.exists("username", "recent"))
+
+    def test_rebuilds_reach_every_process(self):
+        self.filter.exists("username", "taken")
+
+        # Saved without signals
+        User.objects.bulk_create([User(username="bulk", email="bulk@test.com")])
+        self.assertFalse(self.filter.exists("username", "bulk"))
+
+        call_command("rebuild_availability_filter", samples=10, stdout=StringIO())
+        self.assertTrue(self.filter.exists("username", "bulk"))
+
+    def test_process_local_caches_always_query_the_database(self):
+        with override_settings(USER_AVAILABILITY_CACHE_ALIAS="default"):
+            User.objects.bulk_create([User(username="bulk", email="bulk@test.com")])
+
+            self.assertFalse(self.filter.is_shared)
+            with self.assertNumQueries(1):
+                self.assertTrue(self.filter.exists("username", "bulk"))
+
+
+class UserSearchTests(TestCase):
+    def setUp(self) -> None:
+        def create(username, first_name="", last_name="", email=""):
+            return User.objects.create(
+                username=username,
+                first_name=first_name,
+                last_name=last_name,
+                email=email or f"{username}@test.com",
+            )
+
+        self.bob = create("bob", "Annabeth", "Smith")
+        self.annabel = create("annabel", "Annabel", "Jones")
+        self.ann = create("ann", "Ann", "Lee", "ann.lee@example.org")
+        self.john = create("jsmith", "John", "Smith")
+
+    def search(self, query):
+        response = APIClient().get("/users/", {"search": query})
+        return [user["id"] for user in response.json()["results"]]
+
+    def test_search_matches_any_column(self):
+        self.assertEqual(self.search("jones"), [self.annabel.pk])
+        self.assertEqual(self.search("example"), [self.ann.pk])
+        self.assertEqual(self.search("nobody"), [])
+
+    def test_search_matches_the_start_of_the_words(self):
+        self.assertEqual(self.search("jo sm"), [self.john.pk])
+        self.assertEqual(self.search("nna"), [])
+
+    def test_exact_matches_are_listed_first(self):
+        self.assertEqual(
+            self.search("ann"), [self.ann.pk, self.annabel.pk, self.bob.pk]
+        )
+
+    def test_search_ranks_usernames_over_names(self):
+        self.assertEqual(self.search("anna"), [self.annabel.pk, self.bob.pk])
+
+    @override_settings(USER_SEARCH_MAX_RESULTS=1)
+    def test_limited_searches_keep_the_most_relevant_users(self):
+        self.assertEqual(self.search("anna"), [self.annabel.pk])
+        self.assertEqual(self.search("ann"), [self.ann.pk, self.annabel.pk])
+
+    @override_settings(USER_SEARCH_MAX_RESULTS=1, USER_SEARCH_MAX_CANDIDATES=1)
+    def test_ranking_is_bounded_to_the_first_candidates(self):
+        # Only the first match in the index order is ranked
+        self.assertEqual(self.search("anna"), [self.bob.pk])
+
+    def test_renamed_users_are_reindexed(self):
+        self.john.last_name = "Doe"
+        self.john.save()
+
+        self.assertEqual(self.search("smith"), [self.bob.pk])
+        self.assertEqual(self.search("doe"), [self.john.pk])
+
+    def test_saves_keeping_the_indexed_values_are_not_reindexed(self):
+        user = User.objects.get(pk=self.john.pk)
+        user.is_staff = True
+
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+            user.set_password("Secret-123")
+            user.save(update_fields=["password"])
+        self.assertFalse([query for query in queries if "_fts" in query["sql"]])
@@ -8,6 +8,7 @@ from .views import (
     UsernameAvailabilityView,
     EmailAvailabilityView,
     ProfileImageUpdateView,
+    UserAvailabilityStatsView,
 )
 
 app_name = "user"
@@ -35,4 +36,9 @@ urlpatterns = [
         EmailAvailabilityView.as_view(),
         name="email_availability",
     ),
+    path(
+        "availability/stats/",
+        UserAvailabilityStatsView.as_view(),
+        name="availability_stats",
+    ),
 ]
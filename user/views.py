@@ -1,17 +1,18 @@
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+from rest_framework.status import HTTP_200_OK, HTTP_202_ACCEPTED, HTTP_400_BAD_REQUEST
 from rest_framework.generics import UpdateAPIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.generics import (
     ListCreateAPIView,
     RetrieveAPIView,
     RetrieveUpdateAPIView,
     CreateAPIView,
 )
-from django.db.models.query import Q
-from rest_framework.filters import SearchFilter
+from django.db.models.functions import Lower
 from rest_framework.parsers import FormParser, MultiPartParser
+from authentication.authentication import CachedUserAuthentication
+from authentication.mixins import PasswordHashingBusyMixin
 from .serializers import (
     UserSerializer,
     UserUpdatePasswordSerializer,
@@ -20,16 +21,21 @@ from .serializers import (
     UsernameAvailabilitySerializer,
     ProfileImageUpdateSerializer,
 )
+from common.ingestion import schedule_ingestion, stage_upload
 from common.paginations import StandardResultsSetPagination
+from common.throttling import TokenBucketThrottle
 from user.models import User
+from user.availability import user_availability
+from user.search import UserSearchFilter
+from itertools import chain
+import random
 
 
-class UserListView(ListCreateAPIView):
+class UserListView(PasswordHashingBusyMixin, ListCreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = StandardResultsSetPagination
-    filter_backends = [SearchFilter]
-    search_fields = ["first_name", "last_name", "email", "username"]
+    filter_backends = [UserSearchFilter]
 
 
 class UserDetailView(RetrieveAPIView):
@@ -38,6 +44,7 @@ class UserDetailView(RetrieveAPIView):
 
 
 class UserMeDetailView(RetrieveUpdateAPIView):
+    authentication_classes = [CachedUserAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
 
@@ -56,8 +63,9 @@ class UserMeDetailView(RetrieveUpdateAPIView):
             return Response(serializer.errors, status=HTTP_400_BAD_REQUEST)
 
 
-class UserUpdatePasswordView(UpdateAPIView):
+class UserUpdatePasswordView(PasswordHashingBusyMixin, UpdateAPIView):
     serializer_class = UserUpdatePasswordSerializer
+    authentication_classes = [CachedUserAuthentication]
     permission_classes = [IsAuthenticated]
 
     @action(methods=["PUT"], detail=False)
@@ -72,6 +80,7 @@ class UserUpdatePasswordView(UpdateAPIView):
 
 class ProfileImageUpdateView(UpdateAPIView):
     serializer_class = ProfileImageUpdateSerializer
+    authentication_classes = [CachedUserAuthentication]
     permission_classes = [IsAuthenticated]
     parser_classes = (
         FormParser,
@@ -82,11 +91,17 @@ class ProfileImageUpdateView(UpdateAPIView):
     def update(self, request):
         serializer = self.get_serializer(request.user, data=request.data, partial=True)
         if serializer.is_valid():
-            instance = serializer.save()
-            profile_image_url = self.request.build_absolute_uri(
-                instance.profile_image.url
+            upload = serializer.validated_data.get("profile_image")
+            if upload is None:
+                serializer.save()
+                return Response(serializer.data, status=HTTP_200_OK)
+
+            # Acknowledged once staged, the image is processed in the background
+            instance = serializer.save(
+                profile_image=stage_upload(upload), profile_image_status="pending"
             )
-            return Response({"profile_image": profile_image_url}, status=HTTP_200_OK)
+            schedule_ingestion(instance, "profile_image")
+            return Response(serializer.data, status=HTTP_202_ACCEPTED)
         else:
             return Response(serializer.errors, status=HTTP_400_BAD_REQUEST)
 
@@ -96,7 +111,7 @@ class ProfileImageUpdateView(UpdateAPIView):
             request.user, data={"profile_image": None}, partial=True
         )
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(profile_image_status="ready")
             return Response(None, status=HTTP_200_OK)
         else:
             return Response(serializer.errors, status=HTTP_400_BAD_REQUEST)
@@ -105,6 +120,13 @@ class ProfileImageUpdateView(UpdateAPIView):
 class UsernameSuggestionView(CreateAPIView):
     serializer_class = UsernameSuggestionSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "username_suggestions"
+    # Candidates checked per prefix: the first numbers, then random ones
+    # in case all of them are taken
+    sequential_candidates = 20
+    random_candidates = 5
+    max_random_number = 10**6
 
     @action(methods="POST", detail=False)
     def create(self, request):
@@ -131,34 +153,43 @@ class UsernameSuggestionView(CreateAPIView):
             f"{first_name}.{last_name}",
         ]
 
-        existing_users = User.objects.filter(
-            Q(username__startswith=prefixes[0])
-            | Q(username__iexact=prefixes[0])
-            | Q(username__startswith=prefixes[1])
-            | Q(username__iexact=prefixes[1])
-            | Q(username__startswith=prefixes[2])
-            | Q(username__iexact=prefixes[2])
+        # The candidates of all the prefixes taken, in a single query
+        candidates = {
+            prefix: [f"{prefix}{x}" for x in self.get_candidate_numbers()]
+            for prefix in prefixes
+        }
+        taken = set(
+            User.objects.annotate(username_lower=Lower("username"))
+            .filter(username_lower__in=list(chain(*candidates.values())))
+            .values_list("username_lower", flat=True)
         )
 
         suggestions = []
 
         for prefix in prefixes:
-            x = 0
-            attempts = 0
-            active = True
-            while active and attempts < 10:
-                if (existing_users.filter(username=f"{prefix}{x}")).exists():
-                    x += 1
-                    attempts += 1
-                else:
-                    suggestions.append(f"{prefix}{x}")
-                    active = False
+            for candidate in candidates[prefix]:
+                if candidate not in taken:
+                    suggestions.append(candidate)
+                    # The prefixes are the same for one letter names
+                    taken.add(candidate)
+                    break
 
         return suggestions
 
+    def get_candidate_numbers(self):
+        return [
+            *range(self.sequential_candidates),
+            *random.sample(
+                range(self.sequential_candidates, self.max_random_number),
+                self.random_candidates,
+            ),
+        ]
+
 
 class UsernameAvailabilityView(CreateAPIView):
     serializer_class = UsernameAvailabilitySerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "availability"
 
     @action(methods="POST", detail=False)
     def create(self, request):
@@ -167,7 +198,7 @@ class UsernameAvailabilityView(CreateAPIView):
         if serializer.is_valid():
             username = serializer.validated_data.get("username")
 
-            available = not (User.objects.filter(username=username).exists())
+            available = not user_availability.exists("username", username)
 
             return Response(available, status=HTTP_200_OK)
 
@@ -177,6 +208,8 @@ class UsernameAvailabilityView(CreateAPIView):
 
 class EmailAvailabilityView(CreateAPIView):
     serializer_class = EmailAvailabilitySerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "availability"
 
     @action(methods="POST", detail=False)
     def create(self, request):
@@ -185,9 +218,22 @@ class EmailAvailabilityView(CreateAPIView):
         if serializer.is_valid():
             email = serializer.validated_data.get("email")
 
-            available = not (User.objects.filter(email=email).exists())
+            available = not user_availability.exists("email", email)
 
             return Response(available, status=HTTP_200_OK)
 
         else:
             return Response(serializer.errors, status=HTTP_400_BAD_REQUEST)
+
+
+class UserAvailabilityStatsView(RetrieveAPIView):
+    """
+    This resource returns the counters of the username and email
+    availability checks, and the filter of the serving process. Must be
+    an admin to access.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(user_availability.get_stats(), status=HTTP_200_OK)